@@ -14,3 +14,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'FG_copilot.settings')
 
 application = get_asgi_application()
+
+# Build the shared LangChain advisor and chatbot before the first AI request needs
+# them. Done here rather than in AppConfig.ready() so only server processes pay for
+# it, not migrate, cron management commands or the shell.
+from django.conf import settings  # noqa: E402
+
+if settings.LANGCHAIN_WARMUP:
+    from finance.services.langchain_service import warm_up  # noqa: E402
+    warm_up()
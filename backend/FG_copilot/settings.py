@@ -168,12 +168,20 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Authentication settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',  # JWT with cached user lookup
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',  # Default requires auth
         # Override with AllowAny on specific views like /me/ for demo mode
     ),
+    # Token buckets per user, business and endpoint class (see core.throttling):
+    # "<requests>/<period>" allows bursts of <requests>, refilled over <period>
+    'DEFAULT_THROTTLE_RATES': {
+        'mpesa_stk_push': os.getenv('THROTTLE_MPESA_STK_PUSH', '5/min'),
+        'kavi_chat': os.getenv('THROTTLE_KAVI_CHAT', '20/min'),
+        'business_classify': os.getenv('THROTTLE_BUSINESS_CLASSIFY', '10/hour'),
+        'admin_analytics': os.getenv('THROTTLE_ADMIN_ANALYTICS', '30/min'),
+    },
 }
 
 # JWT settings
@@ -182,6 +190,82 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Seconds a JWT-authenticated user stays cached (see core.authentication)
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', '60'))
+
+# Max age in seconds of the platform stats snapshot before it is recomputed inline
+# (refreshed every few minutes by `manage.py refresh_platform_stats`)
+PLATFORM_STATS_MAX_AGE = int(os.getenv('PLATFORM_STATS_MAX_AGE', '900'))
+
+# Buffered ActivityLog writer (see core.audit). Sync mode writes each entry inline.
+AUDIT_LOG_SYNC = os.getenv('AUDIT_LOG_SYNC', 'False').lower() == 'true'
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', '100'))
+AUDIT_LOG_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_LOG_FLUSH_INTERVAL_MS', '500'))
+AUDIT_LOG_SPOOL_PATH = os.getenv('AUDIT_LOG_SPOOL_PATH', str(BASE_DIR / 'logs' / 'audit_spool.jsonl'))
+
+# Retention for `manage.py prune_and_archive` (days); pruned rows go to ARCHIVE_DIR
+RETENTION_DAYS = {
+    'activity_log': int(os.getenv('RETENTION_ACTIVITY_LOG_DAYS', '180')),
+    'failed_login': int(os.getenv('RETENTION_FAILED_LOGIN_DAYS', '90')),
+    'notification': int(os.getenv('RETENTION_NOTIFICATION_DAYS', '90')),
+}
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Longest a long-poll on notifications/unread-count/?since= is held open (seconds)
+NOTIFICATION_LONG_POLL_MAX_WAIT = int(os.getenv('NOTIFICATION_LONG_POLL_MAX_WAIT', '25'))
+
+# Server-sent events (core/events.py). With more than one worker process use
+# core.events.PostgresNotifyBackend so events reach every worker.
+EVENT_STREAM_BACKEND = os.getenv('EVENT_STREAM_BACKEND', 'core.events.InProcessBackend')
+EVENT_STREAM_HEARTBEAT = int(os.getenv('EVENT_STREAM_HEARTBEAT', '15'))  # seconds
+EVENT_STREAM_BUFFER_SIZE = int(os.getenv('EVENT_STREAM_BUFFER_SIZE', '100'))  # events kept per user for resume
+EVENT_STREAM_HISTORY_TTL = int(os.getenv('EVENT_STREAM_HISTORY_TTL', '600'))  # seconds an idle user's events are kept
+EVENT_STREAM_TICKET_TIMEOUT = int(os.getenv('EVENT_STREAM_TICKET_TIMEOUT', '30'))  # seconds to redeem a stream ticket
+
+# Firecrawl result cache (core/services/intelligence_cache.py). Per-lookup TTLs in
+# seconds override the defaults there; expired results are still served for
+# INTELLIGENCE_CACHE_STALE_TTL seconds while they refresh in the background.
+INTELLIGENCE_CACHE_TTLS = {}
+INTELLIGENCE_CACHE_STALE_TTL = int(os.getenv('INTELLIGENCE_CACHE_STALE_TTL', str(7 * 24 * 3600)))
+
+# Build the shared LangChain advisor and chatbot (finance/services/langchain_service.py)
+# in a background thread when each ASGI server worker starts, instead of on the first
+# AI request (see FG_copilot/asgi.py; management commands never warm up)
+LANGCHAIN_WARMUP = os.getenv('LANGCHAIN_WARMUP', 'False').lower() == 'true'
+
+# LLM response cache (finance/services/llm_cache.py), per worker process. Entries
+# for a business are also dropped as soon as its data version changes.
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(6 * 3600)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '512'))
+
+# Stream canned KAVI chat answers (finance/services/chat_stream.py) instead of
+# calling OpenAI; for local development of the voice UI
+KAVI_CHAT_FAKE_LLM = os.getenv('KAVI_CHAT_FAKE_LLM', 'False').lower() == 'true'
+
+# Size budget for GET /api/finance/kavi-context/ (finance/services/kavi_context.py)
+KAVI_CONTEXT_MAX_BYTES = int(os.getenv('KAVI_CONTEXT_MAX_BYTES', '4096'))
+
+# KAVI conversation memory (finance/services/conversation_memory.py): recent
+# messages kept verbatim, and the cap on the rolling summary of older ones (tokens)
+CONVERSATION_WINDOW_TOKENS = int(os.getenv('CONVERSATION_WINDOW_TOKENS', '1200'))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv('CONVERSATION_SUMMARY_TOKENS', '300'))
+
+# Ledger search for KAVI questions (finance/services/ledger_index.py): records
+# added to each prompt, and how many businesses' indexes a worker keeps in memory
+LEDGER_SEARCH_TOP_K = int(os.getenv('LEDGER_SEARCH_TOP_K', '5'))
+LEDGER_INDEX_MAX_BUSINESSES = int(os.getenv('LEDGER_INDEX_MAX_BUSINESSES', '32'))
+
+# LLM gateway (finance/services/llm_gateway.py): concurrent calls per process and
+# across processes (counted in the shared cache), callers allowed to queue and for
+# how long, the per-call deadline, and when the circuit breaker opens and retries
+LLM_MAX_CONCURRENT = int(os.getenv('LLM_MAX_CONCURRENT', '4'))
+LLM_GLOBAL_MAX_CONCURRENT = int(os.getenv('LLM_GLOBAL_MAX_CONCURRENT', '16'))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', '8'))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', '2'))
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '20'))
+LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
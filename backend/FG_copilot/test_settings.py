@@ -0,0 +1,9 @@
+"""
+Settings for the test suite:
+
+    python manage.py test --settings=FG_copilot.test_settings
+"""
+from .settings import *  # noqa: F401,F403
+
+# Write audit entries inline so tests see them without waiting on the writer thread
+AUDIT_LOG_SYNC = True
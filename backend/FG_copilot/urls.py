@@ -19,7 +19,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from core.views import test_cors, root_view
+from core.views import test_cors, root_view, bootstrap
 
 urlpatterns = [
     path('', root_view, name='root'),
@@ -27,6 +27,7 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/finance/', include('finance.urls')),
     path('api/core/', include('core.urls')),  # Super Admin endpoints
+    path('api/bootstrap/', bootstrap, name='bootstrap'),
     path('api/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/test-cors/', test_cors, name='test_cors'),
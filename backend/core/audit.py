@@ -0,0 +1,261 @@
+# backend/core/audit.py
+"""
+Buffered audit sink for ActivityLog.
+
+Entries are queued in memory and written with bulk_create from a background
+thread every AUDIT_LOG_BATCH_SIZE entries or AUDIT_LOG_FLUSH_INTERVAL_MS,
+whichever comes first. Batches that cannot be written are appended to a local
+spool file and replayed on the next successful flush. A flush claims the spool
+by renaming it first, so two processes never replay the same entries. Entries
+the database rejects on their own (bad data rather than an outage) are moved
+to a quarantine file next to the spool instead of holding up later flushes.
+The queue is flushed on interpreter shutdown. With AUDIT_LOG_SYNC (set in
+FG_copilot.test_settings) every entry is written immediately.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FIELDS = ['user_id', 'action', 'action_type', 'resource_type', 'resource_id',
+                'details', 'ip_address', 'user_agent', 'severity', 'timestamp']
+
+# Failures caused by the entries themselves; anything else is treated as an outage and spooled
+BAD_ENTRY_ERRORS = (IntegrityError, DataError, ValidationError, TypeError, ValueError)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AuditLogBuffer:
+    def __init__(self):
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def batch_size(self):
+        return _setting('AUDIT_LOG_BATCH_SIZE', 100)
+
+    @property
+    def flush_interval(self):
+        return _setting('AUDIT_LOG_FLUSH_INTERVAL_MS', 500) / 1000
+
+    @property
+    def spool_path(self):
+        return _setting('AUDIT_LOG_SPOOL_PATH', None)
+
+    @property
+    def quarantine_path(self):
+        path = self.spool_path
+        return f"{path}.rejected" if path else None
+
+    def record(self, **fields):
+        """Queue an entry. fields are ActivityLog field values (user or user_id)."""
+        from .models import classify_action
+
+        user = fields.pop('user', None)
+        if user is not None and 'user_id' not in fields:
+            fields['user_id'] = user.pk if getattr(user, 'is_authenticated', False) else None
+        fields.setdefault('timestamp', timezone.now())
+        fields.setdefault('severity', 'info')
+        if not fields.get('action_type'):
+            fields['action_type'] = classify_action(fields.get('action'), fields.get('resource_type'))
+
+        if _setting('AUDIT_LOG_SYNC', False):
+            self._write([fields])
+            return
+
+        with self._lock:
+            self._queue.append(fields)
+            queued = len(self._queue)
+        self._ensure_thread()
+        if queued >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything queued (and any spooled entries) now; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._queue)
+                self._queue.clear()
+            claimed = self._claim_spool()
+            spooled = self._read_spool(claimed)
+            if spooled is None:
+                # Unreadable: leave the claimed file in place for inspection
+                claimed, spooled = None, []
+            entries = spooled + batch
+            try:
+                written = self._write_isolating(entries)
+            except Exception:
+                logger.exception("Audit log flush failed, spooling %d entries", len(entries))
+                if not self._spool(entries):
+                    # Keep the claimed file rather than lose what it holds
+                    return 0
+                written = 0
+            if claimed:
+                self._remove(claimed)
+            return written
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    # -- internals --
+
+    def _write(self, entries):
+        from .models import ActivityLog
+
+        ActivityLog.objects.bulk_create(
+            [ActivityLog(**entry) for entry in entries],
+            batch_size=self.batch_size
+        )
+
+    def _write_isolating(self, entries):
+        """
+        Write entries, quarantining the ones that cannot be stored so they do
+        not block the rest. Other errors (an outage) are raised for spooling.
+        """
+        if not entries:
+            return 0
+        try:
+            self._write(entries)
+            return len(entries)
+        except BAD_ENTRY_ERRORS:
+            logger.exception("Audit log batch rejected, retrying %d entries one by one", len(entries))
+
+        written = 0
+        for entry in entries:
+            try:
+                with transaction.atomic():
+                    self._write([entry])
+                written += 1
+            except BAD_ENTRY_ERRORS:
+                self._quarantine([json.dumps(entry, default=str)])
+        return written
+
+    def _ensure_thread(self):
+        # A forked worker inherits the parent's buffer but not its thread
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def _spool(self, entries):
+        """Append entries to the spool file; returns False if they could not be kept"""
+        path = self.spool_path
+        if not entries:
+            return True
+        if not path:
+            logger.error("Dropping %d audit log entries: no AUDIT_LOG_SPOOL_PATH configured", len(entries))
+            return True
+        try:
+            with open(path, 'a', encoding='utf-8') as spool:
+                for entry in entries:
+                    spool.write(json.dumps(entry, default=str) + '\n')
+        except OSError:
+            logger.exception("Could not write audit spool file %s", path)
+            return False
+        return True
+
+    def _claim_spool(self):
+        """
+        Atomically move the spool aside for this flush and return the claimed
+        path, or None if there is nothing to replay. Whoever renames first owns
+        the entries; entries spooled afterwards start a new file.
+        """
+        path = self.spool_path
+        if not path:
+            return None
+        claimed = f"{path}.{os.getpid()}.{threading.get_ident()}.replay"
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.exception("Could not claim audit spool file %s", path)
+            return None
+        return claimed
+
+    def _read_spool(self, path):
+        """Entries in the claimed spool file, or None if it could not be read"""
+        if not path:
+            return []
+        entries, rejected = [], []
+        try:
+            with open(path, encoding='utf-8') as spool:
+                for line in spool:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        entry['timestamp'] = parse_datetime(entry['timestamp'])
+                    except (ValueError, TypeError, KeyError):
+                        rejected.append(line.rstrip('\n'))
+                        continue
+                    entries.append({k: v for k, v in entry.items() if k in AUDIT_FIELDS})
+        except OSError:
+            logger.exception("Could not read audit spool file %s", path)
+            return None
+        if rejected:
+            logger.error("Quarantining %d unreadable audit spool lines", len(rejected))
+            self._quarantine(rejected)
+        return entries
+
+    def _quarantine(self, lines):
+        path = self.quarantine_path
+        if not path:
+            return
+        try:
+            with open(path, 'a', encoding='utf-8') as quarantine:
+                for line in lines:
+                    quarantine.write(line + '\n')
+        except OSError:
+            logger.exception("Could not write audit quarantine file %s", path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+audit_buffer = AuditLogBuffer()
+
+
+def audit_log(**fields):
+    """Record an ActivityLog entry without blocking the request"""
+    audit_buffer.record(**fields)
+
+
+@atexit.register
+def _flush_on_shutdown():
+    if audit_buffer.pending():
+        audit_buffer.flush()
@@ -0,0 +1,188 @@
+# backend/core/authentication.py
+import secrets
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+USER_CACHE_TIMEOUT = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+STREAM_TICKET_TIMEOUT = getattr(settings, 'EVENT_STREAM_TICKET_TIMEOUT', 30)
+STREAM_TICKET_SALT = 'core.authentication.stream_ticket'
+
+
+def _version_key(user_id):
+    return f"auth:user_version:{user_id}"
+
+
+def get_user_cache_version(user_id):
+    """Return the current auth cache version for a user, creating one if missing"""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.add(_version_key(user_id), version, None)
+        version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def user_cache_key(user_id, version=None):
+    if version is None:
+        version = get_user_cache_version(user_id)
+    return f"auth:user:{user_id}:v{version}"
+
+
+def _inactive_key(user_id):
+    return f"auth:user_inactive:{user_id}"
+
+
+def invalidate_cached_user(user_id, is_active=True):
+    """
+    Drop the cached user for user_id.
+    Bumping the version orphans every cached copy, so stale entries simply expire.
+    """
+    cache.set(_version_key(user_id), int(time.time() * 1000), None)
+    if is_active:
+        cache.delete(_inactive_key(user_id))
+    else:
+        cache.set(_inactive_key(user_id), True, None)
+
+
+def get_cached_user(user_id):
+    """Load a user by id through the short-TTL auth cache"""
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user from the cache instead of
+    hitting auth_user on every request.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        return user
+
+
+class LightweightUser:
+    """
+    Minimal request.user for hot endpoints that only need id and flags.
+    The full User row is only loaded if something asks for it.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, validated_token):
+        self.token = validated_token
+        self.id = validated_token[api_settings.USER_ID_CLAIM]
+        self.pk = self.id
+
+    @cached_property
+    def user(self):
+        return get_cached_user(self.id)
+
+    def __getattr__(self, name):
+        # Only reached for attributes not defined above (email, is_superuser, ...)
+        if name == 'user':
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __str__(self):
+        return f"LightweightUser {self.id}"
+
+
+class LightweightJWTAuthentication(JWTAuthentication):
+    """
+    Validates the token and checks the account against the auth cache only.
+    Use via authentication_classes on endpoints that only need request.user.id.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        user = LightweightUser(validated_token)
+        if api_settings.CHECK_USER_IS_ACTIVE:
+            # Locked accounts are flagged in the cache so they are rejected without a DB read
+            if cache.get(_inactive_key(user.id)):
+                raise AuthenticationFailed('User is inactive', code='user_inactive')
+            # The flag lives in the cache and may be missing (evicted, or written
+            # somewhere this cache cannot see), so also check the cached user row
+            if user.user is None:
+                raise AuthenticationFailed('User not found', code='user_not_found')
+            if not user.user.is_active:
+                raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+def authenticate_stream_request(request):
+    """
+    Lightweight user for a plain (non-DRF) streaming view, from the
+    Authorization header. Returns None when no token was sent; raises
+    InvalidToken, TokenError or AuthenticationFailed for a bad one. May read
+    the user row on an auth cache miss, so async views call it via sync_to_async.
+    """
+    auth = LightweightJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    return auth.get_user(auth.get_validated_token(raw_token))
+
+
+def issue_stream_ticket(user_id):
+    """
+    Short-lived, single-use ticket that opens one event stream for user_id.
+    EventSource cannot set headers, so the browser passes this in the URL
+    instead of its access token (URLs end up in logs and proxies).
+    """
+    return signing.dumps({'user': user_id, 'nonce': secrets.token_urlsafe(16)}, salt=STREAM_TICKET_SALT)
+
+
+def redeem_stream_ticket(ticket):
+    """
+    User id of a valid ticket, which is then spent; None if forged, expired,
+    already used or issued to an account that is no longer active. May read
+    the user row, so async views call it via sync_to_async.
+    """
+    try:
+        payload = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_TIMEOUT)
+    except signing.BadSignature:
+        return None
+    # The signature can be checked by any worker. Single use is only as wide as
+    # the cache: with a shared cache (Redis, memcached) a ticket opens one
+    # stream in total; with the default per-process LocMemCache, one per
+    # worker process, within the ticket's STREAM_TICKET_TIMEOUT lifetime.
+    if not cache.add(f"auth:stream_ticket_used:{payload['nonce']}", True, STREAM_TICKET_TIMEOUT + 1):
+        return None
+    # The account may have been locked since the ticket was issued
+    if cache.get(_inactive_key(payload['user'])):
+        return None
+    user = get_cached_user(payload['user'])
+    if user is None or not user.is_active:
+        return None
+    return payload['user']
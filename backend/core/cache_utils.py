@@ -0,0 +1,37 @@
+# backend/core/cache_utils.py
+import hashlib
+import json
+
+from django.utils.cache import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def compute_etag(*parts):
+    """Build a weak ETag from any JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return 'W/' + quote_etag(hashlib.md5(payload.encode('utf-8')).hexdigest())
+
+
+def etag_matches(request, etag):
+    """True if the client's If-None-Match already covers etag"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison: W/"x" and "x" match
+    wanted = etag[2:] if etag.startswith('W/') else etag
+    return any((tag[2:] if tag.startswith('W/') else tag) == wanted for tag in parse_etags(header))
+
+
+def not_modified(etag):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    return set_etag(response, etag)
+
+
+def set_etag(response, etag):
+    """Attach the ETag and ask clients to revalidate before reuse"""
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,269 @@
+# backend/core/events.py
+"""
+Per-user server-sent events.
+
+publish() hands an event to the configured EVENT_STREAM_BACKEND after the
+current transaction commits. The default InProcessBackend delivers it straight
+to this process's subscribers; PostgresNotifyBackend sends it through
+pg_notify so every worker's listener thread delivers it to its own
+subscribers. Each worker keeps the last EVENT_STREAM_BUFFER_SIZE events per
+user so a reconnecting client can resume from Last-Event-ID; when the gap
+cannot be covered the client is told to resync instead. Users without an open
+stream are forgotten once their newest event is EVENT_STREAM_HISTORY_TTL old. Synchronous code
+(such as a long-poll) can also watch() a user and be woken by their events.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RETRY_MS = 3000
+PRUNE_INTERVAL = 60  # seconds between sweeps for idle users' history
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def format_event(event):
+    """Serialize an event dict to the text/event-stream wire format"""
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['event']}")
+    lines.append(f"data: {json.dumps(event.get('data', {}), cls=DjangoJSONEncoder)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class InProcessBackend:
+    """Delivers to subscribers in this process only"""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, user_id, event):
+        self.broker.deliver(user_id, event)
+
+
+class PostgresNotifyBackend:
+    """Cross-worker delivery over PostgreSQL LISTEN/NOTIFY"""
+
+    channel = 'kavi_events'
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def publish(self, user_id, event):
+        payload = json.dumps({'user_id': user_id, 'event': event}, cls=DjangoJSONEncoder)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, name='event-stream-listener', daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        import psycopg2
+
+        while True:
+            try:
+                params = connection.get_connection_params()
+                conn = psycopg2.connect(**params)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self.broker.deliver(message['user_id'], message['event'])
+            except Exception:
+                logger.exception("Event stream listener failed, reconnecting")
+                time.sleep(RETRY_MS / 1000)
+
+
+class EventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._watchers = defaultdict(set)
+        self._history = defaultdict(deque)
+        self._evicted_up_to = {}
+        self._last_id = 0
+        self._last_prune = time.monotonic()
+        self._backend = None
+        # Anything older than this may have been published before this process started
+        self._started_id = self._next_id()
+
+    @property
+    def buffer_size(self):
+        return _setting('EVENT_STREAM_BUFFER_SIZE', 100)
+
+    @property
+    def heartbeat(self):
+        return _setting('EVENT_STREAM_HEARTBEAT', 15)
+
+    @property
+    def history_ttl(self):
+        return _setting('EVENT_STREAM_HISTORY_TTL', 600)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            backend_class = import_string(_setting('EVENT_STREAM_BACKEND', 'core.events.InProcessBackend'))
+            self._backend = backend_class(self)
+        return self._backend
+
+    def publish(self, user_id, event, data):
+        """Queue an event for user_id, sent once the surrounding transaction commits"""
+        transaction.on_commit(lambda: self._send(user_id, event, data))
+
+    def deliver(self, user_id, event):
+        """Record an event and hand it to this process's subscribers (called by backends)"""
+        key = str(user_id)
+        with self._lock:
+            history = self._history[key]
+            history.append(event)
+            while len(history) > self.buffer_size:
+                self._evicted_up_to[key] = history.popleft()['id']
+            if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                self._prune_idle()
+            subscribers = list(self._subscribers.get(key, ()))
+            for flag in self._watchers.get(key, ()):
+                flag.set()
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it unsubscribes on its way out
+                pass
+
+    def subscribe(self, user_id, last_event_id=None):
+        """
+        Register the running event loop for user_id's events.
+        Returns (queue, entry, backlog, missed): entry is passed back to
+        unsubscribe(), backlog holds the buffered events after last_event_id and
+        missed says whether some may have been lost before them.
+        """
+        start = getattr(self.backend, 'start', None)
+        if start:
+            start()
+
+        key = str(user_id)
+        queue = asyncio.Queue()
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[key].add(entry)
+            backlog, missed = [], False
+            if last_event_id is not None:
+                backlog = [event for event in self._history.get(key, ()) if event['id'] > last_event_id]
+                missed = last_event_id < max(self._evicted_up_to.get(key, 0), self._started_id)
+                if key not in self._history:
+                    # Nothing kept: anything older than the TTL may have been pruned
+                    missed = missed or last_event_id < self._history_horizon()
+        return queue, entry, backlog, missed
+
+    @contextmanager
+    def watch(self, user_id):
+        """
+        threading.Event set whenever an event for user_id is delivered while
+        the block runs; for synchronous waits that cannot use subscribe()
+        """
+        start = getattr(self.backend, 'start', None)
+        if start:
+            start()
+
+        key = str(user_id)
+        flag = threading.Event()
+        with self._lock:
+            self._watchers[key].add(flag)
+        try:
+            yield flag
+        finally:
+            with self._lock:
+                self._watchers[key].discard(flag)
+                if not self._watchers[key]:
+                    del self._watchers[key]
+
+    def unsubscribe(self, user_id, entry):
+        key = str(user_id)
+        with self._lock:
+            self._subscribers[key].discard(entry)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+    async def stream(self, user_id, last_event_id=None):
+        """text/event-stream body for one connection: backlog, live events and heartbeats"""
+        queue, entry, backlog, missed = self.subscribe(user_id, last_event_id)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if missed:
+                yield format_event({'event': 'resync', 'data': {}})
+            for event in backlog:
+                yield format_event(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            self.unsubscribe(user_id, entry)
+
+    # -- internals --
+
+    def _history_horizon(self):
+        # Ids are microsecond timestamps, so this is the id of an event history_ttl old
+        return int((time.time() - self.history_ttl) * 1_000_000)
+
+    def _prune_idle(self):
+        """Forget users with no open stream whose newest event is past the TTL (called with the lock held)"""
+        self._last_prune = time.monotonic()
+        horizon = self._history_horizon()
+        idle = [
+            key for key, history in self._history.items()
+            if key not in self._subscribers and (not history or history[-1]['id'] < horizon)
+        ]
+        for key in idle:
+            del self._history[key]
+            self._evicted_up_to.pop(key, None)
+
+    def _next_id(self):
+        # Microsecond timestamps keep ids ordered across workers; the max() keeps them unique here
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+            return self._last_id
+
+    def _send(self, user_id, event, data):
+        # Ids are taken at commit time so they follow the order events become visible
+        message = {'id': self._next_id(), 'event': event, 'data': data}
+        try:
+            self.backend.publish(user_id, message)
+        except Exception:
+            logger.exception("Could not publish %s event for user %s", event, user_id)
+
+
+event_broker = EventBroker()
+
+
+def publish_event(user_id, event, data):
+    """Push an event to every open stream of user_id"""
+    event_broker.publish(user_id, event, data)
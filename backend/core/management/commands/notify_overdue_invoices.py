@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.services.notification_dispatch import dispatch_business_notifications
+from finance.cache_utils import bump_business_data_version
+from finance.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Mark sent invoices past their due date as overdue and notify every member of the affected businesses (run daily from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many invoices and businesses would be affected'
+        )
+
+    def handle(self, *args, **options):
+        overdue = Invoice.objects.filter(status='sent', due_date__lt=timezone.now().date())
+        by_business = list(
+            overdue.values('business_id').annotate(count=Count('id'), amount=Sum('total_amount')).order_by()
+        )
+        total = sum(row['count'] for row in by_business)
+
+        if options['dry_run']:
+            self.stdout.write(f'{total} invoice(s) in {len(by_business)} business(es) would be marked overdue')
+            return
+
+        with transaction.atomic():
+            updated = overdue.update(status='overdue', updated_at=timezone.now())
+            # update() skips the signals that move each business to a new data version
+            for row in by_business:
+                bump_business_data_version(row['business_id'])
+            sent = dispatch_business_notifications(
+                {
+                    'business_id': row['business_id'],
+                    'title': 'Invoices Overdue',
+                    'message': f"{row['count']} invoice(s) totalling {row['amount'] or 0:,.2f} are now overdue.",
+                    'notification_type': 'invoice_overdue',
+                    'priority': 'high',
+                    'action_url': '/invoices?status=overdue',
+                    'resource_type': 'invoice',
+                }
+                for row in by_business
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Marked {updated} invoice(s) overdue in {len(by_business)} business(es), sent {sent} notification(s)'
+        ))
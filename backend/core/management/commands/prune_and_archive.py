@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from core.services.archive import (
+    DEFAULT_CHUNK_SIZE, archive_root, prunable_querysets, prune_table, retention_days
+)
+
+
+class Command(BaseCommand):
+    help = 'Archive old activity logs, failed logins and expired/read notifications to compressed JSONL, then delete them in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--activity-days', type=int, help='Keep activity logs for this many days')
+        parser.add_argument('--failed-login-days', type=int, help='Keep failed login attempts for this many days')
+        parser.add_argument('--notification-days', type=int, help='Keep read notifications for this many days')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Rows archived and deleted per batch (default: {DEFAULT_CHUNK_SIZE})'
+        )
+        parser.add_argument('--sleep-ms', type=int, default=0, help='Pause between batches to ease load')
+        parser.add_argument('--no-archive', action='store_true', help='Delete without writing an archive')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be pruned')
+
+    def handle(self, *args, **options):
+        days = retention_days()
+        for table, option in [('activity_log', 'activity_days'), ('failed_login', 'failed_login_days'),
+                              ('notification', 'notification_days')]:
+            if options[option] is not None:
+                days[table] = options[option]
+
+        if not options['no_archive'] and not options['dry_run']:
+            self.stdout.write(f'Archiving to {archive_root()}')
+
+        total = 0
+        for table, model, time_field, queryset in prunable_querysets(days=days):
+            pruned = prune_table(
+                table, model, time_field, queryset,
+                chunk_size=max(options['chunk_size'], 1),
+                archive=not options['no_archive'],
+                dry_run=options['dry_run'],
+                sleep_ms=options['sleep_ms'],
+            )
+            total += pruned
+            verb = 'would prune' if options['dry_run'] else 'pruned'
+            self.stdout.write(f'  {table}: {verb} {pruned} row(s)')
+
+        self.stdout.write(self.style.SUCCESS(f'Done, {total} row(s) {"to prune" if options["dry_run"] else "pruned"}'))
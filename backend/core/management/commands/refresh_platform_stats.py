@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.services.platform_stats import prune_platform_stats, refresh_platform_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the platform statistics snapshot used by the super admin dashboards (run every few minutes from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=100,
+            help='Number of snapshots to keep (default: 100)'
+        )
+
+    def handle(self, *args, **options):
+        snapshot = refresh_platform_stats()
+        pruned = prune_platform_stats(keep=max(options['keep'], 1))
+        self.stdout.write(self.style.SUCCESS(
+            f'Platform stats refreshed in {snapshot.duration_ms}ms (as of {snapshot.computed_at:%Y-%m-%d %H:%M:%S}), '
+            f'pruned {pruned} old snapshot(s)'
+        ))
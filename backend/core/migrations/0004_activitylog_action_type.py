@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def classify_action(action, resource_type=None):
+    """
+    Frozen copy of core.models.classify_action as of this migration, so the
+    backfill keeps its meaning if the live classifier changes later
+    """
+    action = (action or '').lower()
+    resource_type = (resource_type or '').lower()
+    if 'login' in action or 'logout' in action or resource_type == 'session':
+        return 'login'
+    if 'settings' in action or resource_type == 'settings':
+        return 'settings'
+    if 'document' in action or 'file' in action or resource_type in ('document', 'file'):
+        return 'document'
+    if 'business' in action or resource_type.startswith('business') or resource_type == 'membership':
+        return 'business'
+    if 'user' in action or 'account' in action or resource_type in ('user', 'individual_registration'):
+        return 'user'
+    return 'other'
+
+
+def backfill_action_type(apps, schema_editor):
+    """Classify existing rows in pk batches so large tables are not loaded at once"""
+    ActivityLog = apps.get_model('core', 'ActivityLog')
+    last_id = 0
+    while True:
+        batch = list(
+            ActivityLog.objects.filter(id__gt=last_id, action_type='')
+            .order_by('id')
+            .only('id', 'action', 'resource_type')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for log in batch:
+            log.action_type = classify_action(log.action, log.resource_type)
+        ActivityLog.objects.bulk_update(batch, ['action_type'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_platformstatssnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='action_type',
+            field=models.CharField(blank=True, choices=[('login', 'Login Events'), ('user', 'User Actions'), ('business', 'Business Actions'), ('document', 'Document Actions'), ('settings', 'Settings Changes'), ('other', 'Other')], max_length=20),
+        ),
+        migrations.RunPython(backfill_action_type, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['action_type', '-timestamp', '-id'], name='core_activi_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['action_type', 'user', '-timestamp', '-id'], name='core_activi_type_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['severity', '-timestamp', '-id'], name='core_activi_severity_ts_idx'),
+        ),
+    ]
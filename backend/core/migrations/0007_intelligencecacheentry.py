@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:45
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntelligenceCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('source', models.CharField(db_index=True, max_length=50)),
+                ('query', models.JSONField(default=dict)),
+                ('result', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Intelligence cache entries',
+            },
+        ),
+    ]
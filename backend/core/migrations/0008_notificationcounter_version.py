@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_intelligencecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
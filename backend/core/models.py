@@ -1,10 +1,29 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 import uuid
 
 User = get_user_model()
 
+
+def classify_action(action, resource_type=None):
+    """Map a free-text activity action to one of ActivityLog.ACTION_TYPES"""
+    action = (action or '').lower()
+    resource_type = (resource_type or '').lower()
+    if 'login' in action or 'logout' in action or resource_type == 'session':
+        return 'login'
+    if 'settings' in action or resource_type == 'settings':
+        return 'settings'
+    if 'document' in action or 'file' in action or resource_type in ('document', 'file'):
+        return 'document'
+    if 'business' in action or resource_type.startswith('business') or resource_type == 'membership':
+        return 'business'
+    if 'user' in action or 'account' in action or resource_type in ('user', 'individual_registration'):
+        return 'user'
+    return 'other'
+
+
 class ActivityLog(models.Model):
     """Track all system activities for audit trail"""
     SEVERITY_CHOICES = [
@@ -13,14 +32,25 @@ class ActivityLog(models.Model):
         ('critical', 'Critical'),
     ]
     
+    ACTION_TYPES = [
+        ('login', 'Login Events'),
+        ('user', 'User Actions'),
+        ('business', 'Business Actions'),
+        ('document', 'Document Actions'),
+        ('settings', 'Settings Changes'),
+        ('other', 'Other'),
+    ]
+    
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='activity_logs')
     action = models.CharField(max_length=200)
+    action_type = models.CharField(max_length=20, choices=ACTION_TYPES, blank=True)
     resource_type = models.CharField(max_length=50, null=True, blank=True)
     resource_id = models.IntegerField(null=True, blank=True)
     details = models.TextField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the buffered writer flushes it
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default='info')
     
     class Meta:
@@ -29,10 +59,18 @@ class ActivityLog(models.Model):
             models.Index(fields=['-timestamp']),
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['action']),
+            models.Index(fields=['action_type', '-timestamp', '-id'], name='core_activi_type_ts_idx'),
+            models.Index(fields=['action_type', 'user', '-timestamp', '-id'], name='core_activi_type_user_ts_idx'),
+            models.Index(fields=['severity', '-timestamp', '-id'], name='core_activi_severity_ts_idx'),
         ]
     
     def __str__(self):
         return f"{self.action} by {self.user.email if self.user else 'System'} at {self.timestamp}"
+    
+    def save(self, *args, **kwargs):
+        if not self.action_type:
+            self.action_type = classify_action(self.action, self.resource_type)
+        super().save(*args, **kwargs)
 
 
 class UserSession(models.Model):
@@ -145,14 +183,67 @@ class Notification(models.Model):
             models.Index(fields=['user', '-created_at', 'is_read']),
             models.Index(fields=['business', '-created_at']),
             models.Index(fields=['notification_type', '-created_at']),
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='core_notif_user_unread_idx'),
         ]
     
     def __str__(self):
         return f"{self.title} - {self.user.email}"
     
     def mark_as_read(self):
-        """Mark notification as read"""
-        if not self.is_read:
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
\ No newline at end of file
+        """
+        Mark notification as read. The row is only updated if it is still
+        unread, so concurrent calls decrement the unread count once.
+        """
+        if self.is_read:
+            return
+        from .services.notification_counts import adjust_unread_count, bump_notifications_versions
+
+        read_at = timezone.now()
+        updated = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True, read_at=read_at)
+        if updated:
+            self.is_read, self.read_at = True, read_at
+            adjust_unread_count(self.user_id, -updated)
+            bump_notifications_versions([self.user_id])
+        else:
+            # Someone else got there first
+            self.refresh_from_db(fields=['is_read', 'read_at'])
+
+
+class NotificationCounter(models.Model):
+    """Denormalized unread notification count, one row per user"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)  # Moves with every write to the user's notifications
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count} unread"
+
+
+class PlatformStatsSnapshot(models.Model):
+    """Materialized platform-wide statistics for the super admin dashboards"""
+    metrics = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    computed_at = models.DateTimeField(default=timezone.now, db_index=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-computed_at']
+        get_latest_by = 'computed_at'
+    
+    def __str__(self):
+        return f"Platform stats as of {self.computed_at}"
+
+
+class IntelligenceCacheEntry(models.Model):
+    """Cached result of a paid web-intelligence (Firecrawl) lookup, keyed by the normalized query"""
+    key = models.CharField(max_length=64, primary_key=True)
+    source = models.CharField(max_length=50, db_index=True)
+    query = models.JSONField(default=dict)
+    result = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    fetched_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name_plural = 'Intelligence cache entries'
+    
+    def __str__(self):
+        return f"{self.source} ({self.key[:12]}) expires {self.expires_at}"
@@ -0,0 +1,60 @@
+# backend/core/pagination.py
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value, pk], default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+    return value, pk
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        page_size = int(request.query_params.get('page_size', default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def keyset_paginate(queryset, request, ordering='-id', page_size=None):
+    """
+    Cursor (keyset) pagination on a single non-null field with the pk as tie-breaker.
+    Cost stays constant however deep the client pages, unlike OFFSET.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    page_size = page_size or get_page_size(request)
+    descending = ordering.startswith('-')
+    field = ordering.lstrip('-')
+    op = 'lt' if descending else 'gt'
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk})
+        )
+
+    queryset = queryset.order_by(ordering, '-pk' if descending else 'pk')
+    rows = list(queryset[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import ActivityLog, UserSession, FailedLoginAttempt, ModuleAssignment, Notification
+from users.models import Membership
 
 
 class ActivityLogSerializer(serializers.ModelSerializer):
@@ -9,7 +10,7 @@ class ActivityLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = ActivityLog
         fields = [
-            'id', 'user', 'user_email', 'user_name', 'action',
+            'id', 'user', 'user_email', 'user_name', 'action', 'action_type',
             'resource_type', 'resource_id', 'details', 'ip_address',
             'user_agent', 'timestamp', 'severity'
         ]
@@ -68,3 +69,19 @@ class NotificationSerializer(serializers.ModelSerializer):
             'created_at', 'expires_at'
         ]
         read_only_fields = ['id', 'created_at', 'read_at']
+
+
+class BusinessNotificationSerializer(serializers.ModelSerializer):
+    """A notification for every active member of a business"""
+    roles = serializers.ListField(
+        child=serializers.ChoiceField(choices=Membership.ROLE_CHOICES), required=False
+    )
+    
+    class Meta:
+        model = Notification
+        fields = [
+            'business', 'title', 'message', 'notification_type', 'priority',
+            'action_url', 'action_text', 'resource_type', 'resource_id',
+            'expires_at', 'roles'
+        ]
+        extra_kwargs = {'business': {'required': True, 'allow_null': False}}
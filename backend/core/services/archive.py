@@ -0,0 +1,156 @@
+# backend/core/services/archive.py
+"""
+Cold archive for append-only tables.
+
+Rows are streamed out in primary-key order, CHUNK rows at a time. Each chunk is
+written as its own gzip member appended to one file per run, so a single chunk
+can be read back by seeking to its byte offset. Every chunk gets a line in the
+table's index.jsonl with the file, offset, length and pk/time bounds. A chunk
+is deleted from the database only after its archive member is on disk, and each
+delete is its own short statement, so no long lock is ever held.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import ActivityLog, FailedLoginAttempt, Notification
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def archive_root():
+    return str(getattr(settings, 'ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive')))
+
+
+def retention_days():
+    days = getattr(settings, 'RETENTION_DAYS', {})
+    return {
+        'activity_log': days.get('activity_log', 180),
+        'failed_login': days.get('failed_login', 90),
+        'notification': days.get('notification', 90),
+    }
+
+
+def prunable_querysets(now=None, days=None):
+    """(table name, model, time field, queryset of rows past retention) for each table"""
+    now = now or timezone.now()
+    days = days or retention_days()
+    notification_cutoff = now - timedelta(days=days['notification'])
+    return [
+        ('activity_log', ActivityLog, 'timestamp',
+         ActivityLog.objects.filter(timestamp__lt=now - timedelta(days=days['activity_log']))),
+        ('failed_login', FailedLoginAttempt, 'attempted_at',
+         FailedLoginAttempt.objects.filter(attempted_at__lt=now - timedelta(days=days['failed_login']))),
+        # Expired notifications go right away; read ones once they are past retention
+        ('notification', Notification, 'created_at',
+         Notification.objects.filter(
+             Q(expires_at__lt=now) | Q(is_read=True, created_at__lt=notification_cutoff)
+         )),
+    ]
+
+
+def _pk_key(value):
+    """Comparable form of a pk as stored in the index (ints stay ints, UUIDs are hex strings)"""
+    return value if isinstance(value, int) else str(value)
+
+
+class TableArchiver:
+    def __init__(self, table, time_field, root=None):
+        self.table = table
+        self.time_field = time_field
+        self.directory = os.path.join(root or archive_root(), table)
+        os.makedirs(self.directory, exist_ok=True)
+        self.filename = f"{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz"
+        self.path = os.path.join(self.directory, self.filename)
+        self.index_path = os.path.join(self.directory, 'index.jsonl')
+
+    def write_chunk(self, rows):
+        """Append rows as one gzip member and index it"""
+        payload = ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+        member = gzip.compress(payload.encode('utf-8'))
+        with open(self.path, 'ab') as archive:
+            offset = archive.tell()
+            archive.write(member)
+            archive.flush()
+            os.fsync(archive.fileno())
+
+        times = [row[self.time_field] for row in rows if row.get(self.time_field)]
+        entry = {
+            'file': self.filename,
+            'offset': offset,
+            'length': len(member),
+            'count': len(rows),
+            'first_pk': _pk_key(rows[0]['id']),
+            'last_pk': _pk_key(rows[-1]['id']),
+            'min_time': min(times) if times else None,
+            'max_time': max(times) if times else None,
+        }
+        with open(self.index_path, 'a', encoding='utf-8') as index:
+            index.write(json.dumps(entry, cls=DjangoJSONEncoder) + '\n')
+        return entry
+
+
+def prune_table(table, model, time_field, queryset, chunk_size=DEFAULT_CHUNK_SIZE,
+                archive=True, dry_run=False, sleep_ms=0, root=None):
+    """Archive then delete rows of queryset in pk chunks. Returns the number of rows pruned."""
+    if dry_run:
+        return queryset.count()
+
+    archiver = TableArchiver(table, time_field, root=root) if archive else None
+    pruned = 0
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk.values()[:chunk_size])
+        if not rows:
+            break
+
+        if archiver:
+            archiver.write_chunk(rows)
+        ids = [row['id'] for row in rows]
+        model.objects.filter(pk__in=ids).delete()
+
+        pruned += len(rows)
+        last_pk = ids[-1]
+        if sleep_ms:
+            time.sleep(sleep_ms / 1000)
+    return pruned
+
+
+def read_index(table, root=None):
+    index_path = os.path.join(root or archive_root(), table, 'index.jsonl')
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, encoding='utf-8') as index:
+        return [json.loads(line) for line in index if line.strip()]
+
+
+def read_chunk(table, entry, root=None):
+    """Decompress a single indexed chunk"""
+    path = os.path.join(root or archive_root(), table, entry['file'])
+    with open(path, 'rb') as archive:
+        archive.seek(entry['offset'])
+        payload = gzip.decompress(archive.read(entry['length']))
+    return [json.loads(line) for line in payload.decode('utf-8').splitlines() if line]
+
+
+def find_archived(table, pk, root=None):
+    """Look up one archived row by primary key, reading only the chunk that can hold it"""
+    key = _pk_key(pk)
+    for entry in read_index(table, root=root):
+        if type(entry['first_pk']) is not type(key):
+            continue
+        if entry['first_pk'] <= key <= entry['last_pk']:
+            for row in read_chunk(table, entry, root=root):
+                if _pk_key(row['id']) == key:
+                    return row
+    return None
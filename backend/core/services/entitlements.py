@@ -0,0 +1,95 @@
+# backend/core/services/entitlements.py
+from typing import Any, Dict
+
+from django.core.cache import cache
+
+from core.cache_utils import compute_etag
+from core.models import ModuleAssignment
+
+ENTITLEMENTS_CACHE_TIMEOUT = 60 * 60  # Keyed on the data versions, TTL only bounds memory
+
+# Module names mapping - Complete list
+MODULE_NAMES = {
+    'transactions': 'Transactions',
+    'invoices': 'Invoices',
+    'cash-flow': 'Cash Flow',
+    'credit': 'Credit Management',
+    'suppliers': 'Suppliers',
+    'clients': 'Clients',
+    'reports': 'Reports & Analytics',
+    'insights': 'AI Insights',
+    'proactive-alerts': 'Proactive Alerts',
+    'team': 'Team Management',
+    'voice-assistant': 'KAVI Voice Assistant',
+    'settings': 'Settings',
+}
+
+# Always enabled, whatever the business assignments say
+REQUIRED_MODULES = ['voice-assistant', 'settings']
+
+
+def module_name(module_id: str) -> str:
+    return MODULE_NAMES.get(module_id, module_id.title())
+
+
+def _module(module_id: str, name: str = None) -> Dict[str, Any]:
+    return {'module_id': module_id, 'enabled': True, 'module_name': name or module_name(module_id)}
+
+
+def _cache_key(user) -> str:
+    """
+    Cache key carrying the user's active businesses and their data versions
+    (one query). Membership and ModuleAssignment writes move the business data
+    version in the database, so a change made by any process (the admin, the
+    shell, cron) misses the cache everywhere at once.
+    """
+    if user.is_superuser:
+        return f"entitlements:user:{user.id}:superuser"
+    from users.models import Business
+    versions = sorted(Business.objects.filter(
+        memberships__user_id=user.id, memberships__is_active=True
+    ).values_list('id', 'data_version__version').distinct())
+    return f"entitlements:user:{user.id}:{compute_etag(versions)}"
+
+
+def compile_entitlements(user) -> Dict[str, Any]:
+    """
+    Build the module entitlement map for a user with a single query.
+
+    Returns {'modules': [...], 'businesses': {business_id: [module_id, ...]}, 'etag': str}
+    """
+    if user.is_superuser:
+        modules = [_module(module_id, name) for module_id, name in MODULE_NAMES.items()]
+        return {'modules': modules, 'businesses': {}, 'etag': compute_etag('superuser', modules)}
+
+    rows = ModuleAssignment.objects.filter(
+        business__memberships__user_id=user.id,
+        business__memberships__is_active=True,
+        enabled=True,
+    ).values_list('business_id', 'module_id', 'module_name').order_by('module_name')
+
+    modules = {}
+    businesses = {}
+    for business_id, module_id, name in rows:
+        modules.setdefault(module_id, _module(module_id, name))
+        businesses.setdefault(str(business_id), []).append(module_id)
+
+    for module_id in REQUIRED_MODULES:
+        modules.setdefault(module_id, _module(module_id))
+
+    module_list = list(modules.values())
+    return {
+        'modules': module_list,
+        'businesses': businesses,
+        'etag': compute_etag(user.id, module_list, businesses),
+    }
+
+
+def get_user_entitlements(user) -> Dict[str, Any]:
+    """Cached entitlement map for a user, compiled on first use and after any change to it"""
+    key = _cache_key(user)
+    entitlements = cache.get(key)
+    if entitlements is None:
+        entitlements = compile_entitlements(user)
+        cache.set(key, entitlements, ENTITLEMENTS_CACHE_TIMEOUT)
+    return entitlements
@@ -4,8 +4,18 @@ import requests
 from typing import Tuple, Dict, Any, List
 import json
 
+from .intelligence_cache import cached_intelligence
+
 FIRECRAWL_API_KEY = os.getenv('FIRECRAWL_API_KEY', '')
+REQUEST_TIMEOUT = int(os.getenv('FIRECRAWL_TIMEOUT', '20'))  # seconds
+
+
+def _classification_failed(result):
+    category, confidence, tags = result
+    return category == 'unknown' and ('error' in tags or 'reason' in tags)
+
 
+@cached_intelligence('classify_business', is_error=_classification_failed)
 def classify_business_from_website(website: str) -> Tuple[str, float, Dict[str, Any]]:
     """
     Call Firecrawl (or similar web intelligence API) to classify a business by website.
@@ -19,7 +29,8 @@ def classify_business_from_website(website: str) -> Tuple[str, float, Dict[str,
         resp = requests.post(
             'https://api.firecrawl.dev/v1/classify',
             headers={'Authorization': f'Bearer {FIRECRAWL_API_KEY}', 'Content-Type': 'application/json'},
-            json={'url': website, 'tasks': ['industry', 'tags', 'summary']}
+            json={'url': website, 'tasks': ['industry', 'tags', 'summary']},
+            timeout=REQUEST_TIMEOUT
         )
         resp.raise_for_status()
         data = resp.json()
@@ -31,6 +42,7 @@ def classify_business_from_website(website: str) -> Tuple[str, float, Dict[str,
         return ("unknown", 0.0, {"error": str(e)})
 
 
+@cached_intelligence('market_intelligence')
 def get_market_intelligence(industry: str, location: str = "Kenya") -> Dict[str, Any]:
     """
     Get market intelligence data for a specific industry and location.
@@ -61,7 +73,8 @@ def get_market_intelligence(industry: str, location: str = "Kenya") -> Dict[str,
                         }
                     }
                 }
-            }
+            },
+            timeout=REQUEST_TIMEOUT
         )
         resp.raise_for_status()
         data = resp.json()
@@ -75,6 +88,7 @@ def get_market_intelligence(industry: str, location: str = "Kenya") -> Dict[str,
         return {"error": f"Market intelligence failed: {str(e)}"}
 
 
+@cached_intelligence('supplier_pricing')
 def analyze_supplier_pricing(supplier_name: str, product_category: str) -> Dict[str, Any]:
     """
     Analyze supplier pricing and market rates for negotiation insights.
@@ -103,7 +117,8 @@ def analyze_supplier_pricing(supplier_name: str, product_category: str) -> Dict[
                         }
                     }
                 }
-            }
+            },
+            timeout=REQUEST_TIMEOUT
         )
         resp.raise_for_status()
         data = resp.json()
@@ -117,6 +132,7 @@ def analyze_supplier_pricing(supplier_name: str, product_category: str) -> Dict[
         return {"error": f"Supplier analysis failed: {str(e)}"}
 
 
+@cached_intelligence('competitor_analysis')
 def get_competitor_analysis(business_name: str, industry: str) -> Dict[str, Any]:
     """
     Get competitor analysis and benchmarking data.
@@ -145,7 +161,8 @@ def get_competitor_analysis(business_name: str, industry: str) -> Dict[str, Any]
                         }
                     }
                 }
-            }
+            },
+            timeout=REQUEST_TIMEOUT
         )
         resp.raise_for_status()
         data = resp.json()
@@ -159,6 +176,7 @@ def get_competitor_analysis(business_name: str, industry: str) -> Dict[str, Any]
         return {"error": f"Competitor analysis failed: {str(e)}"}
 
 
+@cached_intelligence('regulatory_updates')
 def get_regulatory_updates(industry: str, location: str = "Kenya") -> Dict[str, Any]:
     """
     Get regulatory updates and compliance information for the industry.
@@ -187,7 +205,8 @@ def get_regulatory_updates(industry: str, location: str = "Kenya") -> Dict[str,
                         }
                     }
                 }
-            }
+            },
+            timeout=REQUEST_TIMEOUT
         )
         resp.raise_for_status()
         data = resp.json()
@@ -201,6 +220,7 @@ def get_regulatory_updates(industry: str, location: str = "Kenya") -> Dict[str,
         return {"error": f"Regulatory analysis failed: {str(e)}"}
 
 
+@cached_intelligence('financial_benchmarks')
 def get_financial_benchmarks(industry: str, business_size: str) -> Dict[str, Any]:
     """
     Get financial benchmarks and KPIs for the industry and business size.
@@ -229,7 +249,8 @@ def get_financial_benchmarks(industry: str, business_size: str) -> Dict[str, Any
                         }
                     }
                 }
-            }
+            },
+            timeout=REQUEST_TIMEOUT
         )
         resp.raise_for_status()
         data = resp.json()
@@ -243,6 +264,7 @@ def get_financial_benchmarks(industry: str, business_size: str) -> Dict[str, Any
         return {"error": f"Financial benchmark analysis failed: {str(e)}"}
 
 
+@cached_intelligence('growth_opportunities')
 def get_growth_opportunities(business_profile: Dict[str, Any]) -> Dict[str, Any]:
     """
     Get growth opportunities and market expansion insights.
@@ -275,7 +297,8 @@ def get_growth_opportunities(business_profile: Dict[str, Any]) -> Dict[str, Any]
                         }
                     }
                 }
-            }
+            },
+            timeout=REQUEST_TIMEOUT
         )
         resp.raise_for_status()
         data = resp.json()
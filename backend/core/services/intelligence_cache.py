@@ -0,0 +1,250 @@
+# backend/core/services/intelligence_cache.py
+"""
+Persistent TTL cache for paid web-intelligence lookups.
+
+Results are stored in IntelligenceCacheEntry keyed by a hash of the lookup name
+and its normalized arguments (case and whitespace folded), so businesses in the
+same industry and location share one upstream call. The Django cache holds a
+short-lived copy in front of the table.
+
+- Fresh entries (younger than the lookup's TTL) are returned as they are.
+- Expired entries still inside INTELLIGENCE_CACHE_STALE_TTL are returned
+  immediately while one background refresh replaces them.
+- Identical lookups already running in this process wait for that call
+  instead of making their own.
+- Error results are never stored; if an upstream call fails and an expired
+  entry exists, the expired entry is served.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from core.models import IntelligenceCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Seconds each lookup stays fresh; override per lookup with INTELLIGENCE_CACHE_TTLS
+DEFAULT_TTLS = {
+    'classify_business': 30 * 24 * 3600,
+    'market_intelligence': 24 * 3600,
+    'supplier_pricing': 12 * 3600,
+    'competitor_analysis': 24 * 3600,
+    'regulatory_updates': 12 * 3600,
+    'financial_benchmarks': 7 * 24 * 3600,
+    'growth_opportunities': 24 * 3600,
+}
+FRONT_CACHE_TIMEOUT = 5 * 60
+INFLIGHT_WAIT_TIMEOUT = 60
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return ' '.join(value.lower().split())
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def make_key(source, query):
+    raw = json.dumps([source, query], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def is_error_result(result):
+    return isinstance(result, dict) and 'error' in result
+
+
+class _InflightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class IntelligenceCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = defaultdict(Counter)
+
+    def ttl(self, source):
+        ttls = {**DEFAULT_TTLS, **getattr(settings, 'INTELLIGENCE_CACHE_TTLS', {})}
+        return ttls.get(source, 24 * 3600)
+
+    @property
+    def stale_ttl(self):
+        return getattr(settings, 'INTELLIGENCE_CACHE_STALE_TTL', 7 * 24 * 3600)
+
+    def get_or_fetch(self, source, query, fetch, is_error=is_error_result, refresh=False):
+        """
+        Cached result of fetch() for this source and query. fetch takes no
+        arguments; results for which is_error() is true are not stored. With
+        refresh, any stored entry is ignored: fetch() runs now and its result
+        replaces the entry (an error is returned as it is).
+        """
+        query = _normalize(query)
+        key = make_key(source, query)
+        entry = None if refresh else self._load(key)
+        now = timezone.now()
+
+        if entry and now < entry['expires_at']:
+            self._count(source, 'hits')
+            return entry['result']
+
+        def fetch_and_store():
+            result = fetch()
+            if is_error(result):
+                self._count(source, 'errors')
+            else:
+                self._store(key, source, query, result)
+            return result
+
+        if entry and now < entry['expires_at'] + timedelta(seconds=self.stale_ttl):
+            self._count(source, 'stale')
+            self._refresh_in_background(key, source, fetch_and_store)
+            return entry['result']
+
+        self._count(source, 'misses')
+        result = self._fetch_once(key, source, fetch_and_store)
+        if is_error(result) and entry:
+            # Upstream is failing: an old answer beats an error
+            return entry['result']
+        return result
+
+    def stats(self):
+        """Per-lookup hit/miss/stale/deduplicated/error counters for this process plus stored entries"""
+        entries = dict(
+            IntelligenceCacheEntry.objects.values_list('source').annotate(count=Count('key')).order_by()
+        )
+        with self._lock:
+            counters = {source: dict(counts) for source, counts in self._stats.items()}
+        report = {}
+        for source in sorted(set(DEFAULT_TTLS) | set(counters) | set(entries)):
+            counts = counters.get(source, {})
+            # Deduplicated lookups are misses that still avoided an upstream call
+            lookups = counts.get('hits', 0) + counts.get('stale', 0) + counts.get('misses', 0)
+            served = counts.get('hits', 0) + counts.get('stale', 0) + counts.get('deduplicated', 0)
+            report[source] = {
+                'hits': counts.get('hits', 0),
+                'stale': counts.get('stale', 0),
+                'misses': counts.get('misses', 0),
+                'deduplicated': counts.get('deduplicated', 0),
+                'errors': counts.get('errors', 0),
+                'hit_rate': round(served / lookups * 100, 2) if lookups else 0,
+                'entries': entries.get(source, 0),
+                'ttl_seconds': self.ttl(source),
+            }
+        return report
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    # -- internals --
+
+    def _count(self, source, name):
+        with self._lock:
+            self._stats[source][name] += 1
+
+    def _load(self, key):
+        entry = cache.get(f"intel:{key}")
+        if entry is None:
+            row = IntelligenceCacheEntry.objects.filter(key=key).values('result', 'fetched_at', 'expires_at').first()
+            if row is None:
+                return None
+            entry = row
+            cache.set(f"intel:{key}", entry, FRONT_CACHE_TIMEOUT)
+        return entry
+
+    def _store(self, key, source, query, result):
+        now = timezone.now()
+        entry = {'result': result, 'fetched_at': now, 'expires_at': now + timedelta(seconds=self.ttl(source))}
+        IntelligenceCacheEntry.objects.update_or_create(key=key, defaults={'source': source, 'query': query, **entry})
+        cache.set(f"intel:{key}", entry, FRONT_CACHE_TIMEOUT)
+
+    def _fetch_once(self, key, source, fetch):
+        """Run fetch unless an identical call is already running; then wait for its result"""
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+
+        if not leader:
+            self._count(source, 'deduplicated')
+            if call.done.wait(INFLIGHT_WAIT_TIMEOUT) and call.error is None:
+                return call.result
+            return fetch()
+
+        try:
+            call.result = fetch()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def _refresh_in_background(self, key, source, fetch):
+        with self._lock:
+            if key in self._inflight:
+                return
+
+        def run():
+            try:
+                self._fetch_once(key, source, fetch)
+            except Exception:
+                logger.exception("Background refresh of intelligence cache entry %s failed", key)
+            finally:
+                close_old_connections()
+
+        self._spawn(run)
+
+    def _spawn(self, target):
+        threading.Thread(target=target, name='intelligence-cache-refresh', daemon=True).start()
+
+
+intelligence_cache = IntelligenceCache()
+
+
+def cached_intelligence(source, is_error=is_error_result):
+    """
+    Decorator: serve a lookup function through the intelligence cache, keyed
+    on its arguments. Arguments are bound to parameter names with defaults
+    filled in, so f('retail'), f('retail', 'Kenya') and f(industry='retail')
+    share one entry. wrapper.refresh(...) skips the cache and stores a fresh
+    result; wrapper.uncached(...) is the plain function.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def lookup(args, kwargs, refresh):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            query = dict(bound.arguments)
+            return intelligence_cache.get_or_fetch(
+                source, query, lambda: func(*args, **kwargs), is_error=is_error, refresh=refresh
+            )
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return lookup(args, kwargs, refresh=False)
+        wrapper.refresh = lambda *args, **kwargs: lookup(args, kwargs, refresh=True)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,141 @@
+# backend/core/services/notification_counts.py
+"""
+Per-user unread notification counter.
+
+The count lives in NotificationCounter.unread_count and is changed with
+single atomic UPDATEs as notifications are created, read and deleted; the
+cache holds a copy for the polling endpoint. A missing counter row is seeded
+from the partial unread index on first read, so the counter never has to be
+backfilled and can always be repaired with recount_unread(). Every change
+publishes an unread_count event, which open streams and long-polls wake on.
+
+Each user's counter row also holds a notifications version, moved in the same
+transaction as every write to their notifications, for the list endpoint's
+ETag. It lives in the database rather than the cache so that writes from cron
+jobs and other processes reach every web worker.
+"""
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from core.events import event_broker, publish_event
+from core.models import Notification, NotificationCounter
+
+UNREAD_COUNT_CACHE_TIMEOUT = 5 * 60
+UPDATE_CHUNK_SIZE = 1000
+
+
+def _cache_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def _invalidate(user_ids):
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # A reader between now and commit would cache the old value again
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def recount_unread(user_id):
+    """Recount from the notifications table and store the result"""
+    count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    NotificationCounter.objects.update_or_create(user_id=user_id, defaults={'unread_count': count})
+    cache.set(_cache_key(user_id), count, UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def read_unread_count(user_id):
+    """Current value of the counter column (a primary key lookup), bypassing the cache"""
+    count = NotificationCounter.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first()
+    if count is None:
+        count = recount_unread(user_id)
+    return count
+
+
+def get_unread_count(user_id):
+    count = cache.get(_cache_key(user_id))
+    if count is None:
+        count = read_unread_count(user_id)
+        cache.set(_cache_key(user_id), count, UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_unread_count(user_id, delta):
+    """
+    Atomically add delta to the user's counter. Users without a counter row
+    are left alone; their count is computed the next time it is read.
+    """
+    adjust_unread_counts({user_id: delta})
+
+
+def adjust_unread_counts(deltas):
+    """adjust_unread_count for many users: one UPDATE per distinct delta and chunk of users"""
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    if not by_delta:
+        return
+    for delta, user_ids in by_delta.items():
+        for start in range(0, len(user_ids), UPDATE_CHUNK_SIZE):
+            NotificationCounter.objects.filter(user_id__in=user_ids[start:start + UPDATE_CHUNK_SIZE]).update(
+                unread_count=Greatest(F('unread_count') + delta, 0)
+            )
+    changed = [user_id for user_ids in by_delta.values() for user_id in user_ids]
+    _invalidate(changed)
+    for user_id in changed:
+        publish_event(user_id, 'unread_count', {})
+
+
+def wait_for_unread_change(user_id, since, timeout):
+    """
+    Long-poll: return the counter as soon as it differs from `since`, or the
+    unchanged value after `timeout` seconds. Sleeps until the event broker
+    delivers an event for the user instead of polling the table, and hands
+    the database connection back meanwhile. Reads the column rather than the
+    cache so changes made by other worker processes are seen; with more than
+    one worker those wake-ups need a cross-process EVENT_STREAM_BACKEND.
+    """
+    deadline = time.monotonic() + timeout
+    with event_broker.watch(user_id) as woken:
+        # Watching before the first read, so a change in between still wakes us
+        count = read_unread_count(user_id)
+        while count == since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not connection.in_atomic_block:
+                connection.close()
+            if not woken.wait(remaining):
+                break
+            woken.clear()
+            count = read_unread_count(user_id)
+    if count != since:
+        cache.set(_cache_key(user_id), count, UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def get_notifications_version(user_id):
+    """The user's notifications version, read from the counter row (seeded on first use)"""
+    version = NotificationCounter.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+    if version is None:
+        recount_unread(user_id)
+        version = NotificationCounter.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+    return version
+
+
+def bump_notifications_versions(user_ids):
+    """
+    Move each user to a new notifications version; call after any write to
+    their notifications, in the same transaction. Users without a counter row
+    have never been handed a version, so there is nothing to move.
+    """
+    user_ids = list(set(user_ids))
+    for start in range(0, len(user_ids), UPDATE_CHUNK_SIZE):
+        NotificationCounter.objects.filter(user_id__in=user_ids[start:start + UPDATE_CHUNK_SIZE]).update(
+            version=F('version') + 1
+        )
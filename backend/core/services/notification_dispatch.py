@@ -0,0 +1,123 @@
+# backend/core/services/notification_dispatch.py
+"""
+Fan-out of business events to every active member.
+
+Recipients for any number of businesses are resolved with one membership
+query plus one for the owners (who need no Membership row and count as
+business admins) and filtered by each user's notification_preferences. Rows are written
+with bulk_create, which skips post_save, so the unread counters and the event
+stream are updated here in bulk instead of by the Notification signals.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from core.events import publish_event
+from core.models import Notification
+from core.services.notification_counts import adjust_unread_counts, bump_notifications_versions
+from django.contrib.auth import get_user_model
+
+from users.models import Business, Membership
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def notification_payload(notification):
+    """What the event stream sends for a new notification"""
+    return {
+        'id': str(notification.id),
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'priority': notification.priority,
+        'action_url': notification.action_url,
+        'created_at': notification.created_at,
+    }
+
+
+def wants_notification(preferences, notification_type):
+    """
+    notification_preferences can turn in-app notifications off entirely
+    ({'in_app': False}) or per type ({'invoice_overdue': False}).
+    """
+    preferences = preferences or {}
+    return preferences.get('in_app') is not False and preferences.get(notification_type) is not False
+
+
+def resolve_recipients(business_ids, roles=None):
+    """
+    {business_id: {user_id: notification_preferences}} for the active members
+    and owner of each business, in two queries. With roles, only members with
+    one of those roles, and the owner only if business_admin is among them.
+    """
+    memberships = Membership.objects.filter(
+        business_id__in=business_ids, is_active=True, user__is_active=True
+    )
+    if roles:
+        memberships = memberships.filter(role_in_business__in=roles)
+
+    recipients = defaultdict(dict)
+    for business_id, user_id, preferences in memberships.values_list(
+        'business_id', 'user_id', 'user__profile__notification_preferences'
+    ):
+        recipients[business_id][user_id] = preferences
+    if not roles or 'business_admin' in roles:
+        for business_id, user_id, preferences in Business.objects.filter(
+            id__in=business_ids, owner__is_active=True
+        ).values_list('id', 'owner_id', 'owner__profile__notification_preferences'):
+            recipients[business_id][user_id] = preferences
+    return recipients
+
+
+def resolve_users(user_ids):
+    """{user_id: notification_preferences} for the active users among user_ids, in one query"""
+    if not user_ids:
+        return {}
+    return dict(get_user_model().objects.filter(pk__in=user_ids, is_active=True).values_list(
+        'pk', 'profile__notification_preferences'
+    ))
+
+
+def dispatch_business_notifications(events, roles=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Notify every active member of each event's business.
+
+    events: dicts with business_id plus Notification fields (title, message,
+    notification_type, priority, action_url, resource_type, resource_id, ...),
+    and optionally also_notify, ids of users to notify whatever their
+    membership (e.g. the payer).
+    roles: optionally only members with these role_in_business values.
+    Returns the number of notifications created.
+    """
+    events = list(events)
+    if not events:
+        return 0
+    recipients = resolve_recipients({event['business_id'] for event in events}, roles)
+    extra = resolve_users({user_id for event in events for user_id in event.get('also_notify', ())})
+
+    notifications = []
+    for event in events:
+        fields = dict(event)
+        business_id = fields.pop('business_id')
+        also_notify = fields.pop('also_notify', ())
+        notification_type = fields.get('notification_type', 'info')
+        users = dict(recipients.get(business_id, {}))
+        users.update((user_id, extra[user_id]) for user_id in also_notify if user_id in extra)
+        for user_id, preferences in users.items():
+            if wants_notification(preferences, notification_type):
+                notifications.append(Notification(user_id=user_id, business_id=business_id, **fields))
+    if not notifications:
+        return 0
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications, batch_size=batch_size)
+        adjust_unread_counts(Counter(n.user_id for n in notifications if not n.is_read))
+        bump_notifications_versions(n.user_id for n in notifications)
+        for notification in notifications:
+            publish_event(notification.user_id, 'notification', notification_payload(notification))
+    return len(notifications)
+
+
+def notify_business(business_id, roles=None, **fields):
+    """Notify the active members and owner of one business; fields are Notification fields (and also_notify)"""
+    return dispatch_business_notifications([dict(fields, business_id=business_id)], roles=roles)
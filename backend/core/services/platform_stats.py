@@ -0,0 +1,186 @@
+# backend/core/services/platform_stats.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from core.models import PlatformStatsSnapshot
+
+User = get_user_model()
+
+# Served snapshots older than this are recomputed inline (covers a missed refresh job)
+PLATFORM_STATS_MAX_AGE = getattr(settings, 'PLATFORM_STATS_MAX_AGE', 15 * 60)
+# Held by the one request recomputing a stale snapshot; expires on its own if that request dies
+REFRESH_LOCK_KEY = 'platform_stats:refreshing'
+REFRESH_LOCK_TIMEOUT = 5 * 60
+
+
+def _growth(current, previous):
+    return round((current - previous) / previous * 100, 2) if previous > 0 else 0
+
+
+def _rate(part, whole):
+    return round(part / whole * 100, 2) if whole > 0 else 0
+
+
+def compute_platform_stats():
+    """
+    Compute every platform metric used by the admin dashboards.
+    Each table is scanned once with conditional aggregates instead of one count() per metric.
+    """
+    from users.models import Business, Membership, UserProfile
+    from finance.models import Transaction, Invoice
+
+    now = timezone.now()
+    today = now.date()
+    last_30_days = today - timedelta(days=30)
+    last_60_days = today - timedelta(days=60)
+    this_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    users = User.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        joined_before_30_days=Count('id', filter=Q(date_joined__lt=last_30_days)),
+        daily_active=Count('id', filter=Q(last_login__date=today)),
+        weekly_active=Count('id', filter=Q(last_login__gte=now - timedelta(days=7))),
+        monthly_active=Count('id', filter=Q(last_login__gte=last_30_days)),
+    )
+    roles = dict(UserProfile.objects.values_list('role').annotate(count=Count('id')).order_by())
+
+    businesses = Business.objects.aggregate(
+        total=Count('id'),
+        created_before_30_days=Count('id', filter=Q(created_at__lt=last_30_days)),
+        this_month=Count('id', filter=Q(created_at__gte=this_month_start)),
+    )
+    memberships = Membership.objects.filter(is_active=True).aggregate(
+        total=Count('id'),
+        business_admins=Count('id', filter=Q(role_in_business='business_admin')),
+        staff=Count('id', filter=Q(role_in_business='staff')),
+        active_businesses=Count('business', distinct=True),
+    )
+
+    income = Q(transaction_type='income')
+    transactions = Transaction.objects.aggregate(
+        total=Count('id'),
+        total_revenue=Sum('amount', filter=income),
+        revenue_last_30=Sum('amount', filter=income & Q(transaction_date__gte=last_30_days)),
+        revenue_prev_30=Sum('amount', filter=income & Q(
+            transaction_date__gte=last_60_days, transaction_date__lt=last_30_days
+        )),
+    )
+    invoices = Invoice.objects.aggregate(
+        total=Count('id'),
+        paid=Count('id', filter=Q(status='paid')),
+        overdue=Count('id', filter=Q(status='overdue')),
+        avg_value=Avg('total_amount'),
+        businesses_with_invoices=Count('business', distinct=True),
+    )
+
+    top_businesses = Transaction.objects.filter(
+        income, transaction_date__gte=last_30_days
+    ).values(
+        'business', 'business__legal_name', 'business__business_model'
+    ).annotate(
+        revenue=Sum('amount'),
+        transactions=Count('id')
+    ).order_by('-revenue')[:10]
+
+    recent_users = User.objects.order_by('-date_joined')[:10].values('id', 'username', 'email', 'date_joined', 'is_active')
+    recent_businesses = Business.objects.order_by('-created_at')[:10].values('id', 'legal_name', 'created_at')
+
+    revenue_last_30 = float(transactions['revenue_last_30'] or 0)
+    revenue_prev_30 = float(transactions['revenue_prev_30'] or 0)
+
+    return {
+        'users': {
+            'total': users['total'],
+            'active': users['active'],
+            'inactive': users['total'] - users['active'],
+            'by_role': {
+                'admin': roles.get('admin', 0),
+                'owner': roles.get('owner', 0),
+                'data_entry': roles.get('data_entry', 0),
+            },
+        },
+        'businesses': {
+            'total': businesses['total'],
+            'active': memberships['active_businesses'],
+            'this_month': businesses['this_month'],
+        },
+        'memberships': {
+            'total': memberships['total'],
+            'business_admins': memberships['business_admins'],
+            'staff': memberships['staff'],
+        },
+        'financial': {
+            'total_transactions': transactions['total'],
+            'total_invoices': invoices['total'],
+            'paid_invoices': invoices['paid'],
+            'overdue_invoices': invoices['overdue'],
+        },
+        'analytics': {
+            'user_growth': _growth(users['total'], users['joined_before_30_days']),
+            'business_growth': _growth(businesses['total'], businesses['created_before_30_days']),
+            'revenue_growth': _growth(revenue_last_30, revenue_prev_30),
+            'active_rate': _rate(users['monthly_active'], users['total']),
+            'daily_active_users': users['daily_active'],
+            'weekly_active_users': users['weekly_active'],
+            'monthly_active_users': users['monthly_active'],
+            'total_revenue': float(transactions['total_revenue'] or 0),
+            'avg_invoice_value': float(invoices['avg_value'] or 0),
+            'payment_success_rate': _rate(invoices['paid'], invoices['total']),
+            'businesses_with_invoices': invoices['businesses_with_invoices'],
+            'top_businesses': [
+                {
+                    'id': item['business'],
+                    'name': item['business__legal_name'],
+                    'industry': item['business__business_model'] or 'N/A',
+                    'revenue': float(item['revenue']),
+                    'transactions': item['transactions'],
+                }
+                for item in top_businesses
+            ],
+        },
+        'recent_users': list(recent_users),
+        'recent_businesses': list(recent_businesses),
+    }
+
+
+def refresh_platform_stats():
+    """Compute and store a new snapshot"""
+    started = time.monotonic()
+    metrics = compute_platform_stats()
+    return PlatformStatsSnapshot.objects.create(
+        metrics=metrics,
+        duration_ms=int((time.monotonic() - started) * 1000),
+    )
+
+
+def get_platform_stats():
+    """
+    Latest snapshot for the dashboards. Falls back to computing one inline
+    when none exists yet or the refresh job has stopped running. Only the
+    caller that takes the refresh lock recomputes a stale snapshot; everyone
+    else is served the stale one meanwhile instead of piling on.
+    """
+    snapshot = PlatformStatsSnapshot.objects.order_by('-computed_at').first()
+    if snapshot is None:
+        return refresh_platform_stats()
+    if snapshot.computed_at < timezone.now() - timedelta(seconds=PLATFORM_STATS_MAX_AGE):
+        if cache.add(REFRESH_LOCK_KEY, True, REFRESH_LOCK_TIMEOUT):
+            try:
+                snapshot = refresh_platform_stats()
+            finally:
+                cache.delete(REFRESH_LOCK_KEY)
+    return snapshot
+
+
+def prune_platform_stats(keep=100):
+    """Delete all but the newest `keep` snapshots"""
+    stale_ids = PlatformStatsSnapshot.objects.order_by('-computed_at').values_list('id', flat=True)[keep:]
+    deleted, _ = PlatformStatsSnapshot.objects.filter(id__in=list(stale_ids)).delete()
+    return deleted
@@ -0,0 +1,53 @@
+# backend/core/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from finance.cache_utils import bump_business_data_version
+
+from .authentication import invalidate_cached_user
+from .events import publish_event
+from .models import ModuleAssignment, Notification
+from .services.notification_counts import adjust_unread_count, bump_notifications_versions
+from .services.notification_dispatch import notification_payload
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_on_save(sender, instance, **kwargs):
+    """Keep the JWT user cache in sync with the auth_user row"""
+    invalidate_cached_user(instance.pk, is_active=instance.is_active)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_on_delete(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk, is_active=False)
+
+
+@receiver(post_save, sender=ModuleAssignment)
+@receiver(post_delete, sender=ModuleAssignment)
+def invalidate_entitlements_on_module_change(sender, instance, **kwargs):
+    """
+    toggle_module and friends change what every member of the business can
+    see; entitlements are cached per data version (Membership writes move it
+    through the finance signals)
+    """
+    bump_business_data_version(instance.business_id)
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    bump_notifications_versions([instance.user_id])
+    if created and not instance.is_read:
+        adjust_unread_count(instance.user_id, 1)
+    if created:
+        publish_event(instance.user_id, 'notification', notification_payload(instance))
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    """Covers delete_notification as well as retention pruning"""
+    bump_notifications_versions([instance.user_id])
+    if not instance.is_read:
+        adjust_unread_count(instance.user_id, -1)
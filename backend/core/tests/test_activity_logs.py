@@ -0,0 +1,125 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.audit import AuditLogBuffer
+from core.models import ActivityLog, classify_action
+
+
+class ActivityLogAPITest(APITestCase):
+    """Test activity log browsing"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(username='auditor', email='auditor@example.com', password='adminpass123')
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_action_type_set_on_save(self):
+        log = ActivityLog.objects.create(action='Created business: Acme', resource_type='business')
+        self.assertEqual(log.action_type, 'business')
+        self.assertEqual(classify_action('User login succeeded'), 'login')
+        self.assertEqual(classify_action('Updated system settings', 'settings'), 'settings')
+        self.assertEqual(classify_action('Something else'), 'other')
+
+    def test_filter_by_type(self):
+        ActivityLog.objects.create(action='Locked account for x@example.com', resource_type='user')
+        ActivityLog.objects.create(action='Created business: Acme', resource_type='business')
+        response = self.client.get('/api/core/admin/activity-logs/?type=user')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([log['action_type'] for log in response.data['results']], ['user'])
+
+    def test_cursor_reaches_all_logs(self):
+        """Logs past the first page stay reachable"""
+        for i in range(7):
+            ActivityLog.objects.create(action=f'Created business {i}', resource_type='business')
+        ids = []
+        url = '/api/core/admin/activity-logs/?range=all&page_size=3'
+        response = self.client.get(url)
+        while True:
+            ids.extend(log['id'] for log in response.data['results'])
+            if not response.data['next_cursor']:
+                break
+            response = self.client.get(f"{url}&cursor={response.data['next_cursor']}")
+        self.assertEqual(ids, list(ActivityLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True)))
+
+    def test_security_logs_only_warning_and_critical(self):
+        ActivityLog.objects.create(action='Viewed page', severity='info')
+        ActivityLog.objects.create(action='Locked account', severity='critical')
+        response = self.client.get('/api/core/admin/security-logs/')
+        self.assertEqual([log['severity'] for log in response.data['results']], ['critical'])
+
+
+class AuditLogBufferTest(TestCase):
+    """Test the buffered ActivityLog writer (thread disabled, flushed by hand)"""
+
+    def setUp(self):
+        self.buffer = AuditLogBuffer()
+        self.buffer._ensure_thread = lambda: None
+        self.spool_path = os.path.join(tempfile.mkdtemp(), 'audit_spool.jsonl')
+
+    @override_settings(AUDIT_LOG_SYNC=False)
+    def test_entries_buffered_until_flush(self):
+        self.buffer.record(action='Created business: Acme', resource_type='business')
+        self.buffer.record(action='Locked account for x@example.com', resource_type='user')
+        self.assertEqual(ActivityLog.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('action_type', flat=True)), ['business', 'user']
+        )
+
+    @override_settings(AUDIT_LOG_SYNC=True)
+    def test_sync_mode_writes_immediately(self):
+        self.buffer.record(action='Updated system settings', resource_type='settings')
+        self.assertEqual(ActivityLog.objects.get().action_type, 'settings')
+
+    def test_failed_flush_is_spooled_and_replayed(self):
+        with override_settings(AUDIT_LOG_SYNC=False, AUDIT_LOG_SPOOL_PATH=self.spool_path):
+            self.buffer.record(action='Terminated session', resource_type='session', severity='warning')
+            with mock.patch.object(self.buffer, '_write', side_effect=Exception('db down')):
+                self.assertEqual(self.buffer.flush(), 0)
+            self.assertTrue(os.path.exists(self.spool_path))
+            self.assertEqual(ActivityLog.objects.count(), 0)
+
+            self.assertEqual(self.buffer.flush(), 1)
+            self.assertFalse(os.path.exists(self.spool_path))
+        self.assertEqual(ActivityLog.objects.get().severity, 'warning')
+
+    def test_bad_entry_quarantined_without_blocking_others(self):
+        with override_settings(AUDIT_LOG_SYNC=False, AUDIT_LOG_SPOOL_PATH=self.spool_path):
+            self.buffer.record(action='Created business: Acme', resource_type='business')
+            self.buffer.record(action='Broken entry', not_a_field='x')
+            self.assertEqual(self.buffer.flush(), 1)
+            self.assertFalse(os.path.exists(self.spool_path))
+            with open(self.buffer.quarantine_path) as quarantine:
+                self.assertIn('Broken entry', quarantine.read())
+        self.assertEqual(ActivityLog.objects.get().action, 'Created business: Acme')
+
+    def test_unreadable_spool_line_quarantined(self):
+        with open(self.spool_path, 'w') as spool:
+            spool.write('{not json\n')
+            spool.write('{"action": "Terminated session", "timestamp": "2026-01-01T00:00:00+00:00"}\n')
+        with override_settings(AUDIT_LOG_SPOOL_PATH=self.spool_path):
+            self.assertEqual(self.buffer.flush(), 1)
+            self.assertFalse(os.path.exists(self.spool_path))
+            with open(self.buffer.quarantine_path) as quarantine:
+                self.assertEqual(quarantine.read(), '{not json\n')
+        self.assertEqual(ActivityLog.objects.get().action, 'Terminated session')
+
+    def test_spool_claimed_by_one_flush(self):
+        """A second process flushing at the same time finds the spool already claimed"""
+        with open(self.spool_path, 'w') as spool:
+            spool.write('{"action": "Terminated session", "timestamp": "2026-01-01T00:00:00+00:00"}\n')
+        with override_settings(AUDIT_LOG_SPOOL_PATH=self.spool_path):
+            claimed = self.buffer._claim_spool()
+            self.assertIsNotNone(claimed)
+            self.assertEqual(AuditLogBuffer().flush(), 0)
+            self.assertEqual(len(self.buffer._read_spool(claimed)), 1)
@@ -0,0 +1,61 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import ActivityLog, FailedLoginAttempt, Notification
+from core.services.archive import find_archived, read_index
+
+
+class PruneAndArchiveTest(TestCase):
+    """Test chunked pruning into the compressed archive"""
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.user = User.objects.create_user(username='archived', email='archived@example.com', password='testpass123')
+        old = timezone.now() - timedelta(days=400)
+
+        self.old_logs = [ActivityLog.objects.create(action=f'Old action {i}', timestamp=old) for i in range(5)]
+        self.recent_log = ActivityLog.objects.create(action='Recent action')
+        FailedLoginAttempt.objects.create(username='x', ip_address='10.0.0.1', reason='bad password')
+        FailedLoginAttempt.objects.filter().update(attempted_at=old)
+
+        self.expired = Notification.objects.create(
+            user=self.user, title='Expired', message='gone', expires_at=timezone.now() - timedelta(days=1)
+        )
+        self.unread = Notification.objects.create(user=self.user, title='Unread', message='keep me')
+
+    def run_command(self, *args):
+        out = StringIO()
+        with override_settings(ARCHIVE_DIR=self.archive_dir):
+            call_command('prune_and_archive', '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_prunes_and_archives_in_chunks(self):
+        self.run_command()
+
+        self.assertEqual(list(ActivityLog.objects.all()), [self.recent_log])
+        self.assertEqual(FailedLoginAttempt.objects.count(), 0)
+        self.assertEqual(list(Notification.objects.all()), [self.unread])
+
+        index = read_index('activity_log', root=self.archive_dir)
+        self.assertEqual([entry['count'] for entry in index], [2, 2, 1])
+
+    def test_archived_rows_can_be_looked_up(self):
+        self.run_command()
+        row = find_archived('activity_log', self.old_logs[3].id, root=self.archive_dir)
+        self.assertEqual(row['action'], 'Old action 3')
+        row = find_archived('notification', self.expired.id, root=self.archive_dir)
+        self.assertEqual(row['title'], 'Expired')
+        self.assertIsNone(find_archived('activity_log', self.recent_log.id, root=self.archive_dir))
+
+    def test_dry_run_changes_nothing(self):
+        output = self.run_command('--dry-run')
+        self.assertIn('activity_log: would prune 5', output)
+        self.assertEqual(ActivityLog.objects.count(), 6)
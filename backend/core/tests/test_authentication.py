@@ -0,0 +1,84 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.authentication import get_cached_user
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    """Test cached JWT user resolution"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='cacheduser',
+            email='cached@example.com',
+            password='testpass123'
+        )
+        self.admin = User.objects.create_superuser(
+            username='superadmin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.access_token = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_user_served_from_cache(self):
+        """Second lookup should not touch the database"""
+        get_cached_user(self.user.id)
+        with self.assertNumQueries(0):
+            cached = get_cached_user(self.user.id)
+        self.assertEqual(cached.pk, self.user.pk)
+
+    def test_save_invalidates_cache(self):
+        get_cached_user(self.user.id)
+        self.user.first_name = 'Changed'
+        self.user.save()
+        self.assertEqual(get_cached_user(self.user.id).first_name, 'Changed')
+
+    def test_locked_user_rejected(self):
+        """Locking an account must take effect on the next request"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        response = self.client.get('/api/core/notifications/unread-count/')
+        self.assertEqual(response.status_code, 200)
+
+        admin_client = APIClient()
+        admin_token = str(RefreshToken.for_user(self.admin).access_token)
+        admin_client.credentials(HTTP_AUTHORIZATION=f'Bearer {admin_token}')
+        response = admin_client.post(f'/api/core/admin/users/{self.user.id}/lock/')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/core/notifications/unread-count/')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get('/api/core/notifications/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_password_reset_invalidates_cache(self):
+        get_cached_user(self.user.id)
+        admin_client = APIClient()
+        admin_token = str(RefreshToken.for_user(self.admin).access_token)
+        admin_client.credentials(HTTP_AUTHORIZATION=f'Bearer {admin_token}')
+        response = admin_client.post(
+            f'/api/users/admin/users/{self.user.id}/password/',
+            {'new_password': 'newpass12345'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(get_cached_user(self.user.id).check_password('newpass12345'))
+
+    def test_inactive_user_rejected_without_cache_flag(self):
+        """Deactivations that skipped the signal (e.g. queryset.update) are still caught"""
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        response = self.client.get('/api/core/notifications/unread-count/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_lightweight_auth_served_from_cache(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        self.client.get('/api/core/notifications/unread-count/')
+        with self.assertNumQueries(1):  # middleware connection check
+            response = self.client.get('/api/core/notifications/unread-count/')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.authentication import issue_stream_ticket
+from core import events
+from core.events import EventBroker, event_broker
+from core.models import Notification
+
+
+class EventBrokerTest(SimpleTestCase):
+    """Test the in-process event broker"""
+
+    def setUp(self):
+        self.broker = EventBroker()
+
+    async def test_stream_delivers_live_events(self):
+        stream = self.broker.stream(1)
+        self.assertTrue((await stream.__anext__()).startswith('retry:'))
+
+        # Events are published from sync code running in other threads
+        await asyncio.to_thread(self.broker._send, 1, 'payment', {'status': 'completed'})
+        chunk = await stream.__anext__()
+        self.assertIn('event: payment', chunk)
+        self.assertIn('"status": "completed"', chunk)
+
+        await stream.aclose()
+        self.assertNotIn('1', self.broker._subscribers)
+
+    async def test_resume_from_last_event_id(self):
+        for n in range(3):
+            self.broker._send(1, 'notification', {'n': n})
+        first_id = self.broker._history['1'][0]['id']
+
+        stream = self.broker.stream(1, last_event_id=first_id)
+        chunks = [await stream.__anext__() for _ in range(3)]
+        await stream.aclose()
+        self.assertTrue(chunks[0].startswith('retry:'))
+        self.assertIn('"n": 1', chunks[1])
+        self.assertIn('"n": 2', chunks[2])
+
+    @override_settings(EVENT_STREAM_BUFFER_SIZE=2)
+    async def test_resync_when_buffer_cannot_cover_gap(self):
+        for n in range(3):
+            self.broker._send(1, 'notification', {'n': n})
+        evicted_id = self.broker._evicted_up_to['1']
+
+        stream = self.broker.stream(1, last_event_id=evicted_id - 1)
+        await stream.__anext__()
+        self.assertIn('event: resync', await stream.__anext__())
+        await stream.aclose()
+
+    @override_settings(EVENT_STREAM_HISTORY_TTL=60)
+    async def test_idle_history_pruned(self):
+        self.broker._send(1, 'notification', {'n': 0})
+        # Ids are microsecond timestamps: make user 1's event two minutes old
+        self.broker._history['1'][-1]['id'] -= 120 * 1_000_000
+        old_id = self.broker._history['1'][-1]['id']
+        self.broker._last_prune -= events.PRUNE_INTERVAL
+
+        self.broker._send(2, 'notification', {'n': 1})
+        self.assertNotIn('1', self.broker._history)
+        self.assertIn('2', self.broker._history)
+        # The pruned events cannot be replayed, so a reconnect from before them resyncs
+        stream = self.broker.stream(1, last_event_id=old_id - 1)
+        await stream.__anext__()
+        self.assertIn('event: resync', await stream.__anext__())
+        await stream.aclose()
+
+    @override_settings(EVENT_STREAM_HEARTBEAT=0.01)
+    async def test_heartbeat(self):
+        stream = self.broker.stream(1)
+        await stream.__anext__()
+        self.assertEqual(await stream.__anext__(), ': ping\n\n')
+        await stream.aclose()
+
+
+class EventStreamAPITest(TestCase):
+    """Test the event stream endpoint and what feeds it"""
+
+    url = '/api/core/events/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='listener', email='listener@example.com', password='testpass123')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_requires_asgi(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_rejects_missing_or_bad_credentials(self):
+        client = AsyncClient()
+        response = await client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await client.get(self.url, headers={'Authorization': 'Bearer not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await client.get(f'{self.url}?ticket=not-a-ticket')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_access_token_not_accepted_in_url(self):
+        response = await AsyncClient().get(f'{self.url}?token={self.token}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_streams_with_header_token(self):
+        response = await AsyncClient().get(self.url, headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertTrue((await content.__anext__()).decode().startswith('retry:'))
+        await content.aclose()
+
+    def test_ticket_issued_to_authenticated_user(self):
+        response = self.client.post(f'{self.url}ticket/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(f'{self.url}ticket/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(self.token, response.data['ticket'])
+
+    async def test_ticket_opens_one_stream(self):
+        ticket = issue_stream_ticket(self.user.id)
+        client = AsyncClient()
+        response = await client.get(f'{self.url}?ticket={ticket}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await response.streaming_content.aclose()
+        response = await client.get(f'{self.url}?ticket={ticket}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_ticket_of_inactive_user_rejected(self):
+        ticket = issue_stream_ticket(self.user.id)
+        await User.objects.filter(pk=self.user.pk).aupdate(is_active=False)  # Locked from elsewhere: no signal
+        cache.clear()
+        response = await AsyncClient().get(f'{self.url}?ticket={ticket}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_expired_ticket_rejected(self):
+        ticket = issue_stream_ticket(self.user.id)
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 60):
+            response = await AsyncClient().get(f'{self.url}?ticket={ticket}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_new_notification_is_published_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(user=self.user, title='Paid', message='Invoice paid')
+        event = event_broker._history[str(self.user.id)][-1]
+        self.assertEqual(event['event'], 'notification')
+        self.assertEqual(event['data']['id'], str(notification.id))
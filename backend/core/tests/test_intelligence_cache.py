@@ -0,0 +1,139 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import IntelligenceCacheEntry
+from core.services import firecrawl
+from core.services.intelligence_cache import IntelligenceCache, intelligence_cache
+
+
+def firecrawl_response(extracted):
+    response = mock.Mock()
+    response.json.return_value = {'data': [], 'extracted': extracted}
+    return response
+
+
+@mock.patch.object(firecrawl, 'FIRECRAWL_API_KEY', 'test-key')
+class IntelligenceCacheTest(TestCase):
+    """Test the Firecrawl result cache"""
+
+    def setUp(self):
+        cache.clear()
+        intelligence_cache.reset_stats()
+
+    def expire_entries(self, by=timedelta(minutes=1)):
+        IntelligenceCacheEntry.objects.update(expires_at=timezone.now() - by)
+        cache.clear()
+
+    def test_equivalent_queries_share_one_upstream_call(self):
+        with mock.patch.object(firecrawl.requests, 'post', return_value=firecrawl_response({'market_size': '1B'})) as post:
+            first = firecrawl.get_market_intelligence('Retail ', 'kenya')
+            second = firecrawl.get_market_intelligence('retail', '  Kenya')
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(post.call_args.kwargs['timeout'], firecrawl.REQUEST_TIMEOUT)
+
+        stats = intelligence_cache.stats()['market_intelligence']
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_positional_keyword_and_default_arguments_share_one_entry(self):
+        with mock.patch.object(firecrawl.requests, 'post', return_value=firecrawl_response({'rules': []})) as post:
+            firecrawl.get_regulatory_updates('retail')
+            firecrawl.get_regulatory_updates('retail', 'Kenya')
+            firecrawl.get_regulatory_updates(industry='retail', location='Kenya')
+        self.assertEqual(post.call_count, 1)
+
+    def test_refresh_bypasses_and_replaces_fresh_entry(self):
+        with mock.patch.object(firecrawl.requests, 'post', return_value=firecrawl_response({'v': 1})):
+            firecrawl.get_financial_benchmarks('retail', 'SME')
+        with mock.patch.object(firecrawl.requests, 'post', return_value=firecrawl_response({'v': 2})) as post:
+            refreshed = firecrawl.get_financial_benchmarks.refresh('retail', 'SME')
+            cached = firecrawl.get_financial_benchmarks('retail', 'SME')
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(refreshed, cached)
+        self.assertEqual(IntelligenceCacheEntry.objects.count(), 1)
+
+    def test_errors_are_not_cached(self):
+        with mock.patch.object(firecrawl.requests, 'post', side_effect=firecrawl.requests.Timeout('slow')) as post:
+            self.assertIn('error', firecrawl.get_regulatory_updates('retail'))
+            self.assertIn('error', firecrawl.get_regulatory_updates('retail'))
+        self.assertEqual(post.call_count, 2)
+        self.assertFalse(IntelligenceCacheEntry.objects.exists())
+
+    def test_stale_entry_served_while_refreshing(self):
+        with mock.patch.object(firecrawl.requests, 'post', return_value=firecrawl_response({'v': 1})):
+            firecrawl.get_financial_benchmarks('retail', 'SME')
+        self.expire_entries()
+
+        # Run the background refresh inline
+        with mock.patch.object(intelligence_cache, '_spawn', side_effect=lambda target: target()), \
+                mock.patch.object(firecrawl.requests, 'post', return_value=firecrawl_response({'v': 2})):
+            stale = firecrawl.get_financial_benchmarks('retail', 'SME')
+        self.assertEqual(stale['financial_insights'], {'v': 1})
+
+        fresh = firecrawl.get_financial_benchmarks('retail', 'SME')
+        self.assertEqual(fresh['financial_insights'], {'v': 2})
+        self.assertEqual(intelligence_cache.stats()['financial_benchmarks']['stale'], 1)
+
+    @override_settings(INTELLIGENCE_CACHE_STALE_TTL=0)
+    def test_expired_entry_served_when_upstream_fails(self):
+        with mock.patch.object(firecrawl.requests, 'post', return_value=firecrawl_response({'v': 1})):
+            firecrawl.get_growth_opportunities({'industry': 'retail'})
+        self.expire_entries(by=timedelta(days=1))
+
+        with mock.patch.object(firecrawl.requests, 'post', side_effect=firecrawl.requests.ConnectionError()):
+            result = firecrawl.get_growth_opportunities({'industry': 'retail'})
+        self.assertEqual(result['opportunity_insights'], {'v': 1})
+
+    def test_stats_endpoint_requires_super_admin(self):
+        client = APIClient()
+        user = User.objects.create_user(username='plain', email='plain@example.com', password='testpass123')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.assertEqual(client.get('/api/core/admin/intelligence-cache/').status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_superuser(username='boss', email='boss@example.com', password='testpass123')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(admin).access_token}')
+        response = client.get('/api/core/admin/intelligence-cache/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('market_intelligence', response.data)
+
+
+class InflightDeduplicationTest(SimpleTestCase):
+    """Identical concurrent lookups make one upstream call"""
+
+    def test_followers_wait_for_leader(self):
+        intel = IntelligenceCache()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return {'answer': 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(intel._fetch_once('k', 'test', fetch)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        # Let every thread reach the in-flight table before the leader finishes
+        deadline = time.monotonic() + 5
+        while intel._stats['test']['deduplicated'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'answer': 42}] * 4)
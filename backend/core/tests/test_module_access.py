@@ -0,0 +1,104 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import ModuleAssignment
+from users.models import Business, Membership
+
+
+class UserModulesAPITest(APITestCase):
+    """Test cached module entitlements"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', email='member@example.com', password='testpass123')
+        self.admin = User.objects.create_superuser(username='root', email='root@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Module Business')
+        Membership.objects.create(business=self.business, user=self.user, role_in_business='staff')
+        ModuleAssignment.objects.create(business=self.business, module_id='invoices', module_name='Invoices')
+
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.admin_client = APIClient()
+        admin_token = str(RefreshToken.for_user(self.admin).access_token)
+        self.admin_client.credentials(HTTP_AUTHORIZATION=f'Bearer {admin_token}')
+
+    def module_ids(self, response):
+        return {m['module_id'] for m in response.data}
+
+    def test_modules_include_required_and_assigned(self):
+        response = self.client.get('/api/core/user/modules/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.module_ids(response), {'invoices', 'voice-assistant', 'settings'})
+        self.assertIn('ETag', response)
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get('/api/core/user/modules/')['ETag']
+        response = self.client.get('/api/core/user/modules/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_toggle_module_invalidates_entitlements(self):
+        etag = self.client.get('/api/core/user/modules/')['ETag']
+        response = self.admin_client.post(
+            f'/api/core/admin/businesses/{self.business.id}/modules/transactions/',
+            {'enabled': True},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get('/api/core/user/modules/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('transactions', self.module_ids(response))
+
+    def test_membership_deactivation_invalidates_entitlements(self):
+        self.client.get('/api/core/user/modules/')
+        membership = Membership.objects.get(user=self.user)
+        membership.is_active = False
+        membership.save()
+
+        response = self.client.get('/api/core/user/modules/')
+        self.assertEqual(self.module_ids(response), {'voice-assistant', 'settings'})
+
+    def test_changes_from_other_processes_are_seen(self):
+        from finance.cache_utils import bump_business_data_version
+        self.client.get('/api/core/user/modules/')
+        # What a shell or cron job leaves behind: rows and version moved, this process's cache untouched
+        ModuleAssignment.objects.bulk_create([
+            ModuleAssignment(business=self.business, module_id='reports', module_name='Reports & Analytics')
+        ])
+        bump_business_data_version(self.business.id)
+        self.assertIn('reports', self.module_ids(self.client.get('/api/core/user/modules/')))
+
+
+class BootstrapAPITest(APITestCase):
+    """Test the combined bootstrap endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bootuser', email='boot@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Boot Business')
+        Membership.objects.create(business=self.business, user=self.user, role_in_business='owner')
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_bootstrap_sections(self):
+        response = self.client.get('/api/bootstrap/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['me']['memberships'][0]['business_name'], 'Boot Business')
+        self.assertEqual(response.data['dashboard']['business']['role'], 'owner')
+        self.assertEqual(response.data['unread_notifications'], 0)
+        self.assertTrue(any(m['module_id'] == 'settings' for m in response.data['modules']))
+
+    def test_bootstrap_etag_revalidation(self):
+        etag = self.client.get('/api/bootstrap/')['ETag']
+        response = self.client.get('/api/bootstrap/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_bootstrap_rejects_foreign_business(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        business = Business.objects.create(owner=other, legal_name='Other Business')
+        response = self.client.get(f'/api/bootstrap/?business_id={business.id}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
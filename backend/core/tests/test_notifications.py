@@ -0,0 +1,231 @@
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import Notification, NotificationCounter
+from core.services.notification_counts import get_unread_count, read_unread_count, recount_unread
+from core.services.notification_dispatch import dispatch_business_notifications, notify_business
+from finance.models import Invoice
+from users.models import Business, Membership, UserProfile
+
+
+class UnreadNotificationCountTest(APITestCase):
+    """Test the counter-cached unread notification count"""
+
+    url = '/api/core/notifications/unread-count/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='testpass123')
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def notify(self, **kwargs):
+        return Notification.objects.create(user=self.user, title='Hello', message='World', **kwargs)
+
+    def count(self):
+        return self.client.get(self.url).data['count']
+
+    def test_counter_follows_create_read_and_delete(self):
+        first = self.notify()
+        self.assertEqual(self.count(), 1)  # Seeds the counter row
+        second = self.notify()
+        self.notify(is_read=True)
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread_count, 2)
+
+        self.client.post(f'/api/core/notifications/{first.id}/read/')
+        self.assertEqual(self.count(), 1)
+
+        self.client.delete(f'/api/core/notifications/{second.id}/delete/')
+        self.assertEqual(self.count(), 0)
+
+        self.notify()
+        self.notify()
+        response = self.client.post('/api/core/notifications/mark-all-read/')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(self.count(), 0)
+        self.assertEqual(recount_unread(self.user.id), 0)
+
+    def test_count_does_not_scan_notifications(self):
+        for _ in range(3):
+            self.notify()
+        self.assertEqual(self.count(), 3)
+        with mock.patch('core.services.notification_counts.Notification.objects.filter') as scan:
+            self.assertEqual(self.count(), 3)
+        scan.assert_not_called()
+
+    def test_list_revalidates_after_one_query(self):
+        first = self.notify()
+        response = self.client.get('/api/core/notifications/')
+        etag = response['ETag']
+        with self.assertNumQueries(2):  # middleware connection check + notifications version
+            response = self.client.get('/api/core/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(f'/api/core/notifications/{first.id}/read/')
+        response = self.client.get('/api/core/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.notify(is_read=True)  # Leaves the unread count alone, but not the list
+        self.assertEqual(self.client.get('/api/core/notifications/', HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+
+    def test_bulk_dispatch_changes_the_list_etag(self):
+        business = Business.objects.create(owner=self.user, legal_name='Reader Shop')
+        Membership.objects.create(user=self.user, business=business, role_in_business='business_admin')
+        etag = self.client.get('/api/core/notifications/')['ETag']
+        cache.clear()  # As seen from another worker
+        self.assertEqual(dispatch_business_notifications([{'business_id': business.id, 'title': 'Overdue',
+                                                           'message': 'Pay up'}]), 1)
+        self.assertEqual(self.client.get('/api/core/notifications/', HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+
+    def test_long_poll_returns_immediately_when_count_differs(self):
+        self.notify()
+        response = self.client.get(f'{self.url}?since=0&wait=10')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'count': 1, 'changed': True})
+
+    def test_long_poll_waits_for_change(self):
+        self.assertEqual(self.count(), 0)
+        waits = []
+        real_wait = threading.Event.wait
+
+        def wait(flag, timeout=None):
+            # A notification arrives while the request is being held; its
+            # unread_count event is what wakes the poll, not a timer
+            waits.append(timeout)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.notify()
+            return real_wait(flag, 0)
+
+        with mock.patch.object(threading.Event, 'wait', autospec=True, side_effect=wait):
+            with mock.patch('core.services.notification_counts.read_unread_count',
+                            wraps=read_unread_count) as reads:
+                response = self.client.get(f'{self.url}?since=0&wait=10')
+        self.assertEqual(response.data, {'count': 1, 'changed': True})
+        self.assertEqual(len(waits), 1)
+        self.assertEqual(reads.call_count, 2)
+
+    def test_mark_as_read_decrements_once(self):
+        notification = self.notify()
+        self.notify()
+        self.assertEqual(self.count(), 2)
+        stale_copy = Notification.objects.get(pk=notification.pk)
+        notification.mark_as_read()
+        stale_copy.mark_as_read()  # Still thinks it is unread
+        self.assertEqual(self.count(), 1)
+        self.assertTrue(stale_copy.is_read)
+        self.assertEqual(stale_copy.read_at, notification.read_at)
+
+    def test_long_poll_times_out_unchanged(self):
+        response = self.client.get(f'{self.url}?since=0&wait=0')
+        self.assertEqual(response.data, {'count': 0, 'changed': False})
+
+    def test_long_poll_rejects_bad_params(self):
+        response = self.client.get(f'{self.url}?since=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NotificationDispatchTest(APITestCase):
+    """Test business-wide notification fan-out"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='testpass123')
+        self.muted = User.objects.create_user(username='muted', email='muted@example.com', password='testpass123')
+        self.former = User.objects.create_user(username='former', email='former@example.com', password='testpass123')
+        UserProfile.objects.create(user=self.muted, notification_preferences={'invoice_overdue': False})
+
+        self.business = Business.objects.create(owner=self.owner, legal_name='Fan-out Ltd')
+        Membership.objects.create(user=self.owner, business=self.business, role_in_business='business_admin')
+        Membership.objects.create(user=self.staff, business=self.business, role_in_business='staff')
+        Membership.objects.create(user=self.muted, business=self.business, role_in_business='staff')
+        Membership.objects.create(user=self.former, business=self.business, role_in_business='staff', is_active=False)
+
+    def test_reaches_active_members_and_respects_preferences(self):
+        get_unread_count(self.owner.id)  # Seed a counter row so the bulk update is exercised
+        created = notify_business(self.business.id, title='Overdue', message='1 invoice', notification_type='invoice_overdue')
+        self.assertEqual(created, 2)
+        self.assertEqual(
+            set(Notification.objects.values_list('user__username', flat=True)), {'owner', 'staff'}
+        )
+        self.assertEqual(NotificationCounter.objects.get(user=self.owner).unread_count, 1)
+        self.assertEqual(get_unread_count(self.staff.id), 1)
+
+        # Other types still reach the muted member
+        self.assertEqual(notify_business(self.business.id, title='Paid', message='x', notification_type='mpesa_payment'), 3)
+
+    def test_owner_and_payer_without_membership_are_notified(self):
+        from finance.models import MpesaPayment
+        owner = User.objects.create_user(username='solo', email='solo@example.com', password='testpass123')
+        payer = User.objects.create_user(username='payer', email='payer@example.com', password='testpass123')
+        business = Business.objects.create(owner=owner, legal_name='No Members Ltd')  # As BusinessViewSet creates it
+        payment = MpesaPayment.objects.create(
+            business=business, user=payer, phone_number='254700000000', amount=Decimal('150.00'),
+            status='initiated', checkout_request_id='ws_CO_1'
+        )
+        response = self.client.post('/api/finance/mpesa/callback/', {'Body': {'stkCallback': {
+            'CheckoutRequestID': 'ws_CO_1', 'ResultCode': 0, 'ResultDesc': 'OK',
+            'CallbackMetadata': {'Item': [{'Name': 'MpesaReceiptNumber', 'Value': 'QK1'}]},
+        }}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(Notification.objects.filter(resource_id=str(payment.id)).values_list('user__username', flat=True)),
+            {'solo', 'payer'}
+        )
+        # Role-targeted fan-out leaves the owner out unless admins are targeted
+        self.assertEqual(notify_business(business.id, roles=['staff'], title='Stock take', message='x'), 0)
+
+    def test_query_count_independent_of_business_count(self):
+        others = []
+        for i in range(4):
+            member = User.objects.create_user(username=f'member{i}', email=f'member{i}@example.com', password='x')
+            business = Business.objects.create(owner=member, legal_name=f'Other {i}')
+            Membership.objects.create(user=member, business=business)
+            others.append(business)
+
+        def events(businesses):
+            return [{'business_id': b.id, 'title': 'Low cash', 'message': 'x', 'notification_type': 'low_cash'}
+                    for b in businesses]
+
+        with CaptureQueriesContext(connection) as one:
+            dispatch_business_notifications(events([self.business]))
+        with CaptureQueriesContext(connection) as many:
+            dispatch_business_notifications(events([self.business] + others))
+        self.assertEqual(len(one), len(many))
+
+    def test_create_notification_for_all_members(self):
+        token = str(RefreshToken.for_user(self.owner).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = self.client.post('/api/core/notifications/create/', {
+            'business': self.business.id, 'all_members': True, 'roles': ['staff'],
+            'title': 'Stock take', 'message': 'Friday 4pm', 'notification_type': 'system',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 2})
+
+    def test_notify_overdue_invoices_command(self):
+        Invoice.objects.create(
+            business=self.business, user=self.owner, invoice_number='INV-OLD', customer_name='Customer',
+            subtotal=Decimal('100.00'), total_amount=Decimal('100.00'), status='sent',
+            issue_date='2024-01-01', due_date='2024-01-31'
+        )
+        out = StringIO()
+        call_command('notify_overdue_invoices', stdout=out)
+        self.assertEqual(Invoice.objects.get(invoice_number='INV-OLD').status, 'overdue')
+        self.assertIn('sent 2 notification(s)', out.getvalue())
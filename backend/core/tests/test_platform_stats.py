@@ -0,0 +1,81 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import PlatformStatsSnapshot
+from core.services.platform_stats import (
+    REFRESH_LOCK_KEY, compute_platform_stats, get_platform_stats, refresh_platform_stats
+)
+from users.models import Business, Membership, UserProfile
+
+
+class PlatformStatsSnapshotTest(APITestCase):
+    """Test materialized platform statistics"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def create_business(self, i):
+        user = User.objects.create_user(username=f'owner{i}', email=f'owner{i}@example.com', password='testpass123')
+        UserProfile.objects.create(user=user, role='owner')
+        business = Business.objects.create(owner=user, legal_name=f'Business {i}')
+        Membership.objects.create(business=business, user=user, role_in_business='business_admin')
+
+    def test_compute_metrics(self):
+        for i in range(3):
+            self.create_business(i)
+        stats = compute_platform_stats()
+        self.assertEqual(stats['users']['total'], 4)
+        self.assertEqual(stats['users']['by_role']['owner'], 3)
+        self.assertEqual(stats['businesses']['active'], 3)
+        self.assertEqual(stats['memberships']['business_admins'], 3)
+
+    def test_query_count_independent_of_table_size(self):
+        self.create_business(0)
+        with self.assertNumQueries(9):
+            compute_platform_stats()
+        for i in range(1, 6):
+            self.create_business(i)
+        with self.assertNumQueries(9):
+            compute_platform_stats()
+
+    def test_dashboard_reads_snapshot(self):
+        snapshot = refresh_platform_stats()
+        self.create_business(0)
+        response = self.client.get('/api/users/admin/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Served from the snapshot, so the new business is not counted until the next refresh
+        self.assertEqual(response.data['businesses']['total'], 0)
+        self.assertEqual(response.data['as_of'], snapshot.computed_at)
+
+    def test_refresh_command(self):
+        out = StringIO()
+        call_command('refresh_platform_stats', '--keep', '1', stdout=out)
+        call_command('refresh_platform_stats', '--keep', '1', stdout=out)
+        self.assertEqual(PlatformStatsSnapshot.objects.count(), 1)
+        self.assertIn('Platform stats refreshed', out.getvalue())
+
+    def test_stale_snapshot_refreshed_by_one_caller(self):
+        cache.delete(REFRESH_LOCK_KEY)
+        stale = refresh_platform_stats()
+        PlatformStatsSnapshot.objects.filter(pk=stale.pk).update(computed_at=timezone.now() - timedelta(hours=1))
+
+        # Another request is already recomputing: serve the stale snapshot without waiting
+        cache.add(REFRESH_LOCK_KEY, True)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_platform_stats().pk, stale.pk)
+
+        cache.delete(REFRESH_LOCK_KEY)
+        fresh = get_platform_stats()
+        self.assertNotEqual(fresh.pk, stale.pk)
+        self.assertIsNone(cache.get(REFRESH_LOCK_KEY))
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from finance.cache_utils import get_business_data_version
+from users.management.commands.reclassify_businesses import website_domain
+from users.models import Business
+
+
+class ReclassifyBusinessesTest(TestCase):
+    """Test the batch reclassification command"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        self.acme = Business.objects.create(owner=self.owner, legal_name='Acme', website='https://www.acme.com/')
+        self.acme_shop = Business.objects.create(owner=self.owner, legal_name='Acme Shop', website='http://acme.com/shop')
+        self.moved = Business.objects.create(
+            owner=self.owner, legal_name='Moved', website='https://new.example.com',
+            classified_website='https://old.example.com', last_classified_at=timezone.now()
+        )
+        self.fresh = Business.objects.create(
+            owner=self.owner, legal_name='Fresh', website='https://fresh.example.com',
+            classified_website='https://fresh.example.com', last_classified_at=timezone.now() - timedelta(days=1)
+        )
+        Business.objects.create(owner=self.owner, legal_name='Offline')
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmp.name, 'checkpoint.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_command(self, classify, **options):
+        out = StringIO()
+        with mock.patch('users.management.commands.reclassify_businesses.classify_business_from_website.refresh',
+                        side_effect=classify) as fake:
+            call_command('reclassify_businesses', checkpoint=self.checkpoint, stdout=out, **options)
+        return fake, out.getvalue()
+
+    def test_website_domain(self):
+        self.assertEqual(website_domain('https://www.Acme.com:443/about'), 'acme.com')
+        self.assertEqual(website_domain('acme.com'), 'acme.com')
+
+    def test_classifies_stale_and_moved_once_per_domain(self):
+        version = get_business_data_version(self.acme.pk)
+        fake, out = self.run_command(lambda website: ('retail', 0.9, {'site': website}), batch_size=2)
+        self.assertGreater(get_business_data_version(self.acme.pk), version)  # bulk_update skips the signals
+
+        self.assertEqual(sorted(call.args[0] for call in fake.call_args_list),
+                         ['https://new.example.com', 'https://www.acme.com/'])
+        for business in (self.acme, self.acme_shop, self.moved):
+            business.refresh_from_db()
+            self.assertEqual(business.classified_category, 'retail')
+            self.assertEqual(business.classified_website, business.website)
+        self.fresh.refresh_from_db()
+        self.assertEqual(self.fresh.classified_category, '')
+        self.assertIn('Classified 3 business(es) from 2 domain(s)', out)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_failures_are_left_for_the_next_run(self):
+        self.run_command(lambda website: ('unknown', 0.0, {'error': 'timeout'}))
+        self.acme.refresh_from_db()
+        self.assertIsNone(self.acme.last_classified_at)
+
+    def test_resumes_from_checkpoint(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'cutoff': (timezone.now() - timedelta(days=30)).isoformat(), 'last_pk': self.acme_shop.pk}, f)
+        fake, out = self.run_command(lambda website: ('services', 0.8, {}))
+
+        self.assertIn(f'Resuming after business {self.acme_shop.pk}', out)
+        self.assertEqual([call.args[0] for call in fake.call_args_list], ['https://new.example.com'])
+        self.acme.refresh_from_db()
+        self.assertIsNone(self.acme.last_classified_at)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.settings import api_settings
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.throttling import check_rate, parse_rate, take_token
+from users.models import Business
+
+
+class TokenBucketTest(SimpleTestCase):
+    """Test the shared-cache token bucket"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/min'), (5, 60))
+        self.assertEqual(parse_rate('10/hour'), (10, 3600))
+        self.assertIsNone(parse_rate(None))
+
+    def test_bursts_then_refills_steadily(self):
+        with mock.patch('core.throttling.time.time', return_value=1000.0) as clock:
+            self.assertEqual([take_token('bucket', 3, 60) for _ in range(3)], [0, 0, 0])
+            self.assertAlmostEqual(take_token('bucket', 3, 60), 20.0)  # One token every 20 s
+            clock.return_value = 1010.0
+            self.assertAlmostEqual(take_token('bucket', 3, 60), 10.0)
+            clock.return_value = 1020.0
+            self.assertEqual(take_token('bucket', 3, 60), 0)
+            clock.return_value = 5000.0
+            self.assertEqual([take_token('bucket', 3, 60) for _ in range(3)], [0, 0, 0])  # Never more than the burst
+            self.assertGreater(take_token('bucket', 3, 60), 0)
+
+    def test_buckets_per_user_and_business(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'kavi_chat': '1/min'}):
+            self.assertEqual(check_rate('kavi_chat', 1, 7), 0)
+            self.assertGreater(check_rate('kavi_chat', 1, 7), 0)
+            self.assertEqual(check_rate('kavi_chat', 1, 8), 0)
+            self.assertEqual(check_rate('kavi_chat', 2, 7), 0)
+            self.assertEqual(check_rate('unlimited', 1, 7), 0)
+
+
+class ThrottledEndpointTest(APITestCase):
+    """Test throttles on expensive endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.admin).access_token}')
+
+    def test_admin_analytics_returns_retry_after(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'admin_analytics': '2/min'}):
+            codes = [self.client.get('/api/users/admin/analytics/').status_code for _ in range(3)]
+            self.assertEqual(codes, [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS])
+            response = self.client.get('/api/users/admin/analytics/')
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_stk_push_is_limited_per_business(self):
+        shop, kiosk = (Business.objects.create(owner=self.admin, legal_name=name) for name in ('Shop', 'Kiosk'))
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'mpesa_stk_push': '1/min'}):
+            first = self.client.post('/api/finance/mpesa/initiate/', {'business': shop.id}, format='json')
+            second = self.client.post('/api/finance/mpesa/initiate/', {'business': shop.id}, format='json')
+            other = self.client.post('/api/finance/mpesa/initiate/', {'business': kiosk.id}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)  # Let through, then rejected as incomplete
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_businesses_share_the_user_bucket(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'mpesa_stk_push': '1/min'}):
+            codes = [self.client.post('/api/finance/mpesa/initiate/', {'business': business_id}, format='json').status_code
+                     for business_id in (9001, 9002, 9003)]
+        self.assertEqual(codes, [status.HTTP_400_BAD_REQUEST] + [status.HTTP_429_TOO_MANY_REQUESTS] * 2)
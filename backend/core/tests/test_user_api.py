@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
@@ -272,4 +274,52 @@ class UserAuthenticationAPITest(APITestCase):
         response = self.client.post(self.refresh_url, data, format='json')
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('access', response.data)
\ No newline at end of file
+        self.assertIn('access', response.data)
+
+class AdminUserListAPITest(APITestCase):
+    """Test paginated admin user listings"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        for i in range(5):
+            user = User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            UserProfile.objects.create(user=user, role='admin' if i == 0 else 'data_entry')
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_users_list_cursor_pagination(self):
+        """Walking the cursor returns every user exactly once"""
+        seen = []
+        url = '/api/users/admin/users/?page_size=2&sort_by=username&order=asc'
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(u['username'] for u in response.data['results'])
+            if not response.data['next_cursor']:
+                break
+            response = self.client.get(url + f"&cursor={response.data['next_cursor']}")
+        self.assertEqual(seen, sorted(User.objects.values_list('username', flat=True)))
+
+    def test_users_list_query_count_is_constant(self):
+        """Query count must not grow with the number of users"""
+        self.client.get('/api/users/admin/users/')
+        with CaptureQueriesContext(connection) as before:
+            self.client.get('/api/users/admin/users/')
+        for i in range(5, 15):
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+        with CaptureQueriesContext(connection) as after:
+            self.client.get('/api/users/admin/users/')
+        self.assertEqual(len(before), len(after))
+
+    def test_users_list_filters(self):
+        response = self.client.get('/api/users/admin/users/?role=admin')
+        self.assertEqual([u['username'] for u in response.data['results']], ['user0'])
+        response = self.client.get('/api/users/admin/users/?search=user3')
+        self.assertEqual([u['username'] for u in response.data['results']], ['user3'])
+
+    def test_list_all_admins(self):
+        response = self.client.get('/api/users/admin/admins/all/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([u['username'] for u in response.data['results']], ['user0'])
+        self.assertEqual(response.data['results'][0]['role'], 'admin')
@@ -0,0 +1,160 @@
+# backend/core/throttling.py
+"""
+Token-bucket rate limits for expensive endpoints, kept in the shared cache.
+
+Each scope (an endpoint class such as STK push or KAVI chat) has a rate in
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], in DRF's "<requests>/<period>"
+form. It allows bursts of up to <requests> and refills steadily at that rate.
+There is one bucket per scope, user (or client IP) and business, so one
+runaway client cannot use up the workers or the upstream quotas of everyone
+else. Only a business the user belongs to gets its own bucket; any other
+business id shares the user's bucket, so made-up ids cannot mint fresh ones.
+A scope without a rate is not limited.
+
+A check is one cache round trip. With Django's Redis cache the bucket is
+refilled and drawn from in a single Lua script, which makes the check atomic
+across processes. Any other backend gets a read-modify-write under a process
+lock: exact for the local-memory cache, which is per process anyway, and a
+close approximation on a shared memcached or database cache.
+"""
+import math
+import threading
+import time
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS[1] bucket; ARGV capacity, refill per second, now, ttl. Returns the seconds to wait, "0" if allowed.
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(state[1]) or capacity
+local stamp = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - stamp, 0) * refill)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'stamp', now)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return tostring(wait)
+"""
+
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """(capacity, period in seconds) of a rate such as "5/min"; None for no limit"""
+    if not rate:
+        return None
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period.strip()[0]]
+
+
+def get_rate(scope):
+    return parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+
+
+def _redis_client(key):
+    """Redis client holding key when the default cache is Django's Redis backend, otherwise None"""
+    try:
+        from django.core.cache.backends.redis import RedisCache
+    except ImportError:
+        return None
+    if not isinstance(cache, RedisCache):
+        return None
+    return cache._cache.get_client(key, write=True)
+
+
+def take_token(key, capacity, period):
+    """Draw one token from the bucket at key; returns 0 if allowed, else the seconds until a token is free"""
+    refill = capacity / period
+    now = time.time()
+    ttl = int(math.ceil(period)) + 1  # A bucket left alone this long is full again, same as a missing one
+
+    redis_key = cache.make_and_validate_key(key)
+    client = _redis_client(redis_key)
+    if client is not None:
+        return float(client.eval(TAKE_TOKEN_SCRIPT, 1, redis_key, capacity, refill, now, ttl))
+
+    with _lock:
+        tokens, stamp = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + max(now - stamp, 0) * refill)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill
+        cache.set(key, (tokens, now), ttl)
+    return wait
+
+
+def check_rate(scope, ident, business_id=None):
+    """0 if a request of ident (for business_id) in scope may go ahead, else the seconds to wait"""
+    rate = get_rate(scope)
+    if rate is None:
+        return 0.0
+    return take_token(f"throttle:{scope}:{ident}:{business_id or '-'}", *rate)
+
+
+def retry_after(wait):
+    """Retry-After header value for a wait in seconds"""
+    return str(max(int(math.ceil(wait)), 1))
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle for one scope. The business comes from the view's
+    business_kwarg URL argument if set, else from a business or business_id
+    field of the body or query string, and counts only if the user owns or is
+    a member of it. DRF sends the Retry-After header.
+    """
+    scope = None
+    business_kwarg = None
+
+    def allow_request(self, request, view):
+        ident = request.user.pk if request.user and request.user.is_authenticated else self.get_ident(request)
+        self.wait_seconds = check_rate(self.scope, ident, self.get_business_id(request, view))
+        return not self.wait_seconds
+
+    def get_business_id(self, request, view):
+        """The requested business if the user may act for it, else None (the per-user bucket)"""
+        business_id = self.get_requested_business_id(request, view)
+        if not business_id or not (request.user and request.user.is_authenticated):
+            return None
+        from finance.cache_utils import get_user_business_ids
+        # Throttles run before the view checks access: a cached lookup, no query once warm
+        return business_id if business_id in {str(pk) for pk in get_user_business_ids(request.user.pk)} else None
+
+    def get_requested_business_id(self, request, view):
+        if self.business_kwarg:
+            business_id = view.kwargs.get(self.business_kwarg)
+            return str(business_id) if business_id else None
+        for source in (request.data if hasattr(request.data, 'get') else {}, request.query_params):
+            business_id = source.get('business') or source.get('business_id')
+            if business_id:
+                return str(business_id)[:64]
+        return None
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class MpesaSTKPushThrottle(TokenBucketThrottle):
+    scope = 'mpesa_stk_push'
+
+
+class BusinessClassifyThrottle(TokenBucketThrottle):
+    scope = 'business_classify'
+    business_kwarg = 'pk'
+
+
+class AdminAnalyticsThrottle(TokenBucketThrottle):
+    scope = 'admin_analytics'
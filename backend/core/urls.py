@@ -10,6 +10,7 @@ urlpatterns = [
     path('admin/sessions/<int:session_id>/terminate/', views.terminate_session, name='terminate-session'),
     path('admin/failed-logins/', views.failed_logins, name='failed-logins'),
     path('admin/users/<int:user_id>/lock/', views.lock_user_account, name='lock-user'),
+    path('admin/intelligence-cache/', views.intelligence_cache_stats, name='intelligence-cache-stats'),
     
     # Activity Logs
     path('admin/activity-logs/', views.activity_logs, name='activity-logs'),
@@ -29,4 +30,8 @@ urlpatterns = [
     path('notifications/mark-all-read/', views.mark_all_notifications_read, name='mark-all-notifications-read'),
     path('notifications/create/', views.create_notification, name='create-notification'),
     path('notifications/<uuid:notification_id>/delete/', views.delete_notification, name='delete-notification'),
+    
+    # Server-sent events (served under ASGI)
+    path('events/', views.event_stream, name='event-stream'),
+    path('events/ticket/', views.event_stream_ticket, name='event-stream-ticket'),
 ]
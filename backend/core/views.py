@@ -3,16 +3,27 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from datetime import timedelta
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from .audit import audit_log
+from .authentication import (
+    LightweightJWTAuthentication, authenticate_stream_request, issue_stream_ticket, redeem_stream_ticket
+)
+from .cache_utils import compute_etag, etag_matches, not_modified, set_etag
 from .models import ActivityLog, UserSession, FailedLoginAttempt, ModuleAssignment, Notification
+from .pagination import keyset_paginate
 from .serializers import (
     ActivityLogSerializer, UserSessionSerializer,
     FailedLoginAttemptSerializer, ModuleAssignmentSerializer, NotificationSerializer
 )
-from users.models import Business
+from .services.entitlements import get_user_entitlements, module_name
+from .services.notification_counts import (
+    adjust_unread_count, bump_notifications_versions, get_notifications_version, get_unread_count,
+    wait_for_unread_change,
+)
+from users.models import Business, Membership
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -63,7 +74,7 @@ def is_super_admin(user):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def security_logs(request):
-    """Get security-related activity logs"""
+    """Get security-related activity logs, cursor paginated"""
     if not is_super_admin(request.user):
         return Response(
             {"error": "Super admin access required"},
@@ -71,12 +82,14 @@ def security_logs(request):
         )
     
     # Get logs with warning or critical severity
-    logs = ActivityLog.objects.filter(
-        severity__in=['warning', 'critical']
-    ).select_related('user')[:100]
+    severity = request.GET.get('severity')
+    severities = [severity] if severity in ('warning', 'critical') else ['warning', 'critical']
+    logs = ActivityLog.objects.filter(severity__in=severities).select_related('user')
+    logs = filter_by_date_range(logs, 'timestamp', request.GET.get('range', 'all'))
     
-    serializer = ActivityLogSerializer(logs, many=True)
-    return Response(serializer.data)
+    page, next_cursor = keyset_paginate(logs, request, ordering='-timestamp')
+    serializer = ActivityLogSerializer(page, many=True)
+    return Response({'results': serializer.data, 'next_cursor': next_cursor})
 
 
 @api_view(['GET'])
@@ -113,7 +126,7 @@ def terminate_session(request, session_id):
         session.save()
         
         # Log the action
-        ActivityLog.objects.create(
+        audit_log(
             user=request.user,
             action=f"Terminated session for {session.user.email}",
             resource_type="session",
@@ -134,21 +147,23 @@ def terminate_session(request, session_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def failed_logins(request):
-    """Get failed login attempts from last 24 hours"""
+    """Get failed login attempts (last 24 hours by default), cursor paginated"""
     if not is_super_admin(request.user):
         return Response(
             {"error": "Super admin access required"},
             status=status.HTTP_403_FORBIDDEN
         )
     
-    # Get failed logins from last 24 hours
-    since = timezone.now() - timedelta(hours=24)
-    attempts = FailedLoginAttempt.objects.filter(
-        attempted_at__gte=since
-    ).order_by('-attempted_at')
+    attempts = FailedLoginAttempt.objects.select_related('user')
+    attempts = filter_by_date_range(attempts, 'attempted_at', request.GET.get('range', 'day'))
     
-    serializer = FailedLoginAttemptSerializer(attempts, many=True)
-    return Response(serializer.data)
+    ip_address = request.GET.get('ip')
+    if ip_address:
+        attempts = attempts.filter(ip_address=ip_address)
+    
+    page, next_cursor = keyset_paginate(attempts, request, ordering='-attempted_at')
+    serializer = FailedLoginAttemptSerializer(page, many=True)
+    return Response({'results': serializer.data, 'next_cursor': next_cursor})
 
 
 @api_view(['POST'])
@@ -168,7 +183,7 @@ def lock_user_account(request, user_id):
         user.save()
         
         # Log the action
-        ActivityLog.objects.create(
+        audit_log(
             user=request.user,
             action=f"Locked account for {user.email}",
             resource_type="user",
@@ -191,44 +206,36 @@ def lock_user_account(request, user_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def activity_logs(request):
-    """Get activity logs with filtering"""
+    """
+    Get activity logs with filtering, newest first.
+    Query params: type, user, range (today|day|week|month|all), page_size, cursor
+    """
     if not is_super_admin(request.user):
         return Response(
             {"error": "Super admin access required"},
             status=status.HTTP_403_FORBIDDEN
         )
     
-    logs = ActivityLog.objects.select_related('user').all()
+    logs = ActivityLog.objects.select_related('user')
     
     # Apply filters
     action_type = request.GET.get('type')
     user_id = request.GET.get('user')
     date_range = request.GET.get('range', 'today')
     
-    # Filter by action type
+    # Filter by action type (indexed column, set on save)
     if action_type and action_type != 'all':
-        logs = logs.filter(action__icontains=action_type)
+        logs = logs.filter(action_type=action_type)
     
     # Filter by user
     if user_id and user_id != 'all':
         logs = logs.filter(user_id=user_id)
     
-    # Filter by date range
-    now = timezone.now()
-    if date_range == 'today':
-        logs = logs.filter(timestamp__date=now.date())
-    elif date_range == 'week':
-        week_ago = now - timedelta(days=7)
-        logs = logs.filter(timestamp__gte=week_ago)
-    elif date_range == 'month':
-        month_ago = now - timedelta(days=30)
-        logs = logs.filter(timestamp__gte=month_ago)
-    
-    # Limit to last 100 logs
-    logs = logs[:100]
+    logs = filter_by_date_range(logs, 'timestamp', date_range)
     
-    serializer = ActivityLogSerializer(logs, many=True)
-    return Response(serializer.data)
+    page, next_cursor = keyset_paginate(logs, request, ordering='-timestamp')
+    serializer = ActivityLogSerializer(page, many=True)
+    return Response({'results': serializer.data, 'next_cursor': next_cursor})
 
 
 # ==================== MODULE ASSIGNMENT ENDPOINTS ====================
@@ -297,60 +304,13 @@ def business_modules(request, business_id):
 @permission_classes([IsAuthenticated])
 def user_modules(request):
     """Get modules accessible to the current user"""
-    user = request.user
+    entitlements = get_user_entitlements(request.user)
     
-    # Super admins have access to all modules
-    if user.is_superuser:
-        all_modules = [
-            {'module_id': 'transactions', 'enabled': True, 'module_name': 'Transactions'},
-            {'module_id': 'invoices', 'enabled': True, 'module_name': 'Invoices'},
-            {'module_id': 'cash-flow', 'enabled': True, 'module_name': 'Cash Flow'},
-            {'module_id': 'credit', 'enabled': True, 'module_name': 'Credit Management'},
-            {'module_id': 'suppliers', 'enabled': True, 'module_name': 'Suppliers'},
-            {'module_id': 'clients', 'enabled': True, 'module_name': 'Clients'},
-            {'module_id': 'reports', 'enabled': True, 'module_name': 'Reports & Analytics'},
-            {'module_id': 'insights', 'enabled': True, 'module_name': 'AI Insights'},
-            {'module_id': 'proactive-alerts', 'enabled': True, 'module_name': 'Proactive Alerts'},
-            {'module_id': 'team', 'enabled': True, 'module_name': 'Team Management'},
-            {'module_id': 'voice-assistant', 'enabled': True, 'module_name': 'KAVI Voice Assistant'},
-            {'module_id': 'settings', 'enabled': True, 'module_name': 'Settings'},
-        ]
-        return Response(all_modules)
-    
-    # Get user's business memberships
-    from users.models import Membership
-    memberships = Membership.objects.filter(user=user, is_active=True)
-    
-    if not memberships.exists():
-        # Return only required modules if no business membership
-        return Response([
-            {'module_id': 'voice-assistant', 'enabled': True, 'module_name': 'KAVI Voice Assistant'},
-            {'module_id': 'settings', 'enabled': True, 'module_name': 'Settings'},
-        ])
-    
-    # Get modules for all businesses user belongs to
-    business_ids = memberships.values_list('business_id', flat=True)
-    assignments = ModuleAssignment.objects.filter(
-        business_id__in=business_ids,
-        enabled=True
-    ).values('module_id', 'module_name').distinct()
-    
-    enabled_modules = [
-        {'module_id': a['module_id'], 'enabled': True, 'module_name': a.get('module_name', a['module_id'].title())} 
-        for a in assignments
-    ]
-    
-    # Add required modules (always enabled) if not already present
-    required_modules = [
-        {'module_id': 'voice-assistant', 'enabled': True, 'module_name': 'KAVI Voice Assistant'},
-        {'module_id': 'settings', 'enabled': True, 'module_name': 'Settings'},
-    ]
-    
-    for req_mod in required_modules:
-        if not any(m['module_id'] == req_mod['module_id'] for m in enabled_modules):
-            enabled_modules.append(req_mod)
-    
-    return Response(enabled_modules)
+    # Let clients revalidate cheaply on every navigation
+    if etag_matches(request, entitlements['etag']):
+        return not_modified(entitlements['etag'])
+    
+    return set_etag(Response(entitlements['modules']), entitlements['etag'])
 
 
 @api_view(['POST'])
@@ -367,28 +327,12 @@ def toggle_module(request, business_id, module_id):
         business = Business.objects.get(id=business_id)
         enabled = request.data.get('enabled', True)
         
-        # Module names mapping - Complete list
-        module_names = {
-            'transactions': 'Transactions',
-            'invoices': 'Invoices',
-            'cash-flow': 'Cash Flow',
-            'credit': 'Credit Management',
-            'suppliers': 'Suppliers',
-            'clients': 'Clients',
-            'reports': 'Reports & Analytics',
-            'insights': 'AI Insights',
-            'proactive-alerts': 'Proactive Alerts',
-            'team': 'Team Management',
-            'voice-assistant': 'KAVI Voice Assistant',
-            'settings': 'Settings'
-        }
-        
         # Get or create module assignment
         assignment, created = ModuleAssignment.objects.get_or_create(
             business=business,
             module_id=module_id,
             defaults={
-                'module_name': module_names.get(module_id, module_id.title()),
+                'module_name': module_name(module_id),
                 'enabled': enabled,
                 'assigned_by': request.user
             }
@@ -399,7 +343,7 @@ def toggle_module(request, business_id, module_id):
             assignment.save()
         
         # Log the action
-        ActivityLog.objects.create(
+        audit_log(
             user=request.user,
             action=f"{'Enabled' if enabled else 'Disabled'} {module_id} module for {business.legal_name}",
             resource_type="module_assignment",
@@ -423,9 +367,15 @@ def toggle_module(request, business_id, module_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def notifications(request):
-    """Get all notifications for the current user"""
+    """Get all notifications for the current user (revalidate with If-None-Match)"""
     user = request.user
     
+    # Answered from the counter row alone while nothing has changed
+    etag = compute_etag('notifications', user.id, sorted(request.query_params.lists()),
+                        get_notifications_version(user.id))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     # Query parameters
     is_read = request.query_params.get('is_read')
     notification_type = request.query_params.get('type')
@@ -445,7 +395,7 @@ def notifications(request):
     try:
         notifications = notifications.select_related('business')[:limit]
         serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        return set_etag(Response(serializer.data), etag)
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -455,13 +405,30 @@ def notifications(request):
 
 
 @api_view(['GET'])
+@authentication_classes([LightweightJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def unread_notifications_count(request):
-    """Get count of unread notifications"""
+    """
+    Get count of unread notifications.
+    Long-poll with ?since=<last count>&wait=<seconds>: the response is held
+    until the count differs from `since` or the wait runs out.
+    """
+    from django.conf import settings
+
     user = request.user
     try:
-        count = Notification.objects.filter(user=user, is_read=False).count()
-        return Response({'count': count})
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'count': get_unread_count(user.id)})
+
+        try:
+            since = int(since)
+            wait = float(request.query_params.get('wait', 25))
+        except ValueError:
+            return Response({'error': 'since and wait must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        wait = max(0, min(wait, getattr(settings, 'NOTIFICATION_LONG_POLL_MAX_WAIT', 25)))
+        count = wait_for_unread_change(user.id, since, wait)
+        return Response({'count': count, 'changed': count != since})
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -495,13 +462,19 @@ def mark_all_notifications_read(request):
         is_read=True,
         read_at=timezone.now()
     )
+    adjust_unread_count(user.id, -updated)
+    bump_notifications_versions([user.id])
     return Response({'updated': updated})
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_notification(request):
-    """Create a notification (for system use or admin)"""
+    """
+    Create a notification (for system use or admin).
+    With all_members=true it goes to every active member of `business`
+    (optionally only `roles`), subject to their notification preferences.
+    """
     user = request.user
     
     # Only super admins or business admins can create notifications
@@ -514,6 +487,19 @@ def create_notification(request):
                 status=status.HTTP_403_FORBIDDEN
             )
     
+    # Business-wide: one notification per active member
+    if str(request.data.get('all_members', '')).lower() in ('1', 'true'):
+        from .serializers import BusinessNotificationSerializer
+        from .services.notification_dispatch import notify_business
+
+        serializer = BusinessNotificationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields = dict(serializer.validated_data)
+        business = fields.pop('business')
+        created = notify_business(business.id, roles=fields.pop('roles', None), **fields)
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+    
     # Get target user (default to current user)
     target_user_id = request.data.get('user_id') or request.data.get('user')
     if target_user_id:
@@ -549,8 +535,158 @@ def delete_notification(request, notification_id):
         )
 
 
+# ==================== APP BOOTSTRAP ENDPOINT ====================
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def bootstrap(request):
+    """
+    Everything the SPA needs for first paint in one round trip:
+    current user with memberships, enabled modules, unread notification count
+    and the user dashboard. Memberships are resolved once and shared.
+    """
+    from users.serializers import UserSerializer
+    from users.views import EMPTY_USER_DASHBOARD, build_user_dashboard, membership_summary
+
+    user = request.user
+    business_id = request.query_params.get('business_id')
+
+    memberships = list(
+        Membership.objects.filter(user=user, is_active=True).select_related('business').order_by('created_at')
+    )
+
+    me = UserSerializer(user).data
+    me['memberships'] = [membership_summary(m) for m in memberships]
+
+    # Dashboard business: the requested one if the user belongs to it, otherwise the first membership
+    membership = None
+    if business_id:
+        membership = next((m for m in memberships if str(m.business_id) == str(business_id)), None)
+        if membership is None and not user.is_superuser:
+            return Response({'error': 'Not a member of this business'}, status=status.HTTP_403_FORBIDDEN)
+    elif memberships:
+        membership = memberships[0]
+
+    if membership is not None:
+        dashboard = build_user_dashboard(user, membership.business, membership.role_in_business)
+    elif business_id:
+        business = Business.objects.filter(id=business_id).first()
+        if business is None:
+            return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
+        dashboard = build_user_dashboard(user, business, 'viewer')
+    else:
+        dashboard = EMPTY_USER_DASHBOARD
+
+    payload = {
+        'me': me,
+        'modules': get_user_entitlements(user)['modules'],
+        'unread_notifications': get_unread_count(user.id),
+        'dashboard': dashboard,
+    }
+
+    etag = compute_etag(payload)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return set_etag(Response(payload), etag)
+
+
+# ==================== INTELLIGENCE CACHE ENDPOINT ====================
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def intelligence_cache_stats(request):
+    """Hit rates and stored entries of the Firecrawl result cache (counters are per worker process)"""
+    if not is_super_admin(request.user):
+        return Response(
+            {"error": "Super admin access required"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    from .services.intelligence_cache import intelligence_cache
+    return Response(intelligence_cache.stats())
+
+
+# ==================== EVENT STREAM ENDPOINT ====================
+
+@api_view(['POST'])
+@authentication_classes([LightweightJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def event_stream_ticket(request):
+    """Single-use ticket for opening the event stream from EventSource, which cannot send the token header"""
+    return Response({'ticket': issue_stream_ticket(request.user.id)})
+
+
+async def event_stream(request):
+    """
+    Server-sent events for the current user: payment status changes and new
+    notifications. EventSource cannot set headers, so browsers authenticate
+    with ?ticket= from event_stream_ticket; other clients send the usual
+    Authorization header. Reconnects resume from the Last-Event-ID header (or
+    ?last_event_id=). Needs an ASGI server; under WSGI the stream would tie up
+    a worker for its whole lifetime, so it is refused.
+    """
+    from asgiref.sync import sync_to_async
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+    from .events import event_broker
+
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Event stream requires an ASGI server'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    ticket = request.GET.get('ticket')
+    if ticket:
+        user_id = await sync_to_async(redeem_stream_ticket)(ticket)
+        if user_id is None:
+            return JsonResponse({'error': 'Invalid or expired stream ticket'}, status=status.HTTP_401_UNAUTHORIZED)
+    else:
+        try:
+            user = await sync_to_async(authenticate_stream_request)(request)
+        except (InvalidToken, TokenError, AuthenticationFailed) as e:
+            return JsonResponse({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+        if user is None:
+            return JsonResponse({'error': 'Authentication credentials were not provided'},
+                                status=status.HTTP_401_UNAUTHORIZED)
+        user_id = user.id
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(
+        event_broker.stream(user_id, last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering
+    return response
+
+
 # ==================== HELPER FUNCTIONS ====================
 
+def filter_by_date_range(queryset, field, date_range):
+    """
+    Restrict queryset to a named range with plain range predicates on field,
+    so the timestamp indexes can be used (unlike __date lookups).
+    """
+    now = timezone.now()
+    if date_range == 'today':
+        start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    elif date_range == 'day':
+        start = now - timedelta(hours=24)
+    elif date_range == 'week':
+        start = now - timedelta(days=7)
+    elif date_range == 'month':
+        start = now - timedelta(days=30)
+    else:
+        return queryset
+    return queryset.filter(**{f'{field}__gte': start})
+
+
 def get_client_ip(request):
     """Get client IP address from request"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -562,8 +698,8 @@ def get_client_ip(request):
 
 
 def log_activity(user, action, resource_type=None, resource_id=None, details=None, request=None, severity='info'):
-    """Helper function to log activities"""
-    ActivityLog.objects.create(
+    """Helper function to log activities (buffered, see core.audit)"""
+    audit_log(
         user=user,
         action=action,
         resource_type=resource_type,
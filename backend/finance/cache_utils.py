@@ -58,4 +58,86 @@ def invalidate_dashboard_cache(user_id, business_id=None):
             cache.delete(cache_key)
         # Delete without business_id (all businesses view)
         cache_key_all = f"dashboard:user_{user_id}:business_:period_{period}"
-        cache.delete(cache_key_all)
\ No newline at end of file
+        cache.delete(cache_key_all)
+
+def get_business_data_version(business_id):
+    """
+    Current data version for a business (a primary key lookup). Any cache
+    entry keyed on it goes stale as soon as a transaction, invoice, budget etc.
+    of that business changes, whichever process made the change.
+    """
+    from finance.models import BusinessDataVersion
+    version = BusinessDataVersion.objects.filter(business_id=business_id).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_business_data_version(business_id):
+    """
+    Invalidate every versioned cache entry of a business. Runs in the caller's
+    transaction, so the new version is seen exactly when the write is.
+    """
+    if not business_id:
+        return
+    from django.db import IntegrityError, transaction
+    from django.db.models import F
+    from finance.models import BusinessDataVersion
+    versions = BusinessDataVersion.objects.filter(business_id=business_id)
+    if versions.update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            BusinessDataVersion.objects.create(business_id=business_id, version=1)
+    except IntegrityError:
+        # Created by a concurrent write meanwhile
+        versions.update(version=F('version') + 1)
+
+
+USER_BUSINESSES_CACHE_TIMEOUT = 60 * 60  # Invalidated by the Membership and Business signals; TTL is a safety net
+
+
+def _user_businesses_key(user_id):
+    return f"user_business_ids:{user_id}"
+
+
+def get_user_business_ids(user_id):
+    """Ids of the businesses a user owns or is an active member of, cached until that changes"""
+    key = _user_businesses_key(user_id)
+    business_ids = cache.get(key)
+    if business_ids is None:
+        from django.db.models import Q
+        from users.models import Business
+        business_ids = sorted(set(Business.objects.filter(
+            Q(owner_id=user_id) | Q(memberships__user_id=user_id, memberships__is_active=True)
+        ).values_list('id', flat=True)))
+        cache.set(key, business_ids, USER_BUSINESSES_CACHE_TIMEOUT)
+    return business_ids
+
+
+def invalidate_user_business_ids(user_ids):
+    cache.delete_many([_user_businesses_key(user_id) for user_id in user_ids])
+
+
+def business_data_etag(request, scope, *parts, business_param='business'):
+    """
+    ETag for a response built from the requesting user's data in their
+    businesses (or the one named by business_param). It changes with the data
+    version of any of those businesses, with the user's set of businesses and
+    with the query string and parts. Both come from one indexed query, so
+    writes made by any process (cron jobs, management commands, the admin)
+    are seen at once. None for anonymous users and superusers (who see every
+    business): serve those without one.
+    """
+    from django.db.models import Q
+    from core.cache_utils import compute_etag
+    from users.models import Business
+    user = request.user
+    if not user.is_authenticated or user.is_superuser:
+        return None
+    versions = dict(Business.objects.filter(
+        Q(owner_id=user.id) | Q(memberships__user_id=user.id, memberships__is_active=True)
+    ).values_list('id', 'data_version__version'))
+    requested = request.query_params.get(business_param)
+    if requested:
+        versions = {business_id: version for business_id, version in versions.items() if str(business_id) == requested}
+    versions = {business_id: version or 0 for business_id, version in versions.items()}
+    return compute_etag(scope, user.id, sorted(request.query_params.lists()), sorted(versions.items()), *parts)
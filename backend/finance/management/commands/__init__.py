@@ -0,0 +1 @@
+"""Commands package for finance management commands."""
@@ -0,0 +1,64 @@
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from finance.services.langchain_service import BUILDERS, langchain_available, registry
+
+IMPORT_SNIPPET = (
+    'import importlib, time; started = time.perf_counter(); '
+    'importlib.import_module({module!r}); print(time.perf_counter() - started)'
+)
+
+
+class Command(BaseCommand):
+    help = ('Time a cold import of the LangChain service and of the LangChain stack, then the first and '
+            'repeated builds of the shared advisor and chatbot')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per import timing (default: 5)')
+        parser.add_argument('--skip-build', action='store_true', help='Only time the imports')
+
+    def handle(self, *args, **options):
+        repeat = max(options['repeat'], 1)
+        self.stdout.write('Cold import (median of %d fresh interpreters):' % repeat)
+        self.report_import('finance.services.langchain_service', repeat)
+
+        if not langchain_available():
+            self.stdout.write(self.style.WARNING('LangChain is not installed; skipping the stack import and builds'))
+            return
+        self.report_import('finance.services.langchain_components', repeat)
+
+        if options['skip_build']:
+            return
+        self.stdout.write('Shared objects:')
+        for name, factory in BUILDERS.items():
+            started = time.perf_counter()
+            try:
+                registry.get(name, factory)
+            except Exception as e:
+                self.stderr.write(f'  {name}: build failed: {e}')
+                continue
+            first = time.perf_counter() - started
+            started = time.perf_counter()
+            registry.get(name, factory)
+            reused = time.perf_counter() - started
+            self.stdout.write(f'  {name}: first build {first * 1000:.1f} ms, reused {reused * 1000:.3f} ms')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def report_import(self, module, repeat):
+        timings = []
+        for _ in range(repeat):
+            result = subprocess.run(
+                [sys.executable, '-c', IMPORT_SNIPPET.format(module=module)],
+                cwd=settings.BASE_DIR, capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                self.stderr.write(f'  {module}: import failed\n{result.stderr.strip()}')
+                return
+            timings.append(float(result.stdout.strip()))
+        self.stdout.write(f'  {module}: {statistics.median(timings) * 1000:.1f} ms')
@@ -0,0 +1,58 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from finance.services.ledger_index import LedgerIndex
+
+SUPPLIERS = ['Bidco', 'Unga Ltd', 'Kapa Oil', 'Brookside', 'Safaricom', 'Kenya Power', 'Twiga Foods', 'Naivas']
+CUSTOMERS = ['Wanjiku', 'Otieno', 'Mama Mboga', 'Hotel Sawa', 'Chai Point', 'Jua Kali Works']
+ITEMS = ['maize flour', 'cooking oil', 'milk', 'airtime', 'electricity token', 'sugar', 'rent', 'transport',
+         'packaging', 'wages', 'soap', 'bread', 'eggs', 'tomatoes', 'water bill', 'delivery']
+QUESTIONS = [
+    'How much did I pay Bidco for cooking oil?',
+    'When did Hotel Sawa last pay?',
+    'Show my Kenya Power electricity token payments',
+    'What did Twiga Foods deliver?',
+    'transport costs this month',
+]
+
+
+class Command(BaseCommand):
+    help = 'Build a synthetic ledger index and time incremental updates and assistant lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Ledger rows to index (default: 100000)')
+        parser.add_argument('--queries', type=int, default=200, help='Lookups to time (default: 200)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        index = LedgerIndex()
+
+        started = time.perf_counter()
+        for n in range(options['rows']):
+            supplier = rng.choice(SUPPLIERS) if n % 2 else ''
+            customer = '' if n % 2 else rng.choice(CUSTOMERS)
+            description = f"{rng.choice(ITEMS)} and {rng.choice(ITEMS)} ref {n}"
+            index.add(('transaction', str(n)), f"{description} {supplier} {customer}", {'id': n})
+        build = time.perf_counter() - started
+        self.stdout.write(f'Built {len(index)} rows in {build:.1f} s')
+
+        timings = []
+        for n in range(100):
+            started = time.perf_counter()
+            index.add(('transaction', str(uuid.uuid4())), f"{rng.choice(ITEMS)} {rng.choice(SUPPLIERS)}", {'id': n})
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(f'Incremental add: median {statistics.median(timings) * 1000:.3f} ms')
+
+        timings = []
+        for n in range(options['queries']):
+            started = time.perf_counter()
+            index.search(QUESTIONS[n % len(QUESTIONS)], k=5)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(f'Lookup: median {statistics.median(timings) * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms')
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_conversation_history'),
+        ('users', '0008_business_classified_website'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessDataVersion',
+            fields=[
+                ('business', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='data_version', serialize=False, to='users.business')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -465,4 +465,79 @@ class MpesaPayment(models.Model):
         ]
     
     def __str__(self):
-        return f"M-Pesa Payment: {self.amount} KES - {self.status}"
\ No newline at end of file
+        return f"M-Pesa Payment: {self.amount} KES - {self.status}"
+
+class Conversation(models.Model):
+    """
+    A KAVI assistant conversation (typed or voice); its messages are append-only.
+    The row doubles as the conversation's summary for history listings.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='assistant_conversations')
+    business = models.ForeignKey('users.Business', on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='assistant_conversations')
+    
+    # Rolling memory: messages up to summarized_through_seq are folded into summary
+    summary = models.TextField(blank=True)
+    summarized_through_seq = models.PositiveIntegerField(default=0)
+    last_seq = models.PositiveIntegerField(default=0)  # Also the message count, as seqs have no gaps
+    
+    # History listing, kept up to date with each turn
+    preview = models.CharField(max_length=200, blank=True)  # Latest question
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', '-updated_at']),
+            models.Index(fields=['user', '-last_message_at', '-id'], name='finance_conv_user_history_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Conversation {self.id} ({self.user_id})"
+
+
+class ConversationMessage(models.Model):
+    """One message of a conversation, numbered by seq within it"""
+    
+    ROLE_CHOICES = [
+        ('user', 'User'),
+        ('assistant', 'Assistant'),
+    ]
+    
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    seq = models.PositiveIntegerField()
+    role = models.CharField(max_length=20, choices=ROLE_CHOICES)
+    content = models.TextField()
+    token_count = models.PositiveIntegerField(default=0)
+    metadata = models.JSONField(default=dict, blank=True)  # e.g. intent and action taken, on the answer
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['conversation', 'seq']
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'seq'], name='finance_conversation_message_seq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.role} #{self.seq} in {self.conversation_id}"
+
+
+class BusinessDataVersion(models.Model):
+    """
+    Data version of a business, moved in the same transaction as every write to
+    its data, so every process sees the same version. A business without a row
+    is at version 0. Rows are never deleted (and have no constraint), so a
+    version never repeats.
+    """
+    
+    business = models.OneToOneField('users.Business', on_delete=models.DO_NOTHING, db_constraint=False,
+                                    primary_key=True, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"Business {self.business_id} at version {self.version}"
@@ -3,7 +3,8 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import (
     Transaction, Invoice, InvoiceItem, Budget, CashFlow, 
-    FinancialForecast, CreditScore, Supplier, MpesaPayment
+    FinancialForecast, CreditScore, Supplier, MpesaPayment,
+    Conversation, ConversationMessage
 )
 from users.models import Business, UserProfile
 
@@ -235,3 +236,40 @@ class MpesaPaymentSerializer(serializers.ModelSerializer):
             'callback_data', 'error_message',
             'created_at', 'updated_at', 'completed_at'
         ]
+
+
+class ConversationSummarySerializer(serializers.ModelSerializer):
+    """History listing entry for a conversation, read from its row alone"""
+    
+    message_count = serializers.IntegerField(source='last_seq', read_only=True)
+    
+    class Meta:
+        model = Conversation
+        fields = ['id', 'business', 'preview', 'message_count', 'last_message_at', 'created_at']
+        read_only_fields = fields
+
+
+class ConversationMessageSerializer(serializers.ModelSerializer):
+    """Serializer for ConversationMessage model"""
+    
+    class Meta:
+        model = ConversationMessage
+        fields = ['seq', 'role', 'content', 'metadata', 'created_at']
+        read_only_fields = fields
+
+
+class ConversationTurnSerializer(serializers.Serializer):
+    """A question and its answer, appended to a conversation (a new one without conversation_id)"""
+    
+    conversation_id = serializers.UUIDField(required=False, allow_null=True)
+    business_id = serializers.IntegerField(required=False, allow_null=True)
+    # A voice turn can end with only one side transcribed
+    user_input = serializers.CharField(trim_whitespace=True, allow_blank=True)
+    ai_response = serializers.CharField(trim_whitespace=True, allow_blank=True)
+    intent = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    action_taken = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    
+    def validate(self, attrs):
+        if not attrs['user_input'] and not attrs['ai_response']:
+            raise serializers.ValidationError("A turn needs a user_input or an ai_response")
+        return attrs
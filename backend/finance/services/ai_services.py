@@ -1,11 +1,11 @@
 # backend/finance/services/ai_services.py
 import os
 import json
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 from decimal import Decimal
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import Transaction, Budget, Invoice, CashFlow, FinancialForecast, CreditScore
+from finance.models import Transaction, Budget, Invoice, CashFlow, FinancialForecast, CreditScore
 from users.models import Business
 
 
@@ -16,24 +16,25 @@ class AIFinancialAnalyzer:
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         self.model = "gpt-4"
     
-    def analyze_financial_health(self, business_id: str, user_id: int) -> Dict[str, Any]:
-        """Analyze overall financial health of a business"""
+    def analyze_financial_health(self, business_id: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Analyze overall financial health of a business (of one user's records when user_id is given)"""
+        owner = {'user_id': user_id} if user_id is not None else {}
         
         # Get financial data
         transactions = Transaction.objects.filter(
             business_id=business_id, 
-            user_id=user_id
+            **owner
         ).order_by('-transaction_date')[:100]
         
         budgets = Budget.objects.filter(
             business_id=business_id,
-            user_id=user_id,
-            is_active=True
+            is_active=True,
+            **owner
         )
         
         invoices = Invoice.objects.filter(
             business_id=business_id,
-            user_id=user_id
+            **owner
         )
         
         # Calculate key metrics
@@ -178,14 +179,15 @@ class AIFinancialAnalyzer:
             'recommendations': score_data['recommendations']
         }
     
-    def generate_supplier_negotiation_insights(self, business_id: str, user_id: int) -> Dict[str, Any]:
-        """Generate AI insights for supplier negotiations"""
+    def generate_supplier_negotiation_insights(self, business_id: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Generate AI insights for supplier negotiations (of one user's records when user_id is given)"""
+        owner = {'user_id': user_id} if user_id is not None else {}
         
         # Get expense transactions
         expenses = Transaction.objects.filter(
             business_id=business_id,
-            user_id=user_id,
-            transaction_type='expense'
+            transaction_type='expense',
+            **owner
         ).exclude(supplier='')
         
         # Analyze spending patterns
@@ -0,0 +1,112 @@
+# backend/finance/services/business_stats.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from finance.cache_utils import get_business_data_version
+from finance.models import Budget, Invoice, Transaction
+from users.models import Customer, Membership
+
+BUSINESS_STATS_CACHE_TIMEOUT = 60 * 60  # Keyed on the data version, TTL only bounds memory
+
+
+def _float(value):
+    return float(value or 0)
+
+
+def compute_business_stats(business_id):
+    """
+    Financial, invoice, customer, budget and team figures for one business.
+    Five queries whatever the data volume: one conditional aggregate per table
+    and one grouped query for invoice statuses.
+    """
+    now = timezone.now()
+    today = now.date()
+    this_month_start = today.replace(day=1)
+    thirty_days_ago = now - timedelta(days=30)
+
+    income = Q(transaction_type='income')
+    expense = Q(transaction_type='expense')
+    this_month = Q(transaction_date__gte=this_month_start)
+    transactions = Transaction.objects.filter(business_id=business_id).aggregate(
+        count=Count('id'),
+        total_income=Sum('amount', filter=income),
+        total_expenses=Sum('amount', filter=expense),
+        month_income=Sum('amount', filter=income & this_month),
+        month_expenses=Sum('amount', filter=expense & this_month),
+        last_30_income=Sum('amount', filter=income & Q(transaction_date__gte=thirty_days_ago)),
+    )
+
+    by_status = {
+        row['status']: {'count': row['count'], 'amount': _float(row['amount'])}
+        for row in Invoice.objects.filter(business_id=business_id).values('status').annotate(
+            count=Count('id'), amount=Sum('total_amount')
+        ).order_by()
+    }
+
+    def status_count(*statuses):
+        return sum(by_status.get(s, {}).get('count', 0) for s in statuses)
+
+    budgets = Budget.objects.filter(business_id=business_id, is_active=True).aggregate(
+        budgeted=Sum('budgeted_amount'),
+        spent=Sum('spent_amount'),
+    )
+    total_budgeted = budgets['budgeted'] or Decimal('0')
+    total_spent = budgets['spent'] or Decimal('0')
+
+    customers = Customer.objects.filter(business_id=business_id).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+    )
+
+    team = Membership.objects.filter(business_id=business_id, is_active=True).aggregate(
+        total=Count('id'),
+        business_admins=Count('id', filter=Q(role_in_business='business_admin')),
+        staff=Count('id', filter=Q(role_in_business='staff')),
+    )
+
+    return {
+        'transactions': {
+            'count': transactions['count'],
+            'total_income': _float(transactions['total_income']),
+            'total_expenses': _float(transactions['total_expenses']),
+            'net_profit': _float(transactions['total_income']) - _float(transactions['total_expenses']),
+            'month_income': _float(transactions['month_income']),
+            'month_expenses': _float(transactions['month_expenses']),
+            'month_net_profit': _float(transactions['month_income']) - _float(transactions['month_expenses']),
+            'last_30_days_income': _float(transactions['last_30_income']),
+        },
+        'invoices': {
+            'total': sum(s['count'] for s in by_status.values()),
+            'paid': status_count('paid'),
+            'pending': status_count('draft', 'sent'),
+            'overdue': status_count('overdue'),
+            'overdue_amount': by_status.get('overdue', {}).get('amount', 0.0),
+            'by_status': by_status,
+        },
+        'budgets': {
+            'total_budgeted': float(total_budgeted),
+            'total_spent': float(total_spent),
+            'utilization_percent': round(float(total_spent / total_budgeted * 100), 2) if total_budgeted > 0 else 0,
+        },
+        'customers': customers,
+        'team': team,
+    }
+
+
+def get_business_stats(business_id):
+    """
+    Cached business stats. The key carries the business data version (bumped by
+    finance signals on every write) and today's date, since month and 30-day
+    windows move on their own.
+    """
+    version = get_business_data_version(business_id)
+    key = f"business_stats:{business_id}:v{version}:{timezone.now().date().isoformat()}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_business_stats(business_id)
+        cache.set(key, stats, BUSINESS_STATS_CACHE_TIMEOUT)
+    return stats
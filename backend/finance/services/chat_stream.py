@@ -0,0 +1,145 @@
+# backend/finance/services/chat_stream.py
+"""
+Token streaming for the KAVI chat endpoint.
+
+stream_chat() turns an LLM token stream into server-sent events:
+
+- token     {"text"}          every chunk as the model produces it
+- sentence  {"index", "text"} each complete sentence, so the client can start
+                              speaking the first one while the rest is generated
+- done      {"text"}          the full answer
+- error     {"error"}         the model failed or ran out of time; nothing follows
+
+If the client disconnects, the ASGI handler cancels the response and the
+upstream LLM stream is closed with it.
+"""
+import asyncio
+import inspect
+import logging
+import re
+
+from django.conf import settings
+
+from core.events import format_event
+
+logger = logging.getLogger(__name__)
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets) followed
+# by whitespace, or a line break. "KES 1.5m" has no space after the dot, so it stays whole.
+SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s+|\n+')
+
+FAKE_ANSWER = (
+    "Your cash position looks steady this month. Revenue is ahead of expenses, "
+    "so you have room to clear the oldest supplier invoice. Keep an eye on overdue "
+    "customer invoices, because they are the biggest risk to next month's cash flow."
+)
+
+
+class SentenceSplitter:
+    """Accumulates streamed text and hands back each sentence once it is complete"""
+
+    def __init__(self):
+        self._buffer = ''
+
+    def feed(self, text):
+        self._buffer += text
+        sentences = []
+        while True:
+            match = SENTENCE_END.search(self._buffer)
+            if not match:
+                break
+            sentence = self._buffer[:match.end()].strip()
+            self._buffer = self._buffer[match.end():]
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self):
+        rest, self._buffer = self._buffer.strip(), ''
+        return rest
+
+
+class FakeStreamingLLM:
+    """
+    Streams a fixed answer word by word. Used for local development
+    (KAVI_CHAT_FAKE_LLM) and in tests; also replays cached answers.
+    """
+
+    def __init__(self, text=FAKE_ANSWER, delay=0.03):
+        self.text = text
+        self.delay = delay
+
+    async def astream(self, prompt):
+        for word in re.findall(r'\S+\s*', self.text):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word
+
+
+def get_streaming_llm():
+    """(llm, model_params) for streaming chat; the llm must provide astream(prompt)"""
+    if getattr(settings, 'KAVI_CHAT_FAKE_LLM', False):
+        return FakeStreamingLLM(), {'fake': True}
+    from finance.services.langchain_service import get_chatbot
+    chatbot = get_chatbot()
+    return chatbot.llm, chatbot.model_params
+
+
+def _chunk_text(chunk):
+    # LLMs stream str; chat models stream message chunks
+    return chunk if isinstance(chunk, str) else getattr(chunk, 'content', str(chunk))
+
+
+async def stream_chat(llm, prompt, on_complete=None, timeout=None):
+    """
+    Server-sent events for one answer. on_complete(answer), which may be a
+    coroutine function, runs once the answer is finished. With a timeout (in
+    seconds), an answer that is not complete by then ends in an error event.
+    """
+    splitter = SentenceSplitter()
+    parts = []
+    index = 0
+    stream = llm.astream(prompt)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+    try:
+        while True:
+            try:
+                if deadline is None:
+                    chunk = await stream.__anext__()
+                else:
+                    chunk = await asyncio.wait_for(stream.__anext__(), max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                break
+            text = _chunk_text(chunk)
+            if not text:
+                continue
+            parts.append(text)
+            yield format_event({'event': 'token', 'data': {'text': text}})
+            for sentence in splitter.feed(text):
+                yield format_event({'event': 'sentence', 'data': {'index': index, 'text': sentence}})
+                index += 1
+
+        rest = splitter.flush()
+        if rest:
+            yield format_event({'event': 'sentence', 'data': {'index': index, 'text': rest}})
+        answer = ''.join(parts)
+        if on_complete:
+            result = on_complete(answer)
+            if inspect.isawaitable(result):
+                await result
+        yield format_event({'event': 'done', 'data': {'text': answer}})
+    except asyncio.CancelledError:
+        logger.info("Chat stream cancelled after %d chunk(s)", len(parts))
+        raise
+    except TimeoutError:
+        logger.warning("Chat stream timed out after %d chunk(s)", len(parts))
+        yield format_event({'event': 'error', 'data': {'error': "I'm sorry, the answer took too long. Please try again."}})
+    except Exception as e:
+        logger.exception("Chat stream failed")
+        yield format_event({'event': 'error', 'data': {'error': f"I'm sorry, I encountered an error: {e}"}})
+    finally:
+        # Stop generation upstream rather than let the model finish an answer nobody reads
+        aclose = getattr(stream, 'aclose', None)
+        if aclose:
+            await aclose()
@@ -0,0 +1,181 @@
+# backend/finance/services/conversation_memory.py
+"""
+Bounded, persisted memory for KAVI conversations.
+
+A conversation keeps its most recent messages verbatim, up to
+CONVERSATION_WINDOW_TOKENS, plus a rolling summary of everything older, capped
+at CONVERSATION_SUMMARY_TOKENS. When a new turn pushes the window over budget,
+its oldest messages are folded into the summary, so the history sent with each
+prompt stays bounded however long the conversation runs. Token counts are
+estimated at about four characters per token.
+
+Folding happens once the turn is committed, outside the row lock, so a slow
+summary never holds up the next turn; the summary is saved only if no other
+turn has moved the conversation's summary on in the meantime. Outside a
+transaction that is straight away, in the caller's thread. Callers that must
+not wait for a summary (the chat stream, which would otherwise hold back its
+done event and its LLM slot) pass background=True to fold in a separate thread.
+"""
+import logging
+import math
+import re
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from finance.models import Conversation, ConversationMessage
+from finance.services.llm_gateway import llm_gateway
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+SENTENCE_LIMIT = 200  # characters kept per message by the extractive summary
+PREVIEW_LENGTH = 200
+
+SUMMARY_TEMPLATE = """Progressively summarize the conversation between a small-business owner and KAVI,
+their financial assistant, adding onto the previous summary. Keep figures, names and
+decisions; drop pleasantries. Reply with the new summary only, in at most {max_words} words.
+
+Previous summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _speaker(role):
+    return 'User' if role == 'user' else 'KAVI'
+
+
+def _first_sentence(text):
+    text = ' '.join(text.split())
+    match = re.search(r'[.!?](\s|$)', text)
+    sentence = text[:match.end()].strip() if match else text
+    return sentence if len(sentence) <= SENTENCE_LIMIT else sentence[:SENTENCE_LIMIT - 1].rstrip() + '…'
+
+
+def extractive_summary(previous, messages, max_tokens):
+    """Summary without an LLM: one line per folded message, oldest lines dropped first to fit max_tokens"""
+    lines = [line for line in previous.splitlines() if line.strip()]
+    lines += [f"{_speaker(m['role'])}: {_first_sentence(m['content'])}" for m in messages]
+    while lines and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def llm_summarizer(llm):
+    """Summarizer that asks llm to extend the previous summary; falls back to extractive_summary on failure"""
+    def summarize(previous, messages, max_tokens):
+        prompt = SUMMARY_TEMPLATE.format(
+            max_words=int(max_tokens * 0.75),
+            summary=previous or '(none)',
+            lines='\n'.join(f"{_speaker(m['role'])}: {m['content']}" for m in messages),
+        )
+        try:
+            summary = str(llm_gateway.call('conversation.summary', lambda: llm.invoke(prompt), prompt=prompt)).strip()
+        except Exception:
+            logger.exception("Conversation summary failed; using extractive summary")
+            return extractive_summary(previous, messages, max_tokens)
+        if estimate_tokens(summary) > max_tokens:
+            return extractive_summary('', [{'role': 'assistant', 'content': summary}], max_tokens)
+        return summary
+    return summarize
+
+
+class ConversationMemory:
+    """Token-budgeted window of recent messages plus a rolling summary for one conversation"""
+
+    def __init__(self, conversation, window_tokens=None, summary_tokens=None, summarizer=None):
+        self.conversation = conversation
+        self.window_tokens = window_tokens or getattr(settings, 'CONVERSATION_WINDOW_TOKENS', 1200)
+        self.summary_tokens = summary_tokens or getattr(settings, 'CONVERSATION_SUMMARY_TOKENS', 300)
+        self.summarizer = summarizer or extractive_summary
+
+    def window(self, conversation=None):
+        conversation = conversation or self.conversation
+        return list(
+            ConversationMessage.objects.filter(
+                conversation_id=conversation.pk, seq__gt=conversation.summarized_through_seq
+            ).order_by('seq').values('seq', 'role', 'content', 'token_count')
+        )
+
+    def history(self):
+        """Prompt text for the conversation so far; empty for a new conversation"""
+        parts = []
+        if self.conversation.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.conversation.summary}")
+        recent = '\n'.join(f"{_speaker(m['role'])}: {m['content']}" for m in self.window())
+        if recent:
+            parts.append(f"Recent messages:\n{recent}")
+        return '\n\n'.join(parts)
+
+    def append_turn(self, user_text, assistant_text, metadata=None, background=False):
+        """
+        Store a question and its answer (with the turn's metadata, e.g. intent) in
+        one write and update the conversation's summary row; once that commits,
+        fold old messages into the memory summary if over budget, in a separate
+        thread with background=True
+        """
+        with transaction.atomic():
+            # Serializes concurrent turns of one conversation, so seq numbers never collide
+            conversation = Conversation.objects.select_for_update().get(pk=self.conversation.pk)
+            seq = conversation.last_seq
+            ConversationMessage.objects.bulk_create([
+                ConversationMessage(conversation=conversation, seq=seq + 1, role='user',
+                                    content=user_text, token_count=estimate_tokens(user_text)),
+                ConversationMessage(conversation=conversation, seq=seq + 2, role='assistant',
+                                    content=assistant_text, token_count=estimate_tokens(assistant_text),
+                                    metadata=metadata or {}),
+            ])
+            conversation.last_seq = seq + 2
+            conversation.preview = _first_sentence(user_text)[:PREVIEW_LENGTH]
+            conversation.last_message_at = timezone.now()
+            conversation.save(update_fields=['last_seq', 'preview', 'last_message_at', 'updated_at'])
+        self.conversation = conversation
+        compact = self._compact_in_background if background else self._compact
+        transaction.on_commit(lambda: compact(conversation))
+        return conversation
+
+    def _compact_in_background(self, conversation):
+        def run():
+            try:
+                self._compact(conversation)
+            except Exception:
+                logger.exception("Folding conversation %s into its summary failed", conversation.pk)
+            finally:
+                close_old_connections()
+
+        self._spawn(run)
+
+    def _spawn(self, target):
+        threading.Thread(target=target, name='conversation-summary', daemon=True).start()
+
+    def _compact(self, conversation):
+        window = self.window(conversation)
+        total = sum(m['token_count'] for m in window)
+        folded = []
+        # Always keep the latest turn verbatim, however long it is
+        while len(window) > 2 and total > self.window_tokens:
+            message = window.pop(0)
+            total -= message['token_count']
+            folded.append(message)
+        if not folded:
+            return
+        summary = self.summarizer(conversation.summary, folded, self.summary_tokens)
+        # Only if no concurrent turn folded these messages first; the next turn catches up otherwise
+        saved = Conversation.objects.filter(
+            pk=conversation.pk, summarized_through_seq=conversation.summarized_through_seq
+        ).update(summary=summary, summarized_through_seq=folded[-1]['seq'])
+        if saved:
+            conversation.summary = summary
+            conversation.summarized_through_seq = folded[-1]['seq']
+        else:
+            conversation.refresh_from_db(fields=['summary', 'summarized_through_seq'])
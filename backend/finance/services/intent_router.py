@@ -0,0 +1,307 @@
+# backend/finance/services/intent_router.py
+"""
+Deterministic answers for the KAVI questions that have one.
+
+"How much did I make this month", "which invoices are overdue" or "what's my
+balance" are answered from a couple of aggregate queries instead of an LLM
+call. route() returns None for anything it does not recognise, and for
+open-ended questions ("why", "should I", advice) even when they mention a
+known figure, so those still go to the chatbot. The same goes for questions
+naming a period the router cannot parse ("in March", "last quarter", "in
+2024") or a figure it does not compute ("sales tax rate", "average sale"):
+answering those for this month would be confidently wrong.
+
+The router counts answered, open-ended and unmatched questions per worker
+process and keeps the most recent unmatched ones, to show which intents are
+worth adding next.
+
+Given a user_id, answers cover only that user's records, for members who see
+their own transactions and invoices rather than the whole business's.
+"""
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from finance.models import CreditScore, Invoice, Transaction
+
+UNMATCHED_SAMPLES = 20
+OVERDUE_LISTED = 3
+TOP_LISTED = 3
+SUPPLIER_DAYS = 90
+
+OPEN_ENDED = re.compile(
+    r'\b(why|should|could|would|how (can|do|could|to)|improve|advice|advise|recommend|suggest|plan|risks?|'
+    r'compare|predict|forecast|explain|analy[sz]e|strateg\w*)\b'
+)
+# Periods and figures the answers below cannot honour; "may" only counts as a month after a preposition
+UNPARSED = re.compile(
+    r'\b(january|february|march|april|june|july|august|september|october|november|december|'
+    r'jan|feb|mar|apr|jun|jul|aug|sept?|oct|nov|dec|(in|during|since|of|for) may|'
+    r'monday|tuesday|wednesday|thursday|friday|saturday|sunday|weekends?|'
+    r'(19|20)\d{2}|q[1-4]|quarters?|quarterly|annual(ly)?|fortnight|'
+    r'(last|past|previous|next) (\d{1,3} (weeks?|months?|years?)|years?)|(past|previous|next) (week|month)|'
+    r'since|between|until|'
+    r'tax(es)?|vat|rates?|interest|loans?|prices?|margins?|averages?|per|percent(age)?|growth|targets?)\b'
+)
+PERIODS = [
+    (re.compile(r'\btoday\b'), 'today'),
+    (re.compile(r'\byesterday\b'), 'yesterday'),
+    (re.compile(r'\bthis week\b'), 'this week'),
+    (re.compile(r'\blast week\b'), 'last week'),
+    (re.compile(r'\blast month\b'), 'last month'),
+    (re.compile(r'\bthis year\b'), 'this year'),
+    (re.compile(r'\b(last|past) (\d{1,3}) days\b'), 'last {n} days'),
+]
+
+
+@dataclass
+class RoutedAnswer:
+    intent: str
+    text: str
+
+
+def normalize(question):
+    text = question.lower().replace('’', "'")
+    text = re.sub(r"\bwhat's\b", 'what is', text)
+    return ' '.join(re.sub(r"[^a-z0-9' ]+", ' ', text).split())
+
+
+def parse_period(text, default='this month'):
+    """(label, start, end) of the period a question mentions, defaulting to the calendar month so far"""
+    label = default
+    days = None
+    for pattern, name in PERIODS:
+        match = pattern.search(text)
+        if match:
+            label = name
+            if name.startswith('last {n}'):
+                days = max(int(match.group(2)), 1)
+                label = name.format(n=days)
+            break
+
+    today = timezone.localdate()
+    start_of = lambda day: timezone.make_aware(datetime.combine(day, datetime.min.time()))  # noqa: E731
+    tomorrow = start_of(today + timedelta(days=1))
+    if label == 'today':
+        return label, start_of(today), tomorrow
+    if label == 'yesterday':
+        return label, start_of(today - timedelta(days=1)), start_of(today)
+    if label == 'this week':
+        return label, start_of(today - timedelta(days=today.weekday())), tomorrow
+    if label == 'last week':
+        monday = today - timedelta(days=today.weekday())
+        return label, start_of(monday - timedelta(days=7)), start_of(monday)
+    if label == 'last month':
+        first = today.replace(day=1)
+        return label, start_of((first - timedelta(days=1)).replace(day=1)), start_of(first)
+    if label == 'this year':
+        return label, start_of(today.replace(month=1, day=1)), tomorrow
+    if days:
+        return label, start_of(today - timedelta(days=days - 1)), tomorrow
+    return label, start_of(today.replace(day=1)), tomorrow
+
+
+def _kes(amount):
+    return f"KES {float(amount or 0):,.2f}"
+
+
+def _period_totals(records, start, end):
+    return Transaction.objects.filter(
+        **records, transaction_date__gte=start, transaction_date__lt=end
+    ).aggregate(
+        income=Sum('amount', filter=Q(transaction_type='income')),
+        income_count=Count('id', filter=Q(transaction_type='income')),
+        expenses=Sum('amount', filter=Q(transaction_type='expense')),
+        expense_count=Count('id', filter=Q(transaction_type='expense')),
+    )
+
+
+def answer_income(records, text):
+    label, start, end = parse_period(text)
+    totals = _period_totals(records, start, end)
+    if not totals['income_count']:
+        return f"You have no income recorded for {label}."
+    return (f"You made {_kes(totals['income'])} {label} from {totals['income_count']} "
+            f"income transaction{'s' if totals['income_count'] != 1 else ''}.")
+
+
+def answer_expenses(records, text):
+    label, start, end = parse_period(text)
+    expenses = Transaction.objects.filter(
+        **records, transaction_type='expense', transaction_date__gte=start, transaction_date__lt=end
+    )
+    totals = expenses.aggregate(amount=Sum('amount'), count=Count('id'))
+    if not totals['count']:
+        return f"You have no expenses recorded for {label}."
+    categories = expenses.values('category').annotate(amount=Sum('amount')).order_by('-amount')[:TOP_LISTED]
+    biggest = ', '.join(f"{row['category'] or 'Uncategorized'} ({_kes(row['amount'])})" for row in categories)
+    return (f"You spent {_kes(totals['amount'])} {label} across {totals['count']} "
+            f"transaction{'s' if totals['count'] != 1 else ''}. Biggest categories: {biggest}.")
+
+
+def answer_profit(records, text):
+    label, start, end = parse_period(text)
+    totals = _period_totals(records, start, end)
+    net = float(totals['income'] or 0) - float(totals['expenses'] or 0)
+    outcome = 'a profit' if net >= 0 else 'a loss'
+    return (f"{label[0].upper()}{label[1:]} you have {outcome} of {_kes(abs(net))}: "
+            f"{_kes(totals['income'])} in income against {_kes(totals['expenses'])} in expenses.")
+
+
+def answer_balance(records, text):
+    totals = Transaction.objects.filter(**records).aggregate(
+        income=Sum('amount', filter=Q(transaction_type='income')),
+        expenses=Sum('amount', filter=Q(transaction_type='expense')),
+    )
+    net = float(totals['income'] or 0) - float(totals['expenses'] or 0)
+    answer = f"Your net cash position is {_kes(net)} from all recorded income and expenses."
+    if any(pattern.search(text) for pattern, _ in PERIODS):
+        label, start, end = parse_period(text)
+        period = _period_totals(records, start, end)
+        change = float(period['income'] or 0) - float(period['expenses'] or 0)
+        answer += (f" {label[0].upper()}{label[1:]} it {'grew' if change >= 0 else 'fell'} by {_kes(abs(change))} "
+                   f"({_kes(period['income'])} in, {_kes(period['expenses'])} out).")
+    return answer
+
+
+def answer_overdue_invoices(records, text):
+    today = timezone.localdate()
+    # Same rule as the KAVI context: sent invoices past their due date count as overdue
+    overdue = Invoice.objects.filter(**records).filter(
+        Q(status='overdue') | Q(status='sent', due_date__lt=today)
+    )
+    totals = overdue.aggregate(count=Count('id'), amount=Sum('total_amount'))
+    if not totals['count']:
+        return "You have no overdue invoices."
+    listed = '; '.join(
+        f"{row['invoice_number']} to {row['customer_name']}, {_kes(row['total_amount'])}, "
+        f"{(today - row['due_date']).days} days overdue"
+        for row in overdue.order_by('-total_amount').values(
+            'invoice_number', 'customer_name', 'total_amount', 'due_date')[:OVERDUE_LISTED]
+    )
+    count = totals['count']
+    return (f"You have {count} overdue invoice{'s' if count != 1 else ''} worth {_kes(totals['amount'])}. "
+            f"{'Largest' if count > OVERDUE_LISTED else 'They are'}: {listed}.")
+
+
+def answer_top_suppliers(records, text):
+    since = timezone.now() - timedelta(days=SUPPLIER_DAYS)
+    suppliers = list(
+        Transaction.objects.filter(**records, transaction_type='expense', transaction_date__gte=since)
+        .exclude(supplier='')
+        .values('supplier').annotate(amount=Sum('amount'), count=Count('id')).order_by('-amount')[:TOP_LISTED]
+    )
+    if not suppliers:
+        return f"No expenses in the last {SUPPLIER_DAYS} days have a supplier recorded."
+    listed = '; '.join(
+        f"{row['supplier']}, {_kes(row['amount'])} over {row['count']} payment{'s' if row['count'] != 1 else ''}"
+        for row in suppliers
+    )
+    return f"Your top suppliers over the last {SUPPLIER_DAYS} days: {listed}."
+
+
+def answer_credit_score(records, text):
+    score = CreditScore.objects.filter(**records).values('score', 'score_category', 'created_at').first()
+    if score is None:
+        return "No credit score has been calculated for your business yet."
+    return (f"Your latest credit score is {score['score']} ({score['score_category']}), "
+            f"calculated on {timezone.localtime(score['created_at']).date().isoformat()}.")
+
+
+# First match wins, so the narrower intents come first
+INTENTS = [
+    ('overdue_invoices', re.compile(
+        r'\b(overdue|late|unpaid|outstanding)\b.*\binvoices?\b|\binvoices?\b.*\b(overdue|late|unpaid)\b|'
+        r'\bwho owes me\b'), answer_overdue_invoices),
+    ('credit_score', re.compile(r'\bcredit score\b'), answer_credit_score),
+    ('top_suppliers', re.compile(r'\b(top|biggest|main) suppliers?\b|\bsuppliers? (did i|do i) pay (the )?most\b'),
+     answer_top_suppliers),
+    ('balance', re.compile(r'\b(balance|cash position|net cash|how much (money|cash) do i have)\b'), answer_balance),
+    ('profit', re.compile(r'\b(profit|net income|did i make a (profit|loss))\b'), answer_profit),
+    ('income', re.compile(r'\b(how much did i (make|earn|sell|receive)|income|revenue|sales|earnings)\b'),
+     answer_income),
+    ('expenses', re.compile(r'\b(how much did i spend|expenses?|spending|spent)\b'), answer_expenses),
+]
+
+
+class IntentRouter:
+    def __init__(self, intents=None):
+        self.intents = intents if intents is not None else INTENTS
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._answer_seconds = 0.0
+        self._unmatched = deque(maxlen=UNMATCHED_SAMPLES)
+
+    def classify(self, question):
+        """Intent name for a question, or None when it needs the LLM"""
+        match = self._match(normalize(question))
+        return match[0] if match else None
+
+    def route(self, question, business_id, user_id=None):
+        """
+        RoutedAnswer for a question with an exact answer, otherwise None (ask the
+        LLM). With user_id the figures are those of that user's records only.
+        """
+        if not business_id:
+            return None
+        text = normalize(question)
+        match = self._match(text)
+        if match is None:
+            self._count('open_ended' if OPEN_ENDED.search(text) else 'unmatched', text)
+            return None
+        name, answer = match
+        records = {'business_id': business_id}
+        if user_id is not None:
+            records['user_id'] = user_id
+        started = time.perf_counter()
+        routed = RoutedAnswer(name, answer(records, text))
+        with self._lock:
+            self._counts[f'intent:{name}'] += 1
+            self._answer_seconds += time.perf_counter() - started
+        return routed
+
+    def stats(self):
+        """Hit rate, answers per intent and recent unmatched questions for this process"""
+        with self._lock:
+            intents = {name[7:]: count for name, count in self._counts.items() if name.startswith('intent:')}
+            answered = sum(intents.values())
+            questions = answered + self._counts['open_ended'] + self._counts['unmatched']
+            return {
+                'questions': questions,
+                'answered': answered,
+                'open_ended': self._counts['open_ended'],
+                'unmatched': self._counts['unmatched'],
+                'hit_rate': round(answered / questions * 100, 2) if questions else 0,
+                'average_answer_ms': round(self._answer_seconds / answered * 1000, 2) if answered else 0,
+                'intents': {name: intents.get(name, 0) for name, _, _ in self.intents},
+                'recent_unmatched': list(self._unmatched),
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts.clear()
+            self._answer_seconds = 0.0
+            self._unmatched.clear()
+
+    def _match(self, text):
+        if OPEN_ENDED.search(text) or UNPARSED.search(text):
+            return None
+        for name, pattern, answer in self.intents:
+            if pattern.search(text):
+                return name, answer
+        return None
+
+    def _count(self, name, text):
+        with self._lock:
+            self._counts[name] += 1
+            if name == 'unmatched':
+                self._unmatched.append(text)
+
+
+intent_router = IntentRouter()
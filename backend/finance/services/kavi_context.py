@@ -0,0 +1,228 @@
+# backend/finance/services/kavi_context.py
+"""
+Compact financial summary for the KAVI assistant's prompt.
+
+Everything is computed from aggregates (a handful of queries whatever the data
+volume) and cached per business data version, so the voice assistant no longer
+downloads transaction and invoice lists to summarize them in the browser. The
+serialized summary is kept under KAVI_CONTEXT_MAX_BYTES by trimming the item
+lists, least useful first. Like the transaction and invoice lists, staff get a
+summary of their own records only.
+"""
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from finance.cache_utils import get_business_data_version
+from finance.models import Invoice, Transaction
+
+KAVI_CONTEXT_CACHE_TIMEOUT = 60 * 60  # Keyed on the data version, TTL only bounds memory
+TREND_MONTHS = 6
+TOP_CATEGORIES = 5
+OVERDUE_ITEMS = 5
+RECENT_TRANSACTIONS = 5
+DESCRIPTION_LENGTH = 80
+
+# Trimmed in this order when the summary is over budget
+TRIMMABLE_LISTS = [
+    ('recent_transactions',),
+    ('overdue', 'items'),
+    ('top_categories', 'income'),
+    ('top_categories', 'expenses'),
+    ('trend',),
+]
+
+
+def _float(value):
+    return round(float(value or 0), 2)
+
+
+def _period(totals, prefix):
+    income = _float(totals[f'{prefix}_income'])
+    expenses = _float(totals[f'{prefix}_expenses'])
+    return {
+        'income': income,
+        'expenses': expenses,
+        'net': round(income - expenses, 2),
+        'transaction_count': totals[f'{prefix}_count'],
+    }
+
+
+def _change_percent(current, previous):
+    if not previous:
+        return None
+    return round((current - previous) / abs(previous) * 100, 1)
+
+
+def compute_kavi_context(business_id, user_id=None):
+    """
+    Totals, trends, top categories, overdue invoices and cash position for one
+    business, or only for the records of user_id when given
+    """
+    now = timezone.now()
+    today = now.date()
+    income = Q(transaction_type='income')
+    expense = Q(transaction_type='expense')
+    last_7 = Q(transaction_date__gte=now - timedelta(days=7))
+    last_30 = Q(transaction_date__gte=now - timedelta(days=30))
+    previous_30 = Q(transaction_date__gte=now - timedelta(days=60), transaction_date__lt=now - timedelta(days=30))
+
+    records = {'business_id': business_id}
+    if user_id is not None:
+        records['user_id'] = user_id
+    transactions = Transaction.objects.filter(**records)
+    totals = transactions.aggregate(
+        all_income=Sum('amount', filter=income),
+        all_expenses=Sum('amount', filter=expense),
+        all_count=Count('id'),
+        last_7_income=Sum('amount', filter=income & last_7),
+        last_7_expenses=Sum('amount', filter=expense & last_7),
+        last_7_count=Count('id', filter=last_7),
+        last_30_income=Sum('amount', filter=income & last_30),
+        last_30_expenses=Sum('amount', filter=expense & last_30),
+        last_30_count=Count('id', filter=last_30),
+        previous_30_income=Sum('amount', filter=income & previous_30),
+        previous_30_expenses=Sum('amount', filter=expense & previous_30),
+        previous_30_count=Count('id', filter=previous_30),
+    )
+    last_30_days = _period(totals, 'last_30')
+    previous_30_days = _period(totals, 'previous_30')
+
+    month_start = today.replace(day=1)
+    year, month = divmod(month_start.year * 12 + month_start.month - TREND_MONTHS, 12)
+    trend_start = timezone.make_aware(
+        datetime.combine(month_start.replace(year=year, month=month + 1), datetime.min.time())
+    )
+    trend = [
+        {
+            'month': row['month'].strftime('%Y-%m'),
+            'income': _float(row['income']),
+            'expenses': _float(row['expenses']),
+            'net': round(_float(row['income']) - _float(row['expenses']), 2),
+        }
+        for row in transactions.filter(transaction_date__gte=trend_start)
+        .annotate(month=TruncMonth('transaction_date'))
+        .values('month')
+        .annotate(income=Sum('amount', filter=income), expenses=Sum('amount', filter=expense))
+        .order_by('month')
+    ]
+
+    top_categories = {'income': [], 'expenses': []}
+    for row in (
+        transactions.filter(last_30, transaction_type__in=['income', 'expense'])
+        .values('transaction_type', 'category')
+        .annotate(amount=Sum('amount'), count=Count('id'))
+        .order_by('-amount')
+    ):
+        bucket = top_categories['income' if row['transaction_type'] == 'income' else 'expenses']
+        if len(bucket) < TOP_CATEGORIES:
+            bucket.append({'category': row['category'] or 'Uncategorized', 'amount': _float(row['amount']),
+                           'count': row['count']})
+
+    # Sent invoices past their due date count as overdue before the daily job marks them
+    overdue_filter = Q(status='overdue') | Q(status='sent', due_date__lt=today)
+    invoices = Invoice.objects.filter(**records)
+    invoice_totals = invoices.aggregate(
+        total=Count('id'),
+        overdue_count=Count('id', filter=overdue_filter),
+        overdue_amount=Sum('total_amount', filter=overdue_filter),
+        pending_count=Count('id', filter=Q(status='sent', due_date__gte=today)),
+        pending_amount=Sum('total_amount', filter=Q(status='sent', due_date__gte=today)),
+    )
+    overdue_items = [
+        {
+            'invoice_number': row['invoice_number'],
+            'customer': row['customer_name'],
+            'amount': _float(row['total_amount']),
+            'days_overdue': (today - row['due_date']).days,
+        }
+        for row in invoices.filter(overdue_filter)
+        .order_by('-total_amount')
+        .values('invoice_number', 'customer_name', 'total_amount', 'due_date')[:OVERDUE_ITEMS]
+    ]
+
+    recent_transactions = [
+        {
+            'date': row['transaction_date'].date().isoformat(),
+            'type': row['transaction_type'],
+            'amount': _float(row['amount']),
+            'description': row['description'][:DESCRIPTION_LENGTH],
+        }
+        for row in transactions.order_by('-transaction_date')
+        .values('transaction_date', 'transaction_type', 'amount', 'description')[:RECENT_TRANSACTIONS]
+    ]
+
+    net_cash = round(_float(totals['all_income']) - _float(totals['all_expenses']), 2)
+    daily_expenses = last_30_days['expenses'] / 30
+    receivables = round(_float(invoice_totals['overdue_amount']) + _float(invoice_totals['pending_amount']), 2)
+
+    return {
+        'last_7_days': _period(totals, 'last_7'),
+        'last_30_days': last_30_days,
+        'previous_30_days': previous_30_days,
+        'change_percent': {
+            'income': _change_percent(last_30_days['income'], previous_30_days['income']),
+            'expenses': _change_percent(last_30_days['expenses'], previous_30_days['expenses']),
+        },
+        'trend': trend,
+        'top_categories': top_categories,
+        'invoices': {
+            'total': invoice_totals['total'],
+            'pending': invoice_totals['pending_count'],
+            'pending_amount': _float(invoice_totals['pending_amount']),
+            'overdue': invoice_totals['overdue_count'],
+            'overdue_amount': _float(invoice_totals['overdue_amount']),
+            'total_outstanding': receivables,
+        },
+        'overdue': {'items': overdue_items},
+        'cash_position': {
+            'net_cash': net_cash,
+            'receivables': receivables,
+            'daily_expenses': round(daily_expenses, 2),
+            'runway_days': int(net_cash / daily_expenses) if net_cash > 0 and daily_expenses else None,
+        },
+        'transactions': {'total': totals['all_count']},
+        'recent_transactions': recent_transactions,
+    }
+
+
+def _size(context):
+    return len(json.dumps(context, separators=(',', ':'), default=str).encode('utf-8'))
+
+
+def fit_to_budget(context, max_bytes):
+    """Drop list items (last first) until the serialized context fits in max_bytes"""
+    context['truncated'] = False
+    for path in TRIMMABLE_LISTS:
+        *parents, name = path
+        container = context
+        for parent in parents:
+            container = container[parent]
+        while container[name] and _size(context) > max_bytes:
+            container[name].pop()
+            context['truncated'] = True
+    return context
+
+
+def get_kavi_context(business_id, user_id=None):
+    """
+    Cached KAVI context, business-wide or for one user's records. Like business
+    stats, the key carries the business data version and today's date, since
+    the day windows move on their own.
+    """
+    version = get_business_data_version(business_id)
+    scope = 'all' if user_id is None else f'user:{user_id}'
+    key = f"kavi_context:{business_id}:{scope}:v{version}:{timezone.now().date().isoformat()}"
+    context = cache.get(key)
+    if context is None:
+        context = fit_to_budget(
+            compute_kavi_context(business_id, user_id), getattr(settings, 'KAVI_CONTEXT_MAX_BYTES', 4096)
+        )
+        context['generated_at'] = timezone.now().isoformat()
+        cache.set(key, context, KAVI_CONTEXT_CACHE_TIMEOUT)
+    return context
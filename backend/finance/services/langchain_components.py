@@ -0,0 +1,49 @@
+# backend/finance/services/langchain_components.py
+"""
+LangChain classes used by langchain_service.
+
+Importing this module loads the whole LangChain stack, which takes seconds, so
+langchain_service only imports it when it first builds an advisor or chatbot.
+"""
+import json
+from typing import Dict, Any
+
+from langchain.llms import OpenAI  # noqa: F401
+from langchain.chains import LLMChain  # noqa: F401
+from langchain.prompts import PromptTemplate  # noqa: F401
+from langchain.schema import BaseOutputParser
+from langchain.agents import initialize_agent, Tool, AgentType  # noqa: F401
+from langchain.tools import BaseTool
+
+
+class FinancialInsightParser(BaseOutputParser):
+    """Custom parser for financial insights"""
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        try:
+            # Try to parse as JSON first
+            return json.loads(text)
+        except json.JSONDecodeError:
+            # Fallback to structured text parsing
+            return {
+                'insights': [text],
+                'recommendations': [],
+                'risk_factors': [],
+                'confidence': 0.5
+            }
+
+
+class FinancialAnalysisTool(BaseTool):
+    """Custom tool for financial analysis"""
+
+    name = "financial_analysis"
+    description = "Analyze financial data and provide insights"
+
+    def _run(self, financial_data: str) -> str:
+        """Run financial analysis"""
+        # This would integrate with your AI services
+        return f"Analysis of financial data: {financial_data}"
+
+    async def _arun(self, financial_data: str) -> str:
+        """Async run financial analysis"""
+        return self._run(financial_data)
@@ -1,106 +1,96 @@
 # backend/finance/services/langchain_service.py
+"""
+LangChain financial advisor and chatbot.
+
+Nothing from LangChain is imported until an advisor or chatbot is built, and
+get_financial_advisor() / get_chatbot() build each one once per process and
+share it between requests. Set LANGCHAIN_WARMUP to build them in a background
+thread when the ASGI server starts; `manage.py benchmark_langchain` reports the
+import and build times.
+
+Responses are cached in llm_cache (finance/services/llm_cache.py); pass
+business_id so a cached answer is dropped when that business's data changes.
+Calls go through llm_gateway (finance/services/llm_gateway.py); when it turns
+a call away, the last cached analysis or a rule-based one from
+AIFinancialAnalyzer is served instead.
+"""
+import importlib.util
+import logging
 import os
+import re
+import threading
+import time
 from typing import Dict, List, Any, Optional
 import json
 
-# LangChain imports with fallback
-try:
-    from langchain.llms import OpenAI
-    from langchain.chains import LLMChain
-    from langchain.prompts import PromptTemplate
-    from langchain.schema import BaseOutputParser
-    from langchain.memory import ConversationBufferMemory
-    from langchain.agents import initialize_agent, Tool, AgentType
-    from langchain.tools import BaseTool
-    LANGCHAIN_AVAILABLE = True
-except ImportError:
-    # Fallback for when LangChain is not installed
-    LANGCHAIN_AVAILABLE = False
-    print("Warning: LangChain not available. AI features will be limited.")
-
-
-class FinancialInsightParser(BaseOutputParser):
-    """Custom parser for financial insights"""
-    
-    def parse(self, text: str) -> Dict[str, Any]:
-        try:
-            # Try to parse as JSON first
-            return json.loads(text)
-        except json.JSONDecodeError:
-            # Fallback to structured text parsing
-            return {
-                'insights': [text],
-                'recommendations': [],
-                'risk_factors': [],
-                'confidence': 0.5
-            }
+from finance.services.llm_cache import llm_cache
+from finance.services.llm_gateway import LLMUnavailable, llm_gateway
 
+logger = logging.getLogger(__name__)
 
-class FinancialAnalysisTool(BaseTool):
-    """Custom tool for financial analysis"""
-    
-    name = "financial_analysis"
-    description = "Analyze financial data and provide insights"
-    
-    def _run(self, financial_data: str) -> str:
-        """Run financial analysis"""
-        # This would integrate with your AI services
-        return f"Analysis of financial data: {financial_data}"
-    
-    async def _arun(self, financial_data: str) -> str:
-        """Async run financial analysis"""
-        return self._run(financial_data)
+
+def langchain_available() -> bool:
+    """Whether LangChain is installed, without importing it"""
+    return importlib.util.find_spec('langchain') is not None
+
+
+def _components():
+    """The LangChain stack; imported on first use"""
+    from finance.services import langchain_components
+    return langchain_components
 
 
 class LangChainFinancialAdvisor:
     """LangChain-powered financial advisor for SMEs"""
     
     def __init__(self):
+        lc = _components()
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.llm = OpenAI(
-            temperature=0.3,
-            max_tokens=1000,
-            openai_api_key=self.openai_api_key
+        self.model_params = {'temperature': 0.3, 'max_tokens': 1000}
+        self.llm = lc.OpenAI(
+            openai_api_key=self.openai_api_key,
+            request_timeout=llm_gateway.timeout,
+            **self.model_params
         )
         
         # Initialize tools
         self.tools = [
-            FinancialAnalysisTool(),
-            Tool(
+            lc.FinancialAnalysisTool(),
+            lc.Tool(
                 name="budget_analysis",
                 description="Analyze budget performance and provide recommendations",
                 func=self._analyze_budget
             ),
-            Tool(
+            lc.Tool(
                 name="cash_flow_analysis",
                 description="Analyze cash flow patterns and predict future trends",
                 func=self._analyze_cash_flow
             ),
-            Tool(
+            lc.Tool(
                 name="credit_scoring",
                 description="Calculate credit score and provide improvement recommendations",
                 func=self._calculate_credit_score
             ),
-            Tool(
+            lc.Tool(
                 name="supplier_negotiation",
                 description="Provide supplier negotiation strategies and insights",
                 func=self._analyze_supplier_negotiation
             )
         ]
         
-        # Initialize agent
-        self.agent = initialize_agent(
+        # The advisor is shared by every request in the worker, so the agent keeps
+        # no memory of its own; callers pass a Conversation (see conversation_memory)
+        self.agent = lc.initialize_agent(
             tools=self.tools,
             llm=self.llm,
-            agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=True,
-            memory=ConversationBufferMemory()
+            agent=lc.AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+            verbose=False
         )
         
         # Initialize chains
-        self._setup_chains()
+        self._setup_chains(lc)
     
-    def _setup_chains(self):
+    def _setup_chains(self, lc):
         """Setup LangChain chains for different financial tasks"""
         
         # Financial Health Analysis Chain
@@ -128,13 +118,13 @@ class LangChainFinancialAdvisor:
         }}
         """
         
-        self.health_chain = LLMChain(
+        self.health_chain = lc.LLMChain(
             llm=self.llm,
-            prompt=PromptTemplate(
+            prompt=lc.PromptTemplate(
                 template=health_template,
                 input_variables=["financial_data"]
             ),
-            output_parser=FinancialInsightParser()
+            output_parser=lc.FinancialInsightParser()
         )
         
         # Revenue Forecasting Chain
@@ -162,13 +152,13 @@ class LangChainFinancialAdvisor:
         }}
         """
         
-        self.forecast_chain = LLMChain(
+        self.forecast_chain = lc.LLMChain(
             llm=self.llm,
-            prompt=PromptTemplate(
+            prompt=lc.PromptTemplate(
                 template=forecast_template,
                 input_variables=["historical_data"]
             ),
-            output_parser=FinancialInsightParser()
+            output_parser=lc.FinancialInsightParser()
         )
         
         # Credit Scoring Chain
@@ -202,13 +192,13 @@ class LangChainFinancialAdvisor:
         }}
         """
         
-        self.credit_chain = LLMChain(
+        self.credit_chain = lc.LLMChain(
             llm=self.llm,
-            prompt=PromptTemplate(
+            prompt=lc.PromptTemplate(
                 template=credit_template,
                 input_variables=["business_data"]
             ),
-            output_parser=FinancialInsightParser()
+            output_parser=lc.FinancialInsightParser()
         )
         
         # Supplier Negotiation Chain
@@ -238,21 +228,25 @@ class LangChainFinancialAdvisor:
         }}
         """
         
-        self.negotiation_chain = LLMChain(
+        self.negotiation_chain = lc.LLMChain(
             llm=self.llm,
-            prompt=PromptTemplate(
+            prompt=lc.PromptTemplate(
                 template=negotiation_template,
                 input_variables=["supplier_data"]
             ),
-            output_parser=FinancialInsightParser()
+            output_parser=lc.FinancialInsightParser()
         )
     
-    def analyze_financial_health(self, financial_data: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_financial_health(self, financial_data: Dict[str, Any], business_id: Optional[int] = None) -> Dict[str, Any]:
         """Analyze overall financial health using LangChain"""
         try:
-            result = self.health_chain.run(financial_data=json.dumps(financial_data))
+            inputs = {'financial_data': json.dumps(financial_data, sort_keys=True)}
+            result = self._run_cached('health', self.health_chain.run, inputs, business_id)
             return result
         except Exception as e:
+            fallback = self._fallback('health', e, business_id, financial_data)
+            if fallback:
+                return fallback
             return {
                 "error": f"Analysis failed: {str(e)}",
                 "health_score": 50,
@@ -262,12 +256,16 @@ class LangChainFinancialAdvisor:
                 "growth_opportunities": []
             }
     
-    def generate_revenue_forecast(self, historical_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def generate_revenue_forecast(self, historical_data: List[Dict[str, Any]], business_id: Optional[int] = None) -> Dict[str, Any]:
         """Generate revenue forecast using LangChain"""
         try:
-            result = self.forecast_chain.run(historical_data=json.dumps(historical_data))
+            inputs = {'historical_data': json.dumps(historical_data, sort_keys=True)}
+            result = self._run_cached('forecast', self.forecast_chain.run, inputs, business_id)
             return result
         except Exception as e:
+            fallback = self._fallback('forecast', e, business_id, historical_data)
+            if fallback:
+                return fallback
             return {
                 "error": f"Forecast generation failed: {str(e)}",
                 "monthly_forecast": [0] * 6,
@@ -277,12 +275,16 @@ class LangChainFinancialAdvisor:
                 "recommendations": []
             }
     
-    def calculate_credit_score(self, business_data: Dict[str, Any]) -> Dict[str, Any]:
+    def calculate_credit_score(self, business_data: Dict[str, Any], business_id: Optional[int] = None) -> Dict[str, Any]:
         """Calculate credit score using LangChain"""
         try:
-            result = self.credit_chain.run(business_data=json.dumps(business_data))
+            inputs = {'business_data': json.dumps(business_data, sort_keys=True)}
+            result = self._run_cached('credit', self.credit_chain.run, inputs, business_id)
             return result
         except Exception as e:
+            fallback = self._fallback('credit', e, business_id, business_data)
+            if fallback:
+                return fallback
             return {
                 "error": f"Credit scoring failed: {str(e)}",
                 "credit_score": 600,
@@ -292,12 +294,16 @@ class LangChainFinancialAdvisor:
                 "loan_eligibility": "Unknown"
             }
     
-    def analyze_supplier_negotiation(self, supplier_data: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_supplier_negotiation(self, supplier_data: Dict[str, Any], business_id: Optional[int] = None) -> Dict[str, Any]:
         """Analyze supplier negotiation opportunities using LangChain"""
         try:
-            result = self.negotiation_chain.run(supplier_data=json.dumps(supplier_data))
+            inputs = {'supplier_data': json.dumps(supplier_data, sort_keys=True)}
+            result = self._run_cached('negotiation', self.negotiation_chain.run, inputs, business_id)
             return result
         except Exception as e:
+            fallback = self._fallback('negotiation', e, business_id, supplier_data)
+            if fallback:
+                return fallback
             return {
                 "error": f"Negotiation analysis failed: {str(e)}",
                 "priorities": [],
@@ -307,21 +313,53 @@ class LangChainFinancialAdvisor:
                 "contract_tips": []
             }
     
-    def get_financial_advice(self, query: str, context: Dict[str, Any]) -> str:
-        """Get general financial advice using the agent"""
+    def get_financial_advice(self, query: str, context: Dict[str, Any], business_id: Optional[int] = None,
+                             conversation=None) -> str:
+        """Get general financial advice using the agent; pass a Conversation to remember earlier turns"""
         try:
+            # The shared agent has no memory of its own; each conversation brings its bounded history
+            memory = conversation_memory(conversation, self.llm) if conversation is not None else None
+            history = memory.history() if memory else ''
             prompt = f"""
-            Context: {json.dumps(context)}
+            Context: {json.dumps(context, sort_keys=True)}
+            Conversation so far: {history or '(new conversation)'}
             Query: {query}
             
             Please provide comprehensive financial advice for this SME based on the context.
             """
             
-            result = self.agent.run(prompt)
+            try:
+                result = self._run_cached('advice', self.agent.run, {'input': prompt}, business_id)
+            except LLMUnavailable as e:
+                result = fallback_answer(business_id, e)
+            if memory:
+                memory.append_turn(query, result)
             return result
         except Exception as e:
             return f"Unable to provide advice: {str(e)}"
     
+    def _run_cached(self, template: str, run, inputs: Dict[str, str], business_id: Optional[int]):
+        name = f'advisor.{template}'
+        return llm_cache.get_or_call(
+            name, self.model_params, inputs,
+            lambda: llm_gateway.call(name, lambda: run(**inputs), prompt=json.dumps(inputs, sort_keys=True)),
+            business_id=business_id
+        )
+    
+    def _fallback(self, template: str, error: Exception, business_id: Optional[int], data: Any) -> Optional[Dict[str, Any]]:
+        """Last cached or rule-based analysis when the gateway turned the call away; None for other errors"""
+        if not isinstance(error, LLMUnavailable):
+            return None
+        cached = llm_cache.latest(f'advisor.{template}', business_id) if business_id else None
+        if isinstance(cached, dict):
+            return {**cached, 'fallback': 'cached', 'fallback_reason': error.reason}
+        try:
+            result = rule_based_analysis(template, business_id, data)
+        except Exception:
+            logger.exception("Rule-based %s fallback failed", template)
+            return None
+        return {**result, 'fallback': 'rules', 'fallback_reason': error.reason} if result else None
+    
     def _analyze_budget(self, budget_data: str) -> str:
         """Analyze budget performance"""
         return f"Budget analysis: {budget_data}"
@@ -339,19 +377,7 @@ class LangChainFinancialAdvisor:
         return f"Supplier negotiation analysis: {supplier_data}"
 
 
-class FinancialChatbot:
-    """Financial chatbot using LangChain for conversational AI"""
-    
-    def __init__(self):
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.llm = OpenAI(
-            temperature=0.7,
-            max_tokens=500,
-            openai_api_key=self.openai_api_key
-        )
-        
-        # Chat template
-        self.chat_template = """
+CHAT_TEMPLATE = """
         You are a helpful financial advisor for small and medium enterprises (SMEs) in Kenya.
         You specialize in:
         - Financial planning and budgeting
@@ -365,40 +391,268 @@ class FinancialChatbot:
         Context about the business:
         {context}
         
+        Records that may be relevant:
+        {records}
+        
+        Conversation so far:
+        {history}
+        
         User's question: {question}
         
         Please provide helpful, actionable advice. Be specific and practical.
         If you need more information, ask clarifying questions.
         """
+
+
+def chat_inputs(question: str, business_context: Optional[Dict[str, Any]] = None, history: str = '',
+                records: str = '') -> Dict[str, str]:
+    """Prompt inputs for CHAT_TEMPLATE; also the llm_cache key inputs for a chat answer"""
+    return {
+        'context': json.dumps(business_context or {}, sort_keys=True, default=str),
+        'records': records or '(none)',
+        'history': history or '(new conversation)',
+        'question': question,
+    }
+
+
+def rule_based_analysis(template: str, business_id: Optional[int], data: Any) -> Optional[Dict[str, Any]]:
+    """An advisor result in the LLM's shape, computed by AIFinancialAnalyzer's rules; None if there is none"""
+    from finance.models import CreditScore
+    from finance.services.ai_services import AIFinancialAnalyzer
+    analyzer = AIFinancialAnalyzer()
+    
+    if template == 'forecast':
+        history = [
+            {'date': str(item['date']), 'amount': float(item['amount'])}
+            for item in data or [] if isinstance(item, dict) and 'date' in item and 'amount' in item
+        ]
+        forecast = analyzer._generate_forecast_data(history, 6)
+        return {
+            'monthly_forecast': forecast['monthly_forecast'],
+            'confidence': forecast['confidence'],
+            'assumptions': [f"Average monthly revenue so far, trend: {forecast['trend']}"],
+            'risk_factors': [],
+            'recommendations': analyzer._generate_forecast_recommendations(forecast),
+        }
+    if not business_id:
+        return None
+    if template == 'health':
+        health = analyzer.analyze_financial_health(business_id)
+        return {
+            'health_score': health['financial_health_score'],
+            'insights': health['insights'],
+            'recommendations': health['recommendations'],
+            'risk_factors': health['risk_factors'],
+            'growth_opportunities': health['growth_opportunities'],
+        }
+    if template == 'credit':
+        score = CreditScore.objects.filter(business_id=business_id).first()
+        if score is None:
+            return None
+        return {
+            'credit_score': score.score,
+            'score_category': score.score_category,
+            'factors': score.factors,
+            'recommendations': score.recommendations,
+            'loan_eligibility': 'Unknown',
+        }
+    if template == 'negotiation':
+        suppliers = analyzer.generate_supplier_negotiation_insights(business_id)
+        return {
+            'priorities': suppliers['negotiation_insights'],
+            'strategies': {},
+            'cost_savings': [],
+            'risk_mitigation': [],
+            'contract_tips': suppliers['recommendations'],
+        }
+    return None
+
+
+def fallback_answer(business_id: Optional[int], error: LLMUnavailable, user_id: Optional[int] = None) -> str:
+    """
+    Chat reply for when the gateway turned the LLM call away. The rule-based
+    read covers the whole business, so staff (user_id given) don't get it.
+    """
+    opening = ("I'm getting a lot of questions right now" if error.reason == 'busy'
+               else "I can't reach my AI service at the moment")
+    if not business_id or user_id is not None:
+        return f"{opening}. Please ask again in a minute."
+    try:
+        from finance.services.ai_services import AIFinancialAnalyzer
+        insights = AIFinancialAnalyzer().analyze_financial_health(business_id)['insights']
+    except Exception:
+        logger.exception("Rule-based chat fallback failed")
+        return f"{opening}. Please ask again in a minute."
+    # Insights start with a status emoji, which reads badly aloud
+    summary = ' '.join(re.sub(r'^\W+', '', insight).rstrip('.') + '.' for insight in insights[:3])
+    return f"{opening}, so here is a quick read of your numbers: {summary} Ask again in a minute for a full answer."
+
+
+def route_question(question: str, business_id: Optional[int], user_id: Optional[int] = None):
+    """
+    Deterministic answer for a common question about the business's figures,
+    or only user_id's when given (staff members), or None
+    """
+    from finance.services.intent_router import intent_router
+    return intent_router.route(question, business_id, user_id)
+
+
+def relevant_records(business_id: Optional[int], question: str, user_id: Optional[int] = None) -> str:
+    """
+    Prompt lines for the business's transactions and invoices that best match
+    the question; only those user_id recorded when given (staff members)
+    """
+    if not business_id:
+        return ''
+    from finance.services.ledger_index import format_records, search_ledger
+    return format_records(search_ledger(business_id, question, user_id=user_id))
+
+
+def conversation_memory(conversation, llm=None):
+    """Bounded memory for a Conversation; older turns are summarized by llm when given"""
+    from finance.services.conversation_memory import ConversationMemory, llm_summarizer
+    return ConversationMemory(conversation, summarizer=llm_summarizer(llm) if llm is not None else None)
+
+
+class FinancialChatbot:
+    """Financial chatbot using LangChain for conversational AI"""
+    
+    def __init__(self):
+        lc = _components()
+        self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        self.model_params = {'temperature': 0.7, 'max_tokens': 500}
+        self.llm = lc.OpenAI(
+            openai_api_key=self.openai_api_key,
+            request_timeout=llm_gateway.timeout,
+            **self.model_params
+        )
         
-        self.chat_chain = LLMChain(
+        self.chat_template = CHAT_TEMPLATE
+        
+        self.chat_chain = lc.LLMChain(
             llm=self.llm,
-            prompt=PromptTemplate(
+            prompt=lc.PromptTemplate(
                 template=self.chat_template,
-                input_variables=["context", "question"]
+                input_variables=["context", "records", "history", "question"]
             )
         )
     
-    def chat(self, question: str, business_context: Dict[str, Any] = None) -> str:
-        """Chat with the financial advisor"""
+    def chat(self, question: str, business_context: Dict[str, Any] = None,
+             business_id: Optional[int] = None, conversation=None, user_id: Optional[int] = None) -> str:
+        """
+        Chat with the financial advisor; pass a Conversation to remember earlier
+        turns, and user_id to limit a staff member to their own records
+        """
         try:
-            context = business_context or {}
-            result = self.chat_chain.run(
-                context=json.dumps(context),
-                question=question
-            )
+            memory = conversation_memory(conversation, self.llm) if conversation is not None else None
+            routed = route_question(question, business_id, user_id)
+            if routed is not None:
+                # An exact answer from the business's figures; no LLM call needed
+                result = routed.text
+            else:
+                inputs = chat_inputs(question, business_context, memory.history() if memory else '',
+                                     relevant_records(business_id, question, user_id))
+                try:
+                    result = llm_cache.get_or_call(
+                        'chatbot.chat', self.model_params, inputs,
+                        lambda: llm_gateway.call('chatbot.chat', lambda: self.chat_chain.run(**inputs),
+                                                 prompt=CHAT_TEMPLATE.format(**inputs)),
+                        business_id=business_id
+                    )
+                except LLMUnavailable as e:
+                    result = fallback_answer(business_id, e, user_id)
+            if memory:
+                memory.append_turn(question, result)
             return result
         except Exception as e:
             return f"I'm sorry, I encountered an error: {str(e)}. Please try again."
     
-    def get_quick_insights(self, financial_summary: Dict[str, Any]) -> str:
+    def get_quick_insights(self, financial_summary: Dict[str, Any], business_id: Optional[int] = None) -> str:
         """Get quick financial insights"""
         question = "Based on this financial summary, what are the key insights and immediate actions I should take?"
         
-        return self.chat(question, financial_summary)
+        return self.chat(question, financial_summary, business_id=business_id)
     
-    def get_growth_recommendations(self, business_data: Dict[str, Any]) -> str:
+    def get_growth_recommendations(self, business_data: Dict[str, Any], business_id: Optional[int] = None) -> str:
         """Get growth recommendations"""
         question = "What growth strategies would you recommend for this business?"
         
-        return self.chat(question, business_data)
+        return self.chat(question, business_data, business_id=business_id)
+
+
+class LangChainRegistry:
+    """
+    Process-wide store of LangChain objects. Each name is built once, on first
+    use; concurrent callers wait for that build and then share the instance.
+    A build that raises is not stored, so the next caller tries again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._instances = {}
+        self._build_seconds = {}
+
+    def get(self, name, factory):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        # One lock per name, so a slow advisor build doesn't hold up the chatbot
+        with build_lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = factory()
+                self._build_seconds[name] = time.perf_counter() - started
+                logger.info("Built LangChain %s in %.2fs", name, self._build_seconds[name])
+            return self._instances[name]
+
+    def build_times(self) -> Dict[str, float]:
+        """Seconds each built object took to construct"""
+        return dict(self._build_seconds)
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+            self._build_seconds.clear()
+
+
+registry = LangChainRegistry()
+
+BUILDERS = {
+    'advisor': LangChainFinancialAdvisor,
+    'chatbot': FinancialChatbot,
+}
+
+
+def get_financial_advisor() -> LangChainFinancialAdvisor:
+    """The shared advisor for this process"""
+    return registry.get('advisor', BUILDERS['advisor'])
+
+
+def get_chatbot() -> FinancialChatbot:
+    """The shared chatbot for this process"""
+    return registry.get('chatbot', BUILDERS['chatbot'])
+
+
+def warm_up(names: Optional[List[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+    """Build the shared objects ahead of the first request, in a daemon thread unless background is False"""
+    if not langchain_available():
+        logger.info("LangChain is not installed; skipping warm-up")
+        return None
+
+    def run():
+        for name in names or BUILDERS:
+            try:
+                registry.get(name, BUILDERS[name])
+            except Exception:
+                logger.exception("LangChain warm-up of %s failed", name)
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name='langchain-warmup', daemon=True)
+    thread.start()
+    return thread
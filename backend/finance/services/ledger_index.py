@@ -0,0 +1,361 @@
+# backend/finance/services/ledger_index.py
+"""
+Per-business BM25 index over the ledger, for finding the records a KAVI
+question is about.
+
+Transactions are indexed on description, supplier, customer, category and
+reference; invoices on number, customer name and notes. An index is built from
+the database the first time a business is searched and is then kept up to date
+by the Transaction and Invoice signals, one record at a time. Postings are
+NumPy arrays, so a lookup scores only the rows that share a term with the
+question and stays in the low milliseconds on ledgers of 100k rows.
+
+Indexes live in process memory. Every committed ledger write also moves a
+shared ledger version in the cache, one step at a time; a worker whose index
+was not at the step just before (the write went through a different process)
+rebuilds it on the next search. Writes are applied once their transaction
+commits, so a rolled-back write never reaches an index.
+
+Each row remembers the user who recorded it, so a search can be limited to one
+user's records for members who only see their own transactions and invoices.
+"""
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from finance.models import Invoice, Transaction
+
+TEXT_LENGTH = 120  # characters of description/notes kept in a search result
+STOPWORDS = frozenset(
+    'a an and are at be by did do does for from how i in is it me my of on or our the to was we what '
+    'when where which who why with you your'.split()
+)
+TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _ledger_version_key(business_id):
+    return f"ledger_index_version:{business_id}"
+
+
+def get_ledger_version(business_id):
+    key = _ledger_version_key(business_id)
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_ledger_version(business_id):
+    """Move a business to its next ledger version; returns (previous version or None if unknown, new version)"""
+    key = _ledger_version_key(business_id)
+    try:
+        # Atomic, so the step before is exactly the version this write moved on from
+        version = cache.incr(key)
+        return version - 1, version
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, None)
+        return None, version
+
+
+def _grow(array, size):
+    if size <= len(array):
+        return array
+    return np.resize(array, max(size, 2 * len(array)))
+
+
+class _Postings:
+    """Rows containing one term and the term's frequency in each; a removed row keeps its slot with tf 0"""
+
+    __slots__ = ('rows', 'tfs', 'size', 'df')
+
+    def __init__(self):
+        self.rows = np.zeros(4, dtype=np.int32)
+        self.tfs = np.zeros(4, dtype=np.float32)
+        self.size = 0
+        self.df = 0
+
+    def append(self, row, tf):
+        self.rows = _grow(self.rows, self.size + 1)
+        self.tfs = _grow(self.tfs, self.size + 1)
+        self.rows[self.size] = row
+        self.tfs[self.size] = tf
+        self.size += 1
+        self.df += 1
+        return self.size - 1
+
+    def discard(self, position):
+        self.tfs[position] = 0
+        self.df -= 1
+
+    def compact(self):
+        """Drop removed slots; returns {row: new position} for the rows kept"""
+        keep = self.tfs[:self.size] > 0
+        self.rows = self.rows[:self.size][keep].copy()
+        self.tfs = self.tfs[:self.size][keep].copy()
+        self.size = self.df = len(self.rows)
+        return {int(row): position for position, row in enumerate(self.rows)}
+
+
+class LedgerIndex:
+    """BM25 over the records of one business; add, remove and search are thread-safe"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.version = None
+        self._lock = threading.RLock()
+        self._terms = {}           # term -> _Postings
+        self._rows = {}            # record key -> row
+        self._records = []         # row -> record, None once removed
+        self._doc_terms = []       # row -> {term: position in that term's postings}
+        self._free_rows = []
+        self._lengths = np.zeros(16, dtype=np.float32)
+        self._users = np.zeros(16, dtype=np.int64)  # row -> user who recorded it, 0 if unknown
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, key, text, record, user_id=None):
+        """Index record under key, replacing any earlier version of it"""
+        tokens = tokenize(text)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        with self._lock:
+            self.remove(key)
+            row = self._free_rows.pop() if self._free_rows else len(self._records)
+            if row == len(self._records):
+                self._records.append(None)
+                self._doc_terms.append(None)
+                self._lengths = _grow(self._lengths, row + 1)
+                self._users = _grow(self._users, row + 1)
+            self._rows[key] = row
+            self._records[row] = record
+            self._doc_terms[row] = {
+                term: self._terms.setdefault(term, _Postings()).append(row, tf) for term, tf in counts.items()
+            }
+            self._lengths[row] = len(tokens)
+            self._users[row] = user_id or 0
+            self._total_length += len(tokens)
+
+    def remove(self, key):
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return
+            for term, position in self._doc_terms[row].items():
+                postings = self._terms[term]
+                postings.discard(position)
+                if not postings.df:
+                    del self._terms[term]
+                elif postings.size > 2 * postings.df + 16:
+                    for kept_row, new_position in postings.compact().items():
+                        self._doc_terms[kept_row][term] = new_position
+            self._total_length -= int(self._lengths[row])
+            self._lengths[row] = 0
+            self._records[row] = None
+            self._doc_terms[row] = None
+            self._free_rows.append(row)
+
+    def search(self, query, k=5, user_id=None):
+        """Up to k records best matching query, each with its BM25 score; only user_id's records when given"""
+        with self._lock:
+            count = len(self._rows)
+            postings = [self._terms[term] for term in set(tokenize(query)) if term in self._terms]
+            if not count or not postings or k <= 0:
+                return []
+            average_length = self._total_length / count or 1.0
+            scores = np.zeros(len(self._records), dtype=np.float32)
+            length_norm = self.k1 * (1 - self.b + self.b * self._lengths[:len(self._records)] / average_length)
+            for term in postings:
+                rows = term.rows[:term.size]
+                tfs = term.tfs[:term.size]
+                idf = math.log(1 + (count - term.df + 0.5) / (term.df + 0.5))
+                # A reused row can appear twice in one term's postings; its live slot comes
+                # last, and with repeated indices the last assignment is the one that sticks
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + length_norm[rows])
+            if user_id is not None:
+                # Statistics stay business-wide; only the rows that can be returned are limited
+                scores[self._users[:len(self._records)] != user_id] = 0
+
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return [dict(self._records[row], score=round(float(scores[row]), 3)) for row in candidates]
+
+
+def _day(value):
+    # Instances saved with string dates keep them until reloaded
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)[:10]
+
+
+def transaction_document(row):
+    text = ' '.join(filter(None, [
+        row['description'], row['supplier'], row['customer'], row['category'], row['reference_number']
+    ]))
+    return ('transaction', str(row['id'])), text, {
+        'type': 'transaction',
+        'id': str(row['id']),
+        'date': _day(row['transaction_date']),
+        'transaction_type': row['transaction_type'],
+        'amount': float(row['amount']),
+        'category': row['category'],
+        'party': row['supplier'] or row['customer'],
+        'description': row['description'][:TEXT_LENGTH],
+    }, row['user_id']
+
+
+def invoice_document(row):
+    text = ' '.join(filter(None, [row['invoice_number'], row['customer_name'], row['notes']]))
+    return ('invoice', str(row['id'])), text, {
+        'type': 'invoice',
+        'id': str(row['id']),
+        'invoice_number': row['invoice_number'],
+        'customer': row['customer_name'],
+        'amount': float(row['total_amount']),
+        'status': row['status'],
+        'due_date': _day(row['due_date']),
+        'notes': row['notes'][:TEXT_LENGTH],
+    }, row['user_id']
+
+
+TRANSACTION_FIELDS = ['id', 'user_id', 'description', 'supplier', 'customer', 'category', 'reference_number',
+                      'transaction_date', 'transaction_type', 'amount']
+INVOICE_FIELDS = ['id', 'user_id', 'invoice_number', 'customer_name', 'notes', 'total_amount', 'status', 'due_date']
+
+
+def document_for(instance):
+    """(key, text, record, user id) of a Transaction or Invoice instance"""
+    if isinstance(instance, Transaction):
+        return transaction_document({field: getattr(instance, field) for field in TRANSACTION_FIELDS})
+    return invoice_document({field: getattr(instance, field) for field in INVOICE_FIELDS})
+
+
+def build_ledger_index(business_id):
+    index = LedgerIndex()
+    for row in Transaction.objects.filter(business_id=business_id).values(*TRANSACTION_FIELDS).iterator(chunk_size=2000):
+        index.add(*transaction_document(row))
+    for row in Invoice.objects.filter(business_id=business_id).values(*INVOICE_FIELDS).iterator(chunk_size=2000):
+        index.add(*invoice_document(row))
+    return index
+
+
+class LedgerIndexRegistry:
+    """
+    The ledger indexes of this process, least recently searched evicted first
+    once LEDGER_INDEX_MAX_BUSINESSES is reached.
+    """
+
+    def __init__(self, max_businesses=None):
+        self._max_businesses = max_businesses
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._indexes = OrderedDict()
+
+    @property
+    def max_businesses(self):
+        if self._max_businesses is not None:
+            return self._max_businesses
+        return getattr(settings, 'LEDGER_INDEX_MAX_BUSINESSES', 32)
+
+    def get(self, business_id):
+        """Up-to-date index of a business, built on first use or after a write in another process"""
+        version = get_ledger_version(business_id)
+        with self._lock:
+            index = self._indexes.get(business_id)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(business_id)
+                return index
+            build_lock = self._build_locks.setdefault(business_id, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                index = self._indexes.get(business_id)
+            if index is None or index.version != version:
+                index = build_ledger_index(business_id)
+                index.version = version
+                with self._lock:
+                    self._indexes[business_id] = index
+                    while len(self._indexes) > max(self.max_businesses, 1):
+                        evicted, _ = self._indexes.popitem(last=False)
+                        self._build_locks.pop(evicted, None)
+            return index
+
+    def record_write(self, instance, deleted=False):
+        """
+        Apply a saved or deleted Transaction/Invoice to its business's index, if
+        this process has one, once the write commits
+        """
+        business_id = instance.business_id
+        document = document_for(instance)
+        transaction.on_commit(lambda: self._apply(business_id, document, deleted))
+
+    def _apply(self, business_id, document, deleted):
+        previous, version = bump_ledger_version(business_id)
+        with self._lock:
+            index = self._indexes.get(business_id)
+        if index is None:
+            return
+        if previous is None or index.version != previous:
+            # Missed a write from another process; rebuild on the next search instead
+            with self._lock:
+                self._indexes.pop(business_id, None)
+            return
+        key, text, record, user_id = document
+        if deleted:
+            index.remove(key)
+        else:
+            index.add(key, text, record, user_id)
+        index.version = version
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._build_locks.clear()
+
+
+ledger_indexes = LedgerIndexRegistry()
+
+
+def search_ledger(business_id, query, k=None, user_id=None):
+    """
+    The k (LEDGER_SEARCH_TOP_K) transactions and invoices of a business most
+    relevant to query, only among those user_id recorded when given
+    """
+    if k is None:
+        k = getattr(settings, 'LEDGER_SEARCH_TOP_K', 5)
+    return ledger_indexes.get(business_id).search(query, k, user_id)
+
+
+def format_records(records):
+    """Prompt lines for search results"""
+    lines = []
+    for record in records:
+        if record['type'] == 'transaction':
+            party = f" ({record['party']})" if record['party'] else ''
+            lines.append(f"- {record['date']} {record['transaction_type']} KES {record['amount']:,.2f}{party}: "
+                         f"{record['description']}")
+        else:
+            notes = f" - {record['notes']}" if record['notes'] else ''
+            lines.append(f"- Invoice {record['invoice_number']} to {record['customer']}, KES {record['amount']:,.2f}, "
+                         f"{record['status']}, due {record['due_date']}{notes}")
+    return '\n'.join(lines)
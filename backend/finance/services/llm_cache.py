@@ -0,0 +1,121 @@
+# backend/finance/services/llm_cache.py
+"""
+In-process cache of LLM responses for the LangChain advisor and chatbot.
+
+A response is keyed by the prompt template, the model parameters and a
+canonical hash of the prompt inputs. When the call is about a business, the
+business's data version is part of the key as well, so a cached insight is
+reused until a transaction, invoice, budget etc. of that business changes.
+Entries expire after LLM_CACHE_TTL seconds, and the least recently used entry
+is evicted once LLM_CACHE_MAX_ENTRIES is reached.
+
+The latest response per template and business is also kept regardless of
+version or age, as a stale fallback for when the LLM is unavailable.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from finance.cache_utils import get_business_data_version
+
+
+def make_key(template_id, model_params, inputs, data_version=None):
+    """Stable hash of everything that determines an LLM response"""
+    raw = json.dumps(
+        {'template': template_id, 'model': model_params, 'inputs': inputs, 'version': data_version},
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, max_entries=None, ttl=None):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, response), oldest first
+        self._latest = OrderedDict()  # (template_id, business_id) -> response
+        self._stats = Counter()
+
+    @property
+    def max_entries(self):
+        if self._max_entries is not None:
+            return self._max_entries
+        return getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 512)
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'LLM_CACHE_TTL', 6 * 3600)
+
+    def get_or_call(self, template_id, model_params, inputs, call, business_id=None):
+        """
+        Cached result of call() for this template, model and inputs. call takes
+        no arguments; if it raises, nothing is stored.
+        """
+        key = self.key(template_id, model_params, inputs, business_id)
+        response = self.get(key)
+        if response is None:
+            response = call()
+            self.set(key, response)
+            if business_id:
+                with self._lock:
+                    self._latest[(template_id, business_id)] = response
+                    self._latest.move_to_end((template_id, business_id))
+                    while len(self._latest) > max(self.max_entries, 0):
+                        self._latest.popitem(last=False)
+        return response
+
+    def latest(self, template_id, business_id):
+        """Most recent response for this template and business, however stale; None if there is none"""
+        with self._lock:
+            return self._latest.get((template_id, business_id))
+
+    def key(self, template_id, model_params, inputs, business_id=None):
+        data_version = [business_id, get_business_data_version(business_id)] if business_id else None
+        return make_key(template_id, model_params, inputs, data_version)
+
+    def get(self, key):
+        """Cached response for key, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, key, response):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.max_entries, 0):
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self._stats['hits'],
+                'misses': self._stats['misses'],
+                'evictions': self._stats['evictions'],
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+            self._stats.clear()
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,336 @@
+# backend/finance/services/llm_gateway.py
+"""
+Admission control for LLM calls, so a slow or failing model cannot take every
+worker down with it.
+
+- At most LLM_MAX_CONCURRENT calls run per process. Up to LLM_MAX_QUEUE more
+  wait LLM_QUEUE_TIMEOUT seconds for a slot; anything beyond that is rejected
+  at once (LLMBusy).
+- At most LLM_GLOBAL_MAX_CONCURRENT calls run across all processes, counted
+  in slots in the shared cache (with a per-process cache this is a second
+  per-process limit). A slot expires by itself if its process dies.
+- A call that has not answered within LLM_TIMEOUT seconds raises LLMTimeout.
+  The request returns; the call finishes in the background and keeps its slot
+  until it does, so the concurrency limits stay true.
+- After LLM_BREAKER_THRESHOLD consecutive failures or timeouts the circuit
+  opens and calls are refused (LLMCircuitOpen) for LLM_BREAKER_COOLDOWN
+  seconds; then a single trial call decides whether it closes again.
+
+Callers catch LLMUnavailable and serve a fallback. stats() reports calls,
+outcomes, latency percentiles and estimated tokens per call name.
+"""
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.core.cache import cache
+
+LATENCY_SAMPLES = 500
+SLOT_GRACE = 30  # seconds a global slot outlives the deadline, for calls finishing late
+
+
+class LLMUnavailable(Exception):
+    """The LLM was not called, or did not answer in time; serve a fallback"""
+    reason = 'unavailable'
+
+
+class LLMBusy(LLMUnavailable):
+    reason = 'busy'
+
+
+class LLMCircuitOpen(LLMUnavailable):
+    reason = 'circuit_open'
+
+
+class LLMTimeout(LLMUnavailable):
+    reason = 'timeout'
+
+
+class CircuitBreaker:
+    """Closed, open for a cooldown after repeated failures, then half-open for one trial call"""
+
+    def __init__(self, threshold=None, cooldown=None):
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def threshold(self):
+        return self._threshold if self._threshold is not None else getattr(settings, 'LLM_BREAKER_THRESHOLD', 5)
+
+    @property
+    def cooldown(self):
+        return self._cooldown if self._cooldown is not None else getattr(settings, 'LLM_BREAKER_COOLDOWN', 30.0)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        """Whether a call may go ahead: True, 'trial' for the one half-open probe, or False"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial:
+                self._trial = True
+                return 'trial'
+            return False
+
+    def cancel_trial(self):
+        """The trial call was not made after all; let the next caller try"""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class Lease:
+    """
+    A granted LLM slot; release() it when the call is over, with ok True (answered),
+    False (failed) or None (abandoned by the client, which says nothing about the model)
+    """
+
+    def __init__(self, gateway, name, global_slot, trial=False):
+        self.gateway = gateway
+        self.name = name
+        self.global_slot = global_slot
+        self.trial = trial  # The half-open probe: its outcome decides the breaker
+        self.started = time.perf_counter()
+        self.timed_out = False
+        self._released = False
+
+    def release(self, ok, prompt='', response=''):
+        with self.gateway._lock:
+            if self._released:
+                return
+            self._released = True
+        self.gateway._finish(self, ok, prompt, response)
+
+
+class LLMGateway:
+    def __init__(self, max_concurrent=None, max_queue=None, queue_timeout=None, timeout=None,
+                 global_max_concurrent=None, breaker_threshold=None, breaker_cooldown=None):
+        self._limits = {
+            'LLM_MAX_CONCURRENT': max_concurrent,
+            'LLM_MAX_QUEUE': max_queue,
+            'LLM_QUEUE_TIMEOUT': queue_timeout,
+            'LLM_TIMEOUT': timeout,
+            'LLM_GLOBAL_MAX_CONCURRENT': global_max_concurrent,
+        }
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self._slots = None  # Sized from settings on first use
+        self._executor = None
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._counts = defaultdict(Counter)
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    def _limit(self, name, default):
+        value = self._limits[name]
+        return value if value is not None else getattr(settings, name, default)
+
+    @property
+    def max_concurrent(self):
+        return max(self._limit('LLM_MAX_CONCURRENT', 4), 1)
+
+    @property
+    def max_queue(self):
+        return self._limit('LLM_MAX_QUEUE', 8)
+
+    @property
+    def queue_timeout(self):
+        return self._limit('LLM_QUEUE_TIMEOUT', 2.0)
+
+    @property
+    def timeout(self):
+        return self._limit('LLM_TIMEOUT', 20.0)
+
+    @property
+    def global_max_concurrent(self):
+        return self._limit('LLM_GLOBAL_MAX_CONCURRENT', 16)
+
+    def call(self, name, fn, prompt=''):
+        """fn() under the gateway's limits and deadline; raises LLMUnavailable instead of waiting on a sick model"""
+        lease = self.acquire(name)
+        try:
+            future = self._pool()[1].submit(fn)
+        except BaseException:
+            lease.release(False, prompt)
+            raise
+
+        def done(finished):
+            error = finished.exception()
+            lease.release(error is None, prompt, '' if error else finished.result())
+
+        future.add_done_callback(done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if not self.timed_out(lease):
+                return future.result()  # Answered just as the deadline passed
+            raise LLMTimeout(f"{name} did not answer within {self.timeout:g}s") from None
+
+    def acquire(self, name):
+        """Lease for one call, for callers that run the model themselves (e.g. streaming)"""
+        allowed = self.breaker.allow()
+        if not allowed:
+            self._count(name, 'short_circuited')
+            raise LLMCircuitOpen("AI service is failing; retrying shortly")
+        trial = allowed == 'trial'
+
+        slots, _ = self._pool()
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                full = self._waiting >= self.max_queue
+                if not full:
+                    self._waiting += 1
+            if full:
+                self._reject(name, trial)
+            try:
+                acquired = slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not acquired:
+                self._reject(name, trial)
+
+        global_slot = self._acquire_global_slot()
+        if global_slot is False:
+            slots.release()
+            self._reject(name, trial)
+        with self._lock:
+            self._in_flight += 1
+        return Lease(self, name, global_slot, trial)
+
+    def timed_out(self, lease):
+        """
+        Count a lease's call as timed out; its eventual release no longer affects
+        the breaker. False if the call was already over.
+        """
+        with self._lock:
+            if lease._released:
+                return False
+            lease.timed_out = True
+            self._counts[lease.name]['timeouts'] += 1
+        self.breaker.record_failure()
+        return True
+
+    def stats(self):
+        with self._lock:
+            calls = {}
+            for name in sorted(set(self._counts) | set(self._latencies)):
+                latencies = sorted(self._latencies[name])
+                percentile = lambda p: round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 1)  # noqa: E731
+                calls[name] = {
+                    **{key: self._counts[name][key] for key in
+                       ['succeeded', 'failed', 'timeouts', 'cancelled', 'rejected', 'short_circuited']},
+                    'prompt_tokens': self._counts[name]['prompt_tokens'],
+                    'completion_tokens': self._counts[name]['completion_tokens'],
+                    'p50_ms': percentile(0.5) if latencies else None,
+                    'p95_ms': percentile(0.95) if latencies else None,
+                }
+            return {
+                'circuit': self.breaker.state,
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'limits': {
+                    'max_concurrent': self.max_concurrent,
+                    'global_max_concurrent': self.global_max_concurrent,
+                    'max_queue': self.max_queue,
+                    'timeout_seconds': self.timeout,
+                },
+                'calls': calls,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts.clear()
+            self._latencies.clear()
+
+    # -- internals --
+
+    def _pool(self):
+        with self._lock:
+            if self._slots is None:
+                self._slots = threading.BoundedSemaphore(self.max_concurrent)
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='llm-gateway')
+            return self._slots, self._executor
+
+    def _acquire_global_slot(self):
+        """Cache key of a free global slot, None when there is no global limit, False when all are taken"""
+        if not self.global_max_concurrent:
+            return None
+        slots = list(range(self.global_max_concurrent))
+        random.shuffle(slots)
+        for slot in slots:
+            key = f"llm_gateway:slot:{slot}"
+            if cache.add(key, 1, int(self.timeout) + SLOT_GRACE):
+                return key
+        return False
+
+    def _finish(self, lease, ok, prompt, response):
+        from finance.services.conversation_memory import estimate_tokens
+        if lease.global_slot:
+            cache.delete(lease.global_slot)
+        self._slots.release()
+        elapsed = time.perf_counter() - lease.started
+        with self._lock:
+            self._in_flight -= 1
+            counts = self._counts[lease.name]
+            counts['prompt_tokens'] += estimate_tokens(prompt)
+            if ok:
+                counts['completion_tokens'] += estimate_tokens(response if isinstance(response, str) else str(response))
+            if ok is None:
+                counts['cancelled'] += 1
+            elif not lease.timed_out:
+                counts['succeeded' if ok else 'failed'] += 1
+                self._latencies[lease.name].append(elapsed)
+        if ok is None:
+            if lease.trial and not lease.timed_out:
+                # An abandoned probe proved nothing; let the next caller try
+                self.breaker.cancel_trial()
+        elif not lease.timed_out:
+            if ok:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def _reject(self, name, trial=False):
+        if trial:
+            self.breaker.cancel_trial()
+        self._count(name, 'rejected')
+        raise LLMBusy("AI service is busy; please try again in a moment")
+
+    def _count(self, name, key):
+        with self._lock:
+            self._counts[name][key] += 1
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,81 @@
+# backend/finance/signals.py
+from django.db.models.signals import post_delete, post_save
+
+from core.events import publish_event
+from users.models import Business, Customer, Membership
+from .cache_utils import bump_business_data_version, invalidate_user_business_ids
+from .services.ledger_index import ledger_indexes
+from .models import (
+    Budget, CashFlow, CreditScore, FinancialForecast, Invoice,
+    InvoiceItem, MpesaPayment, Supplier, Transaction
+)
+
+# Models whose rows feed the per-business stats, dashboards and lists
+BUSINESS_DATA_MODELS = [
+    Transaction, Invoice, Budget, CashFlow, FinancialForecast, CreditScore,
+    Supplier, MpesaPayment, Customer, Membership,
+]
+
+
+def bump_business_version(sender, instance, **kwargs):
+    """Any write to business data moves that business to a new data version"""
+    bump_business_data_version(instance.business_id)
+
+
+for model in BUSINESS_DATA_MODELS:
+    post_save.connect(bump_business_version, sender=model, dispatch_uid=f'business_version_save_{model.__name__}')
+    post_delete.connect(bump_business_version, sender=model, dispatch_uid=f'business_version_delete_{model.__name__}')
+
+
+def invoice_item_changed(sender, instance, **kwargs):
+    """Items are listed with their invoice, so they move the invoice's business on too"""
+    try:
+        business_id = instance.invoice.business_id
+    except Invoice.DoesNotExist:
+        return  # Deleted along with its invoice, which bumps the version itself
+    bump_business_data_version(business_id)
+
+
+post_save.connect(invoice_item_changed, sender=InvoiceItem, dispatch_uid='business_version_save_InvoiceItem')
+post_delete.connect(invoice_item_changed, sender=InvoiceItem, dispatch_uid='business_version_delete_InvoiceItem')
+
+
+def business_changed(sender, instance, **kwargs):
+    """A renamed, created or deleted business changes its owner's dashboards and business list"""
+    bump_business_data_version(instance.id)
+    invalidate_user_business_ids([instance.owner_id])
+
+
+def membership_changed(sender, instance, **kwargs):
+    invalidate_user_business_ids([instance.user_id])
+
+
+post_save.connect(business_changed, sender=Business, dispatch_uid='business_version_save_Business')
+post_delete.connect(business_changed, sender=Business, dispatch_uid='business_version_delete_Business')
+post_save.connect(membership_changed, sender=Membership, dispatch_uid='user_business_ids_save')
+post_delete.connect(membership_changed, sender=Membership, dispatch_uid='user_business_ids_delete')
+
+
+def update_ledger_index(sender, instance, **kwargs):
+    """Keep the business's assistant search index in step with its transactions and invoices"""
+    ledger_indexes.record_write(instance, deleted=kwargs.get('signal') is post_delete)
+
+
+for model in [Transaction, Invoice]:
+    post_save.connect(update_ledger_index, sender=model, dispatch_uid=f'ledger_index_save_{model.__name__}')
+    post_delete.connect(update_ledger_index, sender=model, dispatch_uid=f'ledger_index_delete_{model.__name__}')
+
+
+def publish_payment_status(sender, instance, **kwargs):
+    """Push payment progress to the payer's event stream instead of having them poll"""
+    publish_event(instance.user_id, 'payment', {
+        'id': str(instance.id),
+        'status': instance.status,
+        'amount': instance.amount,
+        'mpesa_receipt_number': instance.mpesa_receipt_number,
+        'error_message': instance.error_message,
+        'invoice': str(instance.invoice_id) if instance.invoice_id else None,
+    })
+
+
+post_save.connect(publish_payment_status, sender=MpesaPayment, dispatch_uid='mpesa_payment_status_event')
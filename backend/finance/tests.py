@@ -1,14 +1,23 @@
 # backend/finance/tests.py
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from users.models import Business, UserProfile
+from users.models import Business, Membership, UserProfile
 from .models import Transaction, Invoice, InvoiceItem, Budget, CashFlow, FinancialForecast, CreditScore
+from datetime import timedelta
 from decimal import Decimal
+import asyncio
+import importlib
 import json
+import sys
+import threading
+import time
+from unittest import mock
 
 
 class TransactionAPITest(APITestCase):
@@ -282,6 +291,108 @@ class DashboardDataTest(APITestCase):
         self.assertEqual(summary['net_profit'], '500.00')
 
 
+
+class BusinessDataETagTest(APITestCase):
+    """Test conditional GETs on dashboards and lists"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='etag', email='etag@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='ETag Shop')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.add_transaction('100.00')
+    
+    def add_transaction(self, amount):
+        return Transaction.objects.create(
+            business=self.business, user=self.user, amount=Decimal(amount), transaction_type='income',
+            payment_method='cash', description='Sale', transaction_date=timezone.now()
+        )
+    
+    def test_unchanged_list_is_not_modified_after_one_query(self):
+        url = f'/api/finance/transactions/?business={self.business.id}'
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 1)
+        etag = response['ETag']
+        
+        with self.assertNumQueries(2):  # middleware connection check + data versions
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        
+        self.add_transaction('50.00')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_etag_follows_query_and_businesses(self):
+        etag = self.client.get('/api/finance/invoices/')['ETag']
+        self.assertNotEqual(self.client.get('/api/finance/invoices/?status=paid')['ETag'], etag)
+        self.assertNotEqual(self.client.get('/api/finance/transactions/')['ETag'], etag)
+        
+        other = Business.objects.create(owner=User.objects.create_user(username='o', password='x'), legal_name='Other')
+        self.assertEqual(self.client.get('/api/finance/invoices/', HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        Membership.objects.create(user=self.user, business=other, role_in_business='staff')
+        self.assertEqual(self.client.get('/api/finance/invoices/', HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+    
+    def test_dashboard_body_is_cached_per_version(self):
+        first = self.client.get('/api/finance/dashboard/')
+        self.assertEqual(first.data['summary']['total_income'], Decimal('100.00'))
+        with self.assertNumQueries(2):  # middleware connection check + data versions
+            again = self.client.get('/api/finance/dashboard/')
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertEqual(self.client.get('/api/finance/dashboard/', HTTP_IF_NONE_MATCH=first['ETag']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        
+        self.add_transaction('50.00')
+        response = self.client.get('/api/finance/dashboard/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['summary']['total_income'], Decimal('150.00'))
+    
+    def test_writes_from_other_processes_change_the_etag(self):
+        from io import StringIO
+        from django.core.cache import cache
+        from django.core.management import call_command
+        Invoice.objects.create(
+            business=self.business, user=self.user, invoice_number='ET-1', customer_name='Hotel Sawa',
+            subtotal=Decimal('100.00'), total_amount=Decimal('100.00'), status='sent',
+            issue_date=timezone.now().date() - timedelta(days=30), due_date=timezone.now().date() - timedelta(days=1)
+        )
+        etag = self.client.get('/api/finance/invoices/')['ETag']
+        cache.clear()  # Another worker's cache never saw this one's writes; the versions are not in it
+        self.assertEqual(self.client.get('/api/finance/invoices/', HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        
+        call_command('notify_overdue_invoices', stdout=StringIO())  # A cron job: update(), no signals
+        response = self.client.get('/api/finance/invoices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['status'], 'overdue')
+    
+    def test_invoice_items_change_the_invoice_etag(self):
+        invoice = Invoice.objects.create(
+            business=self.business, user=self.user, invoice_number='ET-2', customer_name='Hotel Sawa',
+            subtotal=Decimal('100.00'), total_amount=Decimal('100.00'), status='draft',
+            issue_date=timezone.now().date(), due_date=timezone.now().date() + timedelta(days=14)
+        )
+        etag = self.client.get('/api/finance/invoices/')['ETag']
+        created = self.client.post('/api/finance/invoice-items/', {
+            'invoice': str(invoice.id), 'description': 'Bread', 'quantity': '2', 'unit_price': '50.00'
+        })
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        response = self.client.get('/api/finance/invoices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['description'] for item in response.data[0]['items']], ['Bread'])
+        
+        etag = response['ETag']
+        InvoiceItem.objects.get(id=created.data['id']).delete()
+        self.assertEqual(self.client.get('/api/finance/invoices/', HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+
 class CreditScoreAPITest(APITestCase):
     """Test Credit Score API endpoints"""
     
@@ -367,3 +478,1195 @@ class FinancialForecastAPITest(APITestCase):
         self.assertIn('forecast_type', response.data)
         self.assertIn('forecast_data', response.data)
         self.assertIn('confidence_score', response.data)
+
+
+class BusinessStatsTest(APITestCase):
+    """Test the cached per-business stats service"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_superuser(
+            username='statsadmin',
+            email='stats@example.com',
+            password='testpass123'
+        )
+        self.business = Business.objects.create(
+            owner=self.user,
+            legal_name='Stats Business'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        
+        for amount, transaction_type in [('1000.00', 'income'), ('250.00', 'expense')]:
+            Transaction.objects.create(
+                business=self.business,
+                user=self.user,
+                amount=Decimal(amount),
+                transaction_type=transaction_type,
+                payment_method='cash',
+                description='Stats transaction',
+                transaction_date='2024-01-01T10:00:00Z'
+            )
+        for number, invoice_status in [('INV-1', 'paid'), ('INV-2', 'overdue'), ('INV-3', 'draft')]:
+            Invoice.objects.create(
+                business=self.business,
+                user=self.user,
+                invoice_number=number,
+                customer_name='Customer',
+                subtotal=Decimal('100.00'),
+                total_amount=Decimal('100.00'),
+                status=invoice_status,
+                issue_date='2024-01-01',
+                due_date='2024-01-31'
+            )
+    
+    def test_stats_values(self):
+        from .services.business_stats import get_business_stats
+        stats = get_business_stats(self.business.id)
+        self.assertEqual(stats['transactions']['net_profit'], 750.0)
+        self.assertEqual(stats['invoices']['total'], 3)
+        self.assertEqual(stats['invoices']['pending'], 1)
+        self.assertEqual(stats['invoices']['overdue_amount'], 100.0)
+    
+    def test_stats_cached_until_data_changes(self):
+        from .services.business_stats import get_business_stats
+        get_business_stats(self.business.id)
+        with self.assertNumQueries(1):  # The data version
+            get_business_stats(self.business.id)
+        
+        Invoice.objects.filter(invoice_number='INV-3').first().delete()
+        self.assertEqual(get_business_stats(self.business.id)['invoices']['total'], 2)
+    
+    def test_business_detail_query_count(self):
+        """Stats come from the cache, so the page costs a constant handful of queries"""
+        url = f'/api/users/admin/businesses/{self.business.id}/'
+        self.client.get(url)
+        with self.assertNumQueries(4):  # middleware connection check + business + memberships + data version
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stats']['paid_invoices'], 1)
+    
+    def test_business_admin_dashboard(self):
+        response = self.client.get(f'/api/users/business/{self.business.id}/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['invoices']['overdue']['count'], 1)
+        self.assertEqual(len(response.data['recent_transactions']), 2)
+
+
+class LangChainRegistryTest(SimpleTestCase):
+    """Test lazy, shared construction of LangChain objects"""
+    
+    def test_service_import_does_not_load_langchain(self):
+        with mock.patch.dict(sys.modules):
+            sys.modules.pop('finance.services.langchain_service', None)
+            sys.modules.pop('finance.services.langchain_components', None)
+            importlib.import_module('finance.services.langchain_service')
+            self.assertNotIn('finance.services.langchain_components', sys.modules)
+            self.assertNotIn('langchain', sys.modules)
+    
+    def test_concurrent_callers_share_one_build(self):
+        from .services.langchain_service import LangChainRegistry
+        registry = LangChainRegistry()
+        builds = []
+        
+        def build():
+            builds.append(1)
+            time.sleep(0.05)
+            return object()
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get('advisor', build))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+        self.assertIn('advisor', registry.build_times())
+    
+    def test_failed_build_is_retried(self):
+        from .services.langchain_service import LangChainRegistry
+        registry = LangChainRegistry()
+        with self.assertRaises(RuntimeError):
+            registry.get('chatbot', mock.Mock(side_effect=RuntimeError('no key')))
+        self.assertEqual(registry.get('chatbot', lambda: 'ready'), 'ready')
+    
+    def test_warm_up_builds_each_object(self):
+        from .services import langchain_service
+        registry = langchain_service.LangChainRegistry()
+        builders = {'advisor': mock.Mock(return_value='advisor'), 'chatbot': mock.Mock(side_effect=RuntimeError)}
+        with mock.patch.object(langchain_service, 'registry', registry), \
+                mock.patch.object(langchain_service, 'BUILDERS', builders), \
+                mock.patch.object(langchain_service, 'langchain_available', return_value=True):
+            with self.assertLogs('finance.services.langchain_service', 'ERROR'):
+                langchain_service.warm_up(background=False)  # A failing chatbot doesn't stop the advisor
+            self.assertIs(langchain_service.get_financial_advisor(), 'advisor')
+        builders['advisor'].assert_called_once()
+
+
+class StubChain:
+    """Stands in for an LLM chain; answers with a counter so repeated calls are visible"""
+    
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+    
+    def run(self, **inputs):
+        self.calls.append(inputs)
+        if self.error:
+            raise self.error
+        return f"answer {len(self.calls)}"
+
+
+class LLMResponseCacheTest(TestCase):
+    """Test prompt-level caching of LLM responses"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .services.langchain_service import FinancialChatbot
+        from .services.llm_cache import llm_cache
+        cache.clear()
+        llm_cache.clear()
+        self.chain = StubChain()
+        self.chatbot = FinancialChatbot.__new__(FinancialChatbot)  # Skip building a real LLM
+        self.chatbot.model_params = {'temperature': 0.7, 'max_tokens': 500}
+        self.chatbot.chat_chain = self.chain
+        # These businesses have no ledger rows to search
+        patcher = mock.patch('finance.services.langchain_service.relevant_records', return_value='')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_repeated_insight_uses_one_llm_call(self):
+        first = self.chatbot.get_quick_insights({'revenue': 100, 'expenses': 40}, business_id=1)
+        second = self.chatbot.get_quick_insights({'expenses': 40, 'revenue': 100}, business_id=1)
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.chain.calls), 1)
+        
+        # Other templates, models or businesses are separate entries
+        self.chatbot.get_growth_recommendations({'revenue': 100, 'expenses': 40}, business_id=1)
+        self.chatbot.get_quick_insights({'revenue': 100, 'expenses': 40}, business_id=2)
+        self.chatbot.model_params = {'temperature': 0.2, 'max_tokens': 500}
+        self.chatbot.get_quick_insights({'revenue': 100, 'expenses': 40}, business_id=1)
+        self.assertEqual(len(self.chain.calls), 4)
+    
+    def test_data_change_invalidates(self):
+        from .cache_utils import bump_business_data_version
+        self.assertEqual(self.chatbot.chat('How is cash?', {}, business_id=7), 'answer 1')
+        self.assertEqual(self.chatbot.chat('How is cash?', {}, business_id=7), 'answer 1')
+        bump_business_data_version(7)
+        self.assertEqual(self.chatbot.chat('How is cash?', {}, business_id=7), 'answer 2')
+    
+    def test_errors_are_not_cached(self):
+        self.chatbot.chat_chain = StubChain(error=RuntimeError('rate limited'))
+        self.assertIn('rate limited', self.chatbot.chat('Hello'))
+        self.chatbot.chat('Hello')
+        self.assertEqual(len(self.chatbot.chat_chain.calls), 2)
+    
+    def test_ttl_and_lru_eviction(self):
+        from .services.llm_cache import LLMResponseCache
+        llm_cache = LLMResponseCache(max_entries=2, ttl=60)
+        llm = StubChain()
+        
+        def ask(question):
+            return llm_cache.get_or_call('test', {}, {'q': question}, lambda: llm.run(q=question))
+        
+        ask('a'), ask('b'), ask('a')  # 'b' is now least recently used
+        ask('c')
+        self.assertEqual(llm_cache.stats()['evictions'], 1)
+        ask('a')
+        ask('b')
+        self.assertEqual([call['q'] for call in llm.calls], ['a', 'b', 'c', 'b'])
+        
+        with mock.patch('finance.services.llm_cache.time.monotonic', return_value=time.monotonic() + 61):
+            ask('b')
+        self.assertEqual(len(llm.calls), 5)
+
+
+class RecordingStreamLLM:
+    """Streams numbered sentences slowly and records whether its stream was closed"""
+    
+    def __init__(self, sentences=100):
+        self.sentences = sentences
+        self.closed = False
+    
+    async def astream(self, prompt):
+        try:
+            for n in range(self.sentences):
+                yield f"Sentence {n}. "
+                await asyncio.sleep(0.01)
+        finally:
+            self.closed = True
+
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        lines = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+class ChatStreamTest(SimpleTestCase):
+    """Test token streaming with sentence boundaries"""
+    
+    def test_sentence_splitter(self):
+        from .services.chat_stream import SentenceSplitter
+        splitter = SentenceSplitter()
+        self.assertEqual(splitter.feed('Revenue grew KES 1.5m this'), [])
+        self.assertEqual(splitter.feed(' month. Great'), ['Revenue grew KES 1.5m this month.'])
+        self.assertEqual(splitter.feed(' work! What next?\nPay'), ['Great work!', 'What next?'])
+        self.assertEqual(splitter.flush(), 'Pay')
+    
+    async def test_first_sentence_arrives_before_answer_finishes(self):
+        from .services.chat_stream import FakeStreamingLLM, stream_chat
+        completed = []
+        llm = FakeStreamingLLM('Cash is fine. Pay the supplier today. Then rest', delay=0)
+        events = parse_events([chunk async for chunk in stream_chat(llm, 'prompt', on_complete=completed.append)])
+        
+        kinds = [kind for kind, _ in events]
+        self.assertLess(kinds.index('sentence'), len(kinds) - 3)  # Well before the last tokens
+        self.assertEqual(
+            [data['text'] for kind, data in events if kind == 'sentence'],
+            ['Cash is fine.', 'Pay the supplier today.', 'Then rest']
+        )
+        self.assertEqual(events[-1], ('done', {'text': 'Cash is fine. Pay the supplier today. Then rest'}))
+        self.assertEqual(completed, ['Cash is fine. Pay the supplier today. Then rest'])
+    
+    async def test_disconnect_cancels_upstream_stream(self):
+        from .services.chat_stream import stream_chat
+        llm = RecordingStreamLLM()
+        received = []
+        
+        async def consume():
+            async for chunk in stream_chat(llm, 'prompt'):
+                received.append(chunk)
+        
+        task = asyncio.create_task(consume())
+        while len(received) < 3:
+            await asyncio.sleep(0.005)
+        task.cancel()  # What the ASGI handler does when the client goes away
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertTrue(llm.closed)
+        self.assertLess(len(received), 20)
+    
+    async def test_llm_failure_becomes_error_event(self):
+        from .services.chat_stream import stream_chat
+        
+        class BrokenLLM:
+            async def astream(self, prompt):
+                yield 'Partial '
+                raise RuntimeError('quota exceeded')
+        
+        with self.assertLogs('finance.services.chat_stream', 'ERROR'):
+            events = parse_events([chunk async for chunk in stream_chat(BrokenLLM(), 'prompt')])
+        self.assertEqual(events[-1][0], 'error')
+        self.assertIn('quota exceeded', events[-1][1]['error'])
+
+
+@override_settings(KAVI_CHAT_FAKE_LLM=True)
+class KaviChatStreamEndpointTest(TestCase):
+    """Test the streaming chat endpoint"""
+    
+    url = '/api/finance/kavi/chat/stream/'
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .services.llm_cache import llm_cache
+        cache.clear()
+        llm_cache.clear()
+        self.user = User.objects.create_user(username='kavi', email='kavi@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Kavi Shop')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        self.other = Business.objects.create(owner=self.user, legal_name='Not Mine')
+        self.headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+    
+    async def post(self, payload, headers=None):
+        return await AsyncClient().post(
+            self.url, json.dumps(payload), content_type='application/json',
+            headers=self.headers if headers is None else headers
+        )
+    
+    async def test_streams_sentences_and_replays_cached_answer(self):
+        from .services.chat_stream import FAKE_ANSWER, FakeStreamingLLM
+        from .services.llm_cache import llm_cache
+        fake = (FakeStreamingLLM(delay=0), {'fake': True})
+        with mock.patch('finance.services.chat_stream.get_streaming_llm', return_value=fake):
+            response = await self.post({'question': 'How is my cash?', 'business_id': self.business.id})
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = parse_events([chunk.decode() async for chunk in response.streaming_content])
+        sentences = [data['text'] for kind, data in events if kind == 'sentence']
+        self.assertEqual(len(sentences), 3)
+        self.assertEqual(events[-1], ('done', {'text': FAKE_ANSWER}))
+        
+        response = await self.post({'question': 'How is my cash?', 'business_id': self.business.id})
+        replay = parse_events([chunk.decode() async for chunk in response.streaming_content])
+        self.assertEqual(replay[-1], ('done', {'text': FAKE_ANSWER}))
+        self.assertEqual(llm_cache.stats()['hits'], 1)
+    
+    async def test_rejects_bad_requests(self):
+        self.assertEqual((await self.post({'question': 'Hi'}, headers={})).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual((await self.post({'question': ' '})).status_code, status.HTTP_400_BAD_REQUEST)
+        response = await self.post({'question': 'Hi', 'business_id': self.other.id})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    async def test_questions_are_rate_limited(self):
+        from rest_framework.settings import api_settings
+        fake = (StubStreamingLLM(), {'fake': True})
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'kavi_chat': '1/min'}), \
+                mock.patch('finance.services.chat_stream.get_streaming_llm', return_value=fake):
+            first = await self.post({'question': 'How is my cash?', 'business_id': self.business.id})
+            [chunk async for chunk in first.streaming_content]
+            second = await self.post({'question': 'And stock?', 'business_id': self.business.id})
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(second['Retry-After'], '60')
+    
+    async def test_unread_response_takes_no_lease(self):
+        from .services.llm_gateway import llm_gateway
+        with mock.patch.object(llm_gateway, 'acquire', wraps=llm_gateway.acquire) as acquire:
+            response = await self.post({'question': 'How is my cash?', 'business_id': self.business.id})
+            await response.streaming_content.aclose()
+        acquire.assert_not_called()
+        self.assertEqual(llm_gateway.stats()['in_flight'], 0)
+    
+    async def test_client_leaving_while_queued_frees_the_slot(self):
+        from .services.llm_gateway import llm_gateway
+        llm_gateway.reset_stats()
+        acquire, queued, go = llm_gateway.acquire, threading.Event(), threading.Event()
+        
+        def slow_acquire(name):
+            queued.set()
+            go.wait(2)
+            return acquire(name)
+        
+        fake = (StubStreamingLLM(), {'fake': True})
+        with mock.patch.object(llm_gateway, 'acquire', side_effect=slow_acquire), \
+                mock.patch('finance.services.chat_stream.get_streaming_llm', return_value=fake):
+            response = await self.post({'question': 'How is my cash?', 'business_id': self.business.id})
+            content = response.streaming_content
+            await content.__anext__()  # The conversation event
+            reading = asyncio.ensure_future(content.__anext__())
+            await asyncio.get_running_loop().run_in_executor(None, queued.wait, 2)
+            reading.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await reading
+            go.set()
+            for _ in range(100):
+                stats = llm_gateway.stats()
+                if stats['calls'].get('chatbot.stream', {}).get('cancelled'):
+                    break
+                await asyncio.sleep(0.01)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['calls']['chatbot.stream']['cancelled'], 1)
+    
+    def test_requires_asgi(self):
+        response = self.client.post(self.url, {'question': 'Hi'}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+
+class KaviContextTest(APITestCase):
+    """Test the compact KAVI context endpoint"""
+    
+    url = '/api/finance/kavi-context/'
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='kavictx', email='kavictx@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Context Shop')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        
+        now = timezone.now()
+        for days_ago, kind, category, amount in [
+            (1, 'income', 'Sales', '1000.00'), (3, 'expense', 'Stock', '300.00'),
+            (10, 'expense', 'Rent', '200.00'), (40, 'income', 'Sales', '500.00'),
+        ]:
+            Transaction.objects.create(
+                business=self.business, user=self.user, amount=Decimal(amount), transaction_type=kind,
+                payment_method='cash', category=category, description=f'{category} {days_ago}',
+                transaction_date=now - timedelta(days=days_ago)
+            )
+        today = now.date()
+        for number, status_, due in [('K-1', 'overdue', -20), ('K-2', 'sent', -2), ('K-3', 'sent', 10)]:
+            Invoice.objects.create(
+                business=self.business, user=self.user, invoice_number=number, customer_name='Wanjiku',
+                subtotal=Decimal('150.00'), total_amount=Decimal('150.00'), status=status_,
+                issue_date=today - timedelta(days=30), due_date=today + timedelta(days=due)
+            )
+    
+    def test_summary_from_aggregates(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data['business'], {'id': self.business.id, 'name': 'Context Shop'})
+        self.assertEqual(data['last_7_days'], {'income': 1000.0, 'expenses': 300.0, 'net': 700.0, 'transaction_count': 2})
+        self.assertEqual(data['last_30_days']['expenses'], 500.0)
+        self.assertEqual(data['top_categories']['expenses'][0], {'category': 'Stock', 'amount': 300.0, 'count': 1})
+        self.assertEqual((data['invoices']['overdue'], data['invoices']['pending']), (2, 1))
+        self.assertEqual([item['invoice_number'] for item in data['overdue']['items']], ['K-1', 'K-2'])
+        self.assertEqual(data['cash_position']['net_cash'], 1000.0)
+        self.assertFalse(data['truncated'])
+    
+    def test_etag_and_data_version_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(3):  # middleware connection check + membership + data version; the context is cached
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        Transaction.objects.create(
+            business=self.business, user=self.user, amount=Decimal('50.00'), transaction_type='income',
+            payment_method='mpesa', description='New sale', transaction_date=timezone.now()
+        )
+        fresh = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual(fresh.data['last_7_days']['income'], 1050.0)
+    
+    def test_staff_get_their_own_records_only(self):
+        staff = User.objects.create_user(username='kavistaff', email='kavistaff@example.com', password='testpass123')
+        Membership.objects.create(user=staff, business=self.business, role_in_business='staff')
+        Transaction.objects.create(
+            business=self.business, user=staff, amount=Decimal('80.00'), transaction_type='income',
+            payment_method='cash', category='Tips', description='Staff sale', transaction_date=timezone.now()
+        )
+        self.client.get(self.url)  # Business-wide context is cached first
+        
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(staff).access_token}')
+        data = self.client.get(self.url).data
+        self.assertEqual(data['role'], 'staff')
+        self.assertEqual(data['last_7_days'], {'income': 80.0, 'expenses': 0.0, 'net': 80.0, 'transaction_count': 1})
+        self.assertEqual([row['description'] for row in data['recent_transactions']], ['Staff sale'])
+        self.assertEqual((data['invoices']['total'], data['overdue']['items']), (0, []))
+        self.assertEqual(data['cash_position']['net_cash'], 80.0)
+    
+    def test_size_budget_trims_lists(self):
+        from .services.kavi_context import compute_kavi_context, fit_to_budget, _size
+        full = compute_kavi_context(self.business.id)
+        budget = _size({**full, 'truncated': False}) - 1
+        context = fit_to_budget(full, budget)
+        self.assertTrue(context['truncated'])
+        self.assertLessEqual(_size(context), budget)
+        # The least useful list goes first; the rest is untouched
+        self.assertEqual(len(context['recent_transactions']), 3)
+        self.assertEqual(len(context['overdue']['items']), 2)
+    
+    def test_other_business_is_not_found(self):
+        other = Business.objects.create(owner=self.user, legal_name='Not Mine')
+        response = self.client.get(f'{self.url}?business={other.id}')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConversationMemoryTest(TestCase):
+    """Test bounded, persisted conversation memory"""
+    
+    def setUp(self):
+        from .models import Conversation
+        self.user = User.objects.create_user(username='memory', email='memory@example.com', password='testpass123')
+        self.conversation = Conversation.objects.create(user=self.user)
+    
+    def test_prompt_history_stays_bounded(self):
+        from .models import ConversationMessage
+        from .services.conversation_memory import ConversationMemory, estimate_tokens
+        memory = ConversationMemory(self.conversation, window_tokens=100, summary_tokens=60)
+        for n in range(40):
+            with self.captureOnCommitCallbacks(execute=True):
+                memory.append_turn(f'Question {n}: how much did I spend on stock in week {n}?',
+                                   f'You spent KES {n * 100} on stock in week {n}. That is within budget.')
+            history = memory.history()
+            self.assertLessEqual(estimate_tokens(history), 100 + 60 + 20)  # window + summary + headings
+        
+        self.assertEqual(ConversationMessage.objects.filter(conversation=self.conversation).count(), 80)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_seq, 80)
+        self.assertGreater(self.conversation.summarized_through_seq, 60)
+        self.assertIn('Question 39', history)  # The latest turn is verbatim
+        self.assertNotIn('Question 0:', history)
+    
+    def test_llm_summary_is_incremental_with_fallback(self):
+        from .services.conversation_memory import ConversationMemory, llm_summarizer
+        prompts = []
+        
+        class SummaryLLM:
+            def invoke(self, prompt):
+                prompts.append(prompt)
+                return f'summary {len(prompts)}'
+        
+        memory = ConversationMemory(self.conversation, window_tokens=30, summarizer=llm_summarizer(SummaryLLM()))
+        for n in range(4):
+            with self.captureOnCommitCallbacks(execute=True):
+                memory.append_turn(f'Question number {n} about my cash flow', f'Answer number {n} about your cash flow')
+        self.assertGreaterEqual(len(prompts), 2)
+        self.assertIn('summary 1', prompts[1])  # Each summary builds on the previous one
+        self.assertTrue(memory.history().startswith('Summary of earlier conversation:\nsummary'))
+        
+        class BrokenLLM:
+            def invoke(self, prompt):
+                raise RuntimeError('timeout')
+        
+        memory.summarizer = llm_summarizer(BrokenLLM())
+        with self.assertLogs('finance.services.conversation_memory', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            memory.append_turn('Question number 9 about tax', 'Answer number 9 about tax')
+        self.assertIn('User: Question number', memory.conversation.summary)
+    
+    def test_summary_runs_after_commit_and_yields_to_concurrent_turn(self):
+        from .models import Conversation
+        from .services.conversation_memory import ConversationMemory
+        calls = []
+        
+        def summarize(previous, messages, max_tokens):
+            calls.append(messages[-1]['seq'])
+            # Another turn of the conversation folds the same messages meanwhile
+            Conversation.objects.filter(pk=self.conversation.pk).update(summary='theirs', summarized_through_seq=2)
+            return 'mine'
+        
+        memory = ConversationMemory(self.conversation, window_tokens=10, summarizer=summarize)
+        with self.captureOnCommitCallbacks(execute=True):
+            memory.append_turn('Question one about my cash flow', 'Answer one about your cash flow')
+        with self.captureOnCommitCallbacks() as callbacks:
+            memory.append_turn('Question two about my cash flow', 'Answer two about your cash flow')
+        self.assertEqual(calls, [])  # Not while the turn's row lock is held
+        self.assertEqual(Conversation.objects.get(pk=self.conversation.pk).last_seq, 4)
+        
+        for callback in callbacks:
+            callback()
+        self.assertEqual(calls, [2])
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.summary, self.conversation.summarized_through_seq), ('theirs', 2))
+        self.assertEqual(memory.conversation.summary, 'theirs')
+    
+    def test_background_summary_does_not_hold_up_the_caller(self):
+        from .services.conversation_memory import ConversationMemory
+        calls = []
+        
+        def summarize(previous, messages, max_tokens):
+            calls.append(messages[-1]['seq'])
+            return 'folded'
+        
+        memory = ConversationMemory(self.conversation, window_tokens=10, summarizer=summarize)
+        memory.append_turn('Question one about my cash flow', 'Answer one about your cash flow')
+        spawned = []
+        with mock.patch.object(memory, '_spawn', side_effect=spawned.append), \
+                self.captureOnCommitCallbacks(execute=True):
+            memory.append_turn('Question two about my cash flow', 'Answer two about your cash flow', background=True)
+        self.assertEqual((calls, len(spawned)), ([], 1))
+        
+        with mock.patch('finance.services.conversation_memory.close_old_connections'):
+            spawned[0]()  # What the thread runs
+        self.assertEqual(calls, [2])
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.summary, self.conversation.summarized_through_seq), ('folded', 2))
+    
+    def test_llm_summary_goes_through_gateway(self):
+        from .services.conversation_memory import llm_summarizer
+        from .services.llm_gateway import LLMCircuitOpen, llm_gateway
+        llm = mock.Mock()
+        with mock.patch.object(llm_gateway, 'acquire', side_effect=LLMCircuitOpen('open')), \
+                self.assertLogs('finance.services.conversation_memory', 'ERROR'):
+            summary = llm_summarizer(llm)('', [{'role': 'user', 'content': 'How is cash?'}], 50)
+        llm.invoke.assert_not_called()
+        self.assertEqual(summary, 'User: How is cash?')
+    
+    def test_chatbot_remembers_earlier_turns(self):
+        from .services.langchain_service import FinancialChatbot
+        chatbot = FinancialChatbot.__new__(FinancialChatbot)
+        chatbot.model_params = {'temperature': 0.7, 'max_tokens': 500}
+        chatbot.chat_chain = StubChain()
+        chatbot.llm = None
+        
+        chatbot.chat('What did I earn today?', conversation=self.conversation)
+        chatbot.chat('And yesterday?', conversation=self.conversation)
+        history = chatbot.chat_chain.calls[1]['history']
+        self.assertIn('User: What did I earn today?', history)
+        self.assertIn('KAVI: answer 1', history)
+    
+    def test_stream_endpoint_continues_conversation(self):
+        from .models import Conversation
+        other = User.objects.create_user(username='stranger', email='stranger@example.com', password='testpass123')
+        stranger_conversation = Conversation.objects.create(user=other)
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        
+        async def ask(payload):
+            response = await AsyncClient().post(
+                '/api/finance/kavi/chat/stream/', json.dumps(payload), content_type='application/json', headers=headers
+            )
+            if response.status_code != 200:
+                return response.status_code, []
+            return response.status_code, parse_events([chunk.decode() async for chunk in response.streaming_content])
+        
+        fake = (StubStreamingLLM(), {'fake': True})
+        with mock.patch('finance.services.chat_stream.get_streaming_llm', return_value=fake):
+            _, events = async_to_sync(ask)({'question': 'How is cash?'})
+            conversation_id = events[0][1]['id']
+            async_to_sync(ask)({'question': 'And stock?', 'conversation_id': conversation_id})
+            code, _ = async_to_sync(ask)({'question': 'Hi', 'conversation_id': str(stranger_conversation.id)})
+        
+        self.assertEqual(code, status.HTTP_404_NOT_FOUND)
+        conversation = Conversation.objects.get(id=conversation_id)
+        self.assertEqual(conversation.last_seq, 4)
+        self.assertIn('User: How is cash?', fake[0].prompts[1])
+
+
+
+class VoiceConversationHistoryTest(APITestCase):
+    """Test the append-only, cursor-paged conversation history"""
+    
+    url = '/api/finance/voice-conversations/'
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='history', email='history@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='History Shop')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+    
+    def turn(self, user_input, **extra):
+        return self.client.post(self.url, {'user_input': user_input, 'ai_response': f'Answer to {user_input}', **extra},
+                                format='json')
+    
+    def test_turns_append_to_one_conversation(self):
+        from .models import ConversationMessage
+        response = self.turn('What did I sell today? Just the total.', business_id=self.business.id,
+                             intent='income', action_taken='none')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        conversation_id = response.data['id']
+        self.assertEqual(response.data['preview'], 'What did I sell today?')
+        
+        response = self.turn('And yesterday?', conversation_id=conversation_id)
+        self.assertEqual(response.data['id'], conversation_id)
+        self.assertEqual(response.data['message_count'], 4)
+        self.assertEqual(response.data['preview'], 'And yesterday?')
+        
+        response = self.client.get(f'{self.url}{conversation_id}/messages/')
+        self.assertEqual([m['seq'] for m in response.data['results']], [4, 3, 2, 1])
+        self.assertEqual(response.data['results'][2]['metadata'], {'intent': 'income', 'action_taken': 'none'})
+        self.assertEqual(ConversationMessage.objects.filter(conversation_id=conversation_id).count(), 4)
+    
+    def test_turn_with_one_side_blank(self):
+        response = self.turn('', ai_response='Hello, how can I help?')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.turn('Are you there?', ai_response='', conversation_id=response.data['id'])
+        self.assertEqual((response.status_code, response.data['message_count']), (status.HTTP_201_CREATED, 4))
+        self.assertEqual(self.turn(' ', ai_response='').status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_history_pages_by_cursor(self):
+        for n in range(5):
+            self.turn(f'Question {n}')
+        
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 2, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get(self.url, params)
+            seen += [entry['preview'] for entry in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [f'Question {n}' for n in reversed(range(5))])
+    
+    def test_listing_reads_conversation_rows_only(self):
+        for n in range(3):
+            conversation_id = self.turn(f'Question {n}').data['id']
+            for m in range(3):
+                self.turn(f'Follow-up {m}', conversation_id=conversation_id)
+        
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        history_queries = [q['sql'] for q in queries if 'finance_conversation' in q['sql']]
+        self.assertEqual(len(history_queries), 1)
+        self.assertNotIn('finance_conversationmessage', history_queries[0])
+        self.assertEqual([entry['message_count'] for entry in response.data['results']], [8, 8, 8])
+    
+    def test_conversations_are_private_and_append_only(self):
+        other = User.objects.create_user(username='nosy', email='nosy@example.com', password='testpass123')
+        conversation_id = self.turn('How is cash?').data['id']
+        stranger = APIClient()
+        stranger.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        
+        self.assertEqual(stranger.get(self.url).data['results'], [])
+        self.assertEqual(stranger.get(f'{self.url}{conversation_id}/').status_code, status.HTTP_404_NOT_FOUND)
+        response = stranger.post(self.url, {'conversation_id': conversation_id, 'user_input': 'Hi', 'ai_response': 'Hello'},
+                                 format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = stranger.post(self.url, {'business_id': self.business.id, 'user_input': 'Hi', 'ai_response': 'Hello'},
+                                 format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.assertEqual(self.client.delete(f'{self.url}{conversation_id}/').status_code,
+                         status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(self.client.put(f'{self.url}{conversation_id}/', {}, format='json').status_code,
+                         status.HTTP_405_METHOD_NOT_ALLOWED)
+
+class StubStreamingLLM:
+    """Streams a short fixed answer and records the prompts it was given"""
+    
+    def __init__(self):
+        self.prompts = []
+    
+    async def astream(self, prompt):
+        self.prompts.append(prompt)
+        for word in ['Looks ', 'good.']:
+            yield word
+
+
+class LedgerIndexTest(TestCase):
+    """Test the per-business ledger search index"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .services.ledger_index import ledger_indexes
+        cache.clear()
+        ledger_indexes.clear()
+        self.addCleanup(ledger_indexes.clear)
+        self.user = User.objects.create_user(username='ledger', email='ledger@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Ledger Shop')
+        self.other_business = Business.objects.create(owner=self.user, legal_name='Other Shop')
+        self.transaction = self.add_transaction('Cooking oil restock', supplier='Bidco')
+        self.add_transaction('Maize flour', supplier='Unga Ltd')
+        self.add_transaction('Airtime top up', customer='Wanjiku')
+        self.add_transaction('Cooking oil', supplier='Bidco', business=self.other_business)
+        Invoice.objects.create(
+            business=self.business, user=self.user, invoice_number='LI-1', customer_name='Hotel Sawa',
+            subtotal=Decimal('900.00'), total_amount=Decimal('900.00'), notes='Weekly bread delivery',
+            issue_date=timezone.now().date(), due_date=timezone.now().date() + timedelta(days=14)
+        )
+    
+    def add_transaction(self, description, business=None, user=None, **fields):
+        return Transaction.objects.create(
+            business=business or self.business, user=user or self.user, amount=Decimal('250.00'), transaction_type='expense',
+            payment_method='mpesa', description=description, transaction_date=timezone.now(), **fields
+        )
+    
+    def test_bm25_ranking_and_updates(self):
+        from .services.ledger_index import LedgerIndex
+        index = LedgerIndex()
+        index.add('a', 'cooking oil cooking oil bidco', {'id': 'a'})
+        index.add('b', 'cooking gas', {'id': 'b'})
+        index.add('c', 'rent for march', {'id': 'c'})
+        self.assertEqual([r['id'] for r in index.search('How much cooking oil?')], ['a', 'b'])
+        self.assertEqual(index.search('what is the'), [])  # Stopwords only
+        
+        index.add('a', 'rent deposit', {'id': 'a'})  # Replaces the earlier version of a
+        self.assertEqual([r['id'] for r in index.search('cooking oil')], ['b'])
+        index.remove('c')
+        self.assertEqual([r['id'] for r in index.search('rent')], ['a'])
+        self.assertEqual(len(index), 2)
+        
+        for n in range(100):  # Churn compacts postings without losing live rows
+            index.add(f'x{n}', 'rent rent', {'id': f'x{n}'})
+            index.remove(f'x{n}')
+        self.assertEqual([r['id'] for r in index.search('rent', k=10)], ['a'])
+    
+    def test_search_is_per_business_and_follows_writes(self):
+        from .services.ledger_index import search_ledger
+        results = search_ledger(self.business.id, 'What did I pay Bidco for cooking oil?')
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['id'], str(self.transaction.id))
+        self.assertEqual(results[0]['party'], 'Bidco')
+        self.assertEqual(search_ledger(self.business.id, 'Hotel Sawa bread')[0]['invoice_number'], 'LI-1')
+        
+        # Committed writes update the built index in place, without queries on the next search
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_transaction('Cooking oil 20 litres', supplier='Kapa Oil')
+            self.transaction.delete()
+        with self.assertNumQueries(0):
+            results = search_ledger(self.business.id, 'cooking oil')
+        self.assertEqual([r['party'] for r in results], ['Kapa Oil'])
+    
+    def test_search_limited_to_one_users_records(self):
+        from .services.ledger_index import search_ledger
+        staff = User.objects.create_user(username='ledgerstaff', email='ledgerstaff@example.com', password='testpass123')
+        self.add_transaction('Cooking oil 5 litres', supplier='Kapa Oil', user=staff)
+        self.assertEqual(len(search_ledger(self.business.id, 'cooking oil')), 2)
+        self.assertEqual([r['party'] for r in search_ledger(self.business.id, 'cooking oil', user_id=staff.id)],
+                         ['Kapa Oil'])
+        
+        # Rows added by the write signals keep their user too
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_transaction('Cooking oil 1 litre', supplier='Pwani', user=staff)
+        self.assertEqual({r['party'] for r in search_ledger(self.business.id, 'oil', user_id=staff.id)},
+                         {'Kapa Oil', 'Pwani'})
+        self.assertEqual(search_ledger(self.business.id, 'Hotel Sawa bread', user_id=staff.id), [])
+    
+    def test_rebuilds_after_write_from_another_process(self):
+        from .services.ledger_index import bump_ledger_version, search_ledger
+        search_ledger(self.business.id, 'airtime')
+        Transaction.objects.filter(description='Airtime top up').update(description='Data bundles')
+        bump_ledger_version(self.business.id)  # What a write in another worker leaves behind
+        self.assertEqual(search_ledger(self.business.id, 'airtime'), [])
+        self.assertEqual(len(search_ledger(self.business.id, 'data bundles')), 1)
+    
+    def test_writes_apply_on_commit_in_version_steps(self):
+        from django.db import transaction
+        from .services.ledger_index import get_ledger_version, search_ledger
+        search_ledger(self.business.id, 'airtime')
+        version = get_ledger_version(self.business.id)
+        try:
+            with transaction.atomic():
+                self.add_transaction('Airtime bonus', customer='Otieno')
+                raise RuntimeError('rolled back')
+        except RuntimeError:
+            pass
+        self.assertEqual(get_ledger_version(self.business.id), version)
+        self.assertEqual(len(search_ledger(self.business.id, 'airtime')), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_transaction('Airtime bonus', customer='Otieno')
+            self.add_transaction('Airtime bundle', customer='Achieng')
+        self.assertEqual(get_ledger_version(self.business.id), version + 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(search_ledger(self.business.id, 'airtime')), 3)
+    
+    def test_chatbot_prompt_includes_matching_records(self):
+        from .services.langchain_service import FinancialChatbot
+        chatbot = FinancialChatbot.__new__(FinancialChatbot)
+        chatbot.model_params = {'temperature': 0.7, 'max_tokens': 500}
+        chatbot.chat_chain = StubChain()
+        chatbot.llm = None
+        
+        chatbot.chat('How much maize flour did I buy?', business_id=self.business.id)
+        records = chatbot.chat_chain.calls[0]['records']
+        self.assertIn('KES 250.00 (Unga Ltd): Maize flour', records)
+        self.assertNotIn('Bidco', records)
+        chatbot.chat('Hello')
+        self.assertEqual(chatbot.chat_chain.calls[1]['records'], '(none)')
+
+
+class IntentRouterTest(TestCase):
+    """Test deterministic answers to common KAVI questions"""
+    
+    def setUp(self):
+        from .services.intent_router import intent_router
+        intent_router.reset_stats()
+        self.addCleanup(intent_router.reset_stats)
+        self.user = User.objects.create_user(username='intent', email='intent@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Intent Shop')
+        now = timezone.now()
+        for kind, amount, category, supplier in [
+            ('income', '1500.00', 'Sales', ''), ('income', '500.00', 'Sales', ''),
+            ('expense', '400.00', 'Stock', 'Bidco'), ('expense', '100.00', 'Transport', 'Bodaboda'),
+        ]:
+            Transaction.objects.create(
+                business=self.business, user=self.user, amount=Decimal(amount), transaction_type=kind,
+                payment_method='mpesa', category=category, supplier=supplier, description=category,
+                transaction_date=now
+            )
+        Invoice.objects.create(
+            business=self.business, user=self.user, invoice_number='IR-1', customer_name='Hotel Sawa',
+            subtotal=Decimal('700.00'), total_amount=Decimal('700.00'), status='sent',
+            issue_date=now.date() - timedelta(days=30), due_date=now.date() - timedelta(days=5)
+        )
+    
+    def test_classifies_quick_commands(self):
+        from .services.intent_router import intent_router
+        cases = {
+            "What's my cash position this week?": 'balance',
+            'Show me overdue invoices': 'overdue_invoices',
+            'Send payment reminders to overdue clients': None,
+            'Analyze my expenses this month': None,
+            'List my top suppliers': 'top_suppliers',
+            "What's my credit score?": 'credit_score',
+            'Any financial risks I should know about?': None,
+            'How much did I make this month?': 'income',
+            'How much did I spend last week': 'expenses',
+            'Did I make a profit today?': 'profit',
+            'Why are my expenses so high?': None,
+        }
+        for question, intent in cases.items():
+            with self.subTest(question=question):
+                self.assertEqual(intent_router.classify(question), intent)
+    
+    def test_unparsed_periods_and_subjects_go_to_llm(self):
+        from .services.intent_router import intent_router
+        for question in [
+            'How much did I make last year?', 'What were my sales in January?', 'Expenses last quarter',
+            'How much did I earn in 2024?', 'How much did I spend in the last 3 months?', 'Income in May',
+            'Revenue for the past 2 weeks', 'What did I spend on Saturday?', 'Sales since March',
+            'What is the sales tax rate in Kenya?', 'What is my average sale?', 'Income per day this week',
+        ]:
+            with self.subTest(question=question):
+                self.assertIsNone(intent_router.classify(question))
+        for question, intent in {
+            'How much did I make in the last 7 days?': 'income',
+            'May I see my expenses last month?': 'expenses',
+            'What is my balance this year?': 'balance',
+        }.items():
+            with self.subTest(question=question):
+                self.assertEqual(intent_router.classify(question), intent)
+        self.assertIsNone(intent_router.route('Sales in February', self.business.id))
+        self.assertEqual(intent_router.stats()['recent_unmatched'], ['sales in february'])
+    
+    def test_answers_from_aggregates(self):
+        from .services.intent_router import intent_router
+        self.assertEqual(
+            intent_router.route('How much did I make today?', self.business.id).text,
+            'You made KES 2,000.00 today from 2 income transactions.'
+        )
+        self.assertIn('KES 500.00', intent_router.route('expenses today', self.business.id).text)
+        self.assertIn('IR-1 to Hotel Sawa, KES 700.00, 5 days overdue',
+                      intent_router.route('Which invoices are overdue?', self.business.id).text)
+        self.assertEqual(intent_router.route("What's my balance?", self.business.id).text,
+                         'Your net cash position is KES 1,500.00 from all recorded income and expenses.')
+        self.assertTrue(intent_router.route('top suppliers', self.business.id).text.startswith(
+            'Your top suppliers over the last 90 days: Bidco, KES 400.00 over 1 payment'))
+        self.assertEqual(intent_router.route('credit score', self.business.id).text,
+                         'No credit score has been calculated for your business yet.')
+        self.assertIsNone(intent_router.route('How much did I make?', None))  # No business to answer for
+    
+    def test_hit_rate_metrics(self):
+        from .services.intent_router import intent_router
+        intent_router.route('How much did I make this month?', self.business.id)
+        intent_router.route('Show me overdue invoices', self.business.id)
+        intent_router.route('Should I hire another cashier?', self.business.id)
+        intent_router.route('Tell me a joke', self.business.id)
+        stats = intent_router.stats()
+        self.assertEqual((stats['questions'], stats['answered'], stats['open_ended'], stats['unmatched']), (4, 2, 1, 1))
+        self.assertEqual(stats['hit_rate'], 50.0)
+        self.assertEqual((stats['intents']['income'], stats['intents']['overdue_invoices']), (1, 1))
+        self.assertEqual(stats['recent_unmatched'], ['tell me a joke'])
+        
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get('/api/finance/kavi/intents/').status_code, status.HTTP_403_FORBIDDEN)
+        admin = User.objects.create_superuser(username='intentadmin', email='ia@example.com', password='testpass123')
+        client.force_authenticate(user=admin)
+        self.assertEqual(client.get('/api/finance/kavi/intents/').data['answered'], 2)
+    
+    def test_chatbot_skips_llm_for_routed_questions(self):
+        from .services.langchain_service import FinancialChatbot
+        chatbot = FinancialChatbot.__new__(FinancialChatbot)
+        chatbot.model_params = {'temperature': 0.7, 'max_tokens': 500}
+        chatbot.chat_chain = StubChain()
+        chatbot.llm = None
+        self.assertEqual(chatbot.chat('How much did I make today?', business_id=self.business.id),
+                         'You made KES 2,000.00 today from 2 income transactions.')
+        self.assertEqual(chatbot.chat_chain.calls, [])
+    
+    def test_stream_endpoint_answers_without_building_llm(self):
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        
+        async def ask():
+            response = await AsyncClient().post(
+                '/api/finance/kavi/chat/stream/',
+                json.dumps({'question': 'Show me overdue invoices', 'business_id': self.business.id}),
+                content_type='application/json', headers=headers
+            )
+            return parse_events([chunk.decode() async for chunk in response.streaming_content])
+        
+        with mock.patch('finance.services.chat_stream.get_streaming_llm') as get_llm:
+            events = async_to_sync(ask)()
+        get_llm.assert_not_called()
+        self.assertEqual(events[-1][0], 'done')
+        self.assertTrue(events[-1][1]['text'].startswith('You have 1 overdue invoice worth KES 700.00.'))
+    
+    def test_staff_are_answered_from_their_own_records(self):
+        staff = User.objects.create_user(username='intentstaff', email='intentstaff@example.com', password='testpass123')
+        Membership.objects.create(user=staff, business=self.business, role_in_business='staff')
+        Transaction.objects.create(
+            business=self.business, user=staff, amount=Decimal('300.00'), transaction_type='income',
+            payment_method='cash', category='Sales', description='Counter sale', transaction_date=timezone.now()
+        )
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(staff).access_token}'}
+        
+        async def ask(question):
+            response = await AsyncClient().post(
+                '/api/finance/kavi/chat/stream/', json.dumps({'question': question, 'business_id': self.business.id}),
+                content_type='application/json', headers=headers
+            )
+            return parse_events([chunk.decode() async for chunk in response.streaming_content])[-1][1]['text']
+        
+        self.assertEqual(async_to_sync(ask)('How much did I make today?'),
+                         'You made KES 300.00 today from 1 income transaction.')
+        self.assertEqual(async_to_sync(ask)('Which invoices are overdue?'), 'You have no overdue invoices.')
+
+
+class LLMGatewayTest(SimpleTestCase):
+    """Test concurrency limits, deadlines and the circuit breaker around LLM calls"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+    
+    def gateway(self, **limits):
+        from .services.llm_gateway import LLMGateway
+        defaults = {'max_concurrent': 1, 'max_queue': 0, 'queue_timeout': 0.05, 'timeout': 1.0,
+                    'global_max_concurrent': 0, 'breaker_threshold': 2, 'breaker_cooldown': 0.2}
+        return LLMGateway(**{**defaults, **limits})
+    
+    def test_rejects_fast_when_full(self):
+        from .services.llm_gateway import LLMBusy
+        gateway = self.gateway()
+        lease = gateway.acquire('chat')
+        started = time.monotonic()
+        with self.assertRaises(LLMBusy):
+            gateway.acquire('chat')
+        self.assertLess(time.monotonic() - started, 0.5)
+        lease.release(True)
+        gateway.acquire('chat').release(True)
+        self.assertEqual(gateway.stats()['calls']['chat']['rejected'], 1)
+    
+    def test_queued_caller_gets_freed_slot(self):
+        gateway = self.gateway(max_queue=1, queue_timeout=2.0)
+        lease = gateway.acquire('chat')
+        threading.Timer(0.1, lease.release, args=(True,)).start()
+        gateway.acquire('chat').release(True)
+        self.assertEqual(gateway.stats()['calls']['chat']['succeeded'], 2)
+    
+    def test_global_slots_are_shared(self):
+        from .services.llm_gateway import LLMBusy
+        first, second = self.gateway(global_max_concurrent=1), self.gateway(global_max_concurrent=1)
+        lease = first.acquire('chat')
+        with self.assertRaises(LLMBusy):
+            second.acquire('chat')
+        lease.release(True)
+        second.acquire('chat').release(True)
+    
+    def test_deadline_keeps_slot_until_call_finishes(self):
+        from .services.llm_gateway import LLMTimeout
+        gateway = self.gateway(timeout=0.1)
+        finished = threading.Event()
+        
+        def slow():
+            time.sleep(0.4)
+            finished.set()
+            return 'late answer'
+        
+        started = time.monotonic()
+        with self.assertRaises(LLMTimeout):
+            gateway.call('chat', slow)
+        self.assertLess(time.monotonic() - started, 0.35)
+        self.assertEqual(gateway.stats()['in_flight'], 1)
+        finished.wait(2)
+        time.sleep(0.05)
+        stats = gateway.stats()
+        self.assertEqual((stats['in_flight'], stats['calls']['chat']['timeouts'], stats['calls']['chat']['succeeded']),
+                         (0, 1, 0))
+    
+    def test_abandoned_trial_lets_next_caller_probe(self):
+        from .services.llm_gateway import LLMCircuitOpen
+        gateway = self.gateway(max_concurrent=2)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                gateway.call('chat', mock.Mock(side_effect=RuntimeError('upstream 500')))
+        time.sleep(0.25)
+        gateway.acquire('chat').release(None)  # Client left before the probe said anything
+        self.assertEqual(gateway.stats()['circuit'], 'half_open')
+        
+        trial = gateway.acquire('chat')
+        with self.assertRaises(LLMCircuitOpen):
+            gateway.acquire('chat')  # Still one probe at a time
+        trial.release(True)
+        self.assertEqual(gateway.stats()['circuit'], 'closed')
+    
+    def test_circuit_opens_and_recovers(self):
+        from .services.llm_gateway import LLMCircuitOpen
+        gateway = self.gateway()
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                gateway.call('chat', mock.Mock(side_effect=RuntimeError('upstream 500')))
+        self.assertEqual(gateway.stats()['circuit'], 'open')
+        
+        call = mock.Mock(return_value='ok')
+        with self.assertRaises(LLMCircuitOpen):
+            gateway.call('chat', call)
+        call.assert_not_called()
+        
+        time.sleep(0.25)  # Cooldown over: one trial call closes the circuit again
+        self.assertEqual(gateway.call('chat', call, prompt='x' * 40), 'ok')
+        stats = gateway.stats()
+        self.assertEqual(stats['circuit'], 'closed')
+        self.assertEqual((stats['calls']['chat']['short_circuited'], stats['calls']['chat']['prompt_tokens']), (1, 10))
+        self.assertIsNotNone(stats['calls']['chat']['p95_ms'])
+
+
+class LLMFallbackTest(TestCase):
+    """Test the fallbacks served when the LLM gateway turns a call away"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .services.langchain_service import LangChainFinancialAdvisor
+        from .services.llm_cache import llm_cache
+        from .services.llm_gateway import llm_gateway
+        cache.clear()
+        llm_cache.clear()
+        llm_gateway.reset_stats()
+        self.user = User.objects.create_user(username='fallback', email='fallback@example.com', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Fallback Shop')
+        Transaction.objects.create(
+            business=self.business, user=self.user, amount=Decimal('800.00'), transaction_type='income',
+            payment_method='mpesa', description='Sales', transaction_date=timezone.now()
+        )
+        self.advisor = LangChainFinancialAdvisor.__new__(LangChainFinancialAdvisor)  # Skip building a real LLM
+        self.advisor.model_params = {'temperature': 0.3, 'max_tokens': 1000}
+        self.advisor.health_chain = mock.Mock()
+        self.advisor.health_chain.run.return_value = {'health_score': 80, 'insights': ['From the model']}
+    
+    def gateway_down(self):
+        from .services.llm_gateway import LLMCircuitOpen
+        return mock.patch('finance.services.langchain_service.llm_gateway.call', side_effect=LLMCircuitOpen('down'))
+    
+    def test_health_falls_back_to_cached_then_rules(self):
+        with self.gateway_down():
+            result = self.advisor.analyze_financial_health({'income': 800}, business_id=self.business.id)
+        self.assertEqual((result['fallback'], result['fallback_reason']), ('rules', 'circuit_open'))
+        self.assertIn('Positive cash flow - business is profitable', result['insights'][0])
+        self.advisor.health_chain.run.assert_not_called()
+        
+        self.advisor.analyze_financial_health({'income': 800}, business_id=self.business.id)
+        self.advisor.health_chain.run.assert_called_once()
+        Transaction.objects.create(  # New data version: the cached analysis is stale but still a fallback
+            business=self.business, user=self.user, amount=Decimal('50.00'), transaction_type='expense',
+            payment_method='cash', description='Airtime', transaction_date=timezone.now()
+        )
+        with self.gateway_down():
+            result = self.advisor.analyze_financial_health({'income': 800}, business_id=self.business.id)
+        self.assertEqual((result['fallback'], result['insights']), ('cached', ['From the model']))
+    
+    def test_chat_answers_from_rules(self):
+        from .services.langchain_service import FinancialChatbot
+        from .services.llm_gateway import LLMBusy
+        chatbot = FinancialChatbot.__new__(FinancialChatbot)
+        chatbot.model_params = {'temperature': 0.7, 'max_tokens': 500}
+        chatbot.chat_chain = StubChain()
+        with mock.patch('finance.services.langchain_service.llm_gateway.call', side_effect=LLMBusy('busy')):
+            answer = chatbot.chat('Should I open a second shop?', business_id=self.business.id)
+        self.assertTrue(answer.startswith("I'm getting a lot of questions right now, so here is a quick read"))
+        self.assertIn('Positive cash flow - business is profitable.', answer)
+    
+    def test_stream_endpoint_serves_fallback_and_stats(self):
+        from .services.llm_gateway import LLMCircuitOpen
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        
+        async def ask():
+            response = await AsyncClient().post(
+                '/api/finance/kavi/chat/stream/',
+                json.dumps({'question': 'Should I hire?', 'business_id': self.business.id}),
+                content_type='application/json', headers=headers
+            )
+            return parse_events([chunk.decode() async for chunk in response.streaming_content])
+        
+        fake = (StubStreamingLLM(), {'fake': True})
+        with mock.patch('finance.services.chat_stream.get_streaming_llm', return_value=fake), \
+                mock.patch('finance.services.llm_gateway.llm_gateway.acquire', side_effect=LLMCircuitOpen('down')):
+            events = async_to_sync(ask)()
+        self.assertEqual(fake[0].prompts, [])
+        self.assertTrue(events[-1][1]['text'].startswith("I can't reach my AI service at the moment"))
+        
+        with mock.patch('finance.services.chat_stream.get_streaming_llm', return_value=fake):
+            events = async_to_sync(ask)()
+        self.assertEqual(events[-1][1]['text'], 'Looks good.')
+        
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_superuser(
+            username='gatewayadmin', email='ga@example.com', password='testpass123'))
+        stats = client.get('/api/finance/llm-gateway/').data
+        self.assertEqual(stats['gateway']['calls']['chatbot.stream']['succeeded'], 1)
+        self.assertIn('hits', stats['cache'])
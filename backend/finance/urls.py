@@ -27,4 +27,9 @@ urlpatterns = [
     path('mpesa/callback/', views.mpesa_callback, name='mpesa-callback'),
     path('mpesa/payments/', views.mpesa_payments, name='mpesa-payments'),
     path('mpesa/payments/<uuid:payment_id>/', views.mpesa_payment_status, name='mpesa-payment-status'),
+    path('kavi-context/', views.kavi_context, name='kavi-context'),
+    # KAVI chat, streamed as server-sent events (served under ASGI)
+    path('kavi/chat/stream/', views.kavi_chat_stream, name='kavi-chat-stream'),
+    path('kavi/intents/', views.kavi_intent_stats, name='kavi-intent-stats'),
+    path('llm-gateway/', views.llm_gateway_stats, name='llm-gateway-stats'),
 ]
@@ -1,27 +1,36 @@
 # backend/finance/views.py
-from .cache_utils import cached_response, invalidate_dashboard_cache
+from .cache_utils import business_data_etag, invalidate_dashboard_cache
+from django.core.cache import cache
 from django.shortcuts import render
-from django.db.models import Sum, Count, Avg, Q, F
+from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Sum, Count, Avg, Q, F, Case, When
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
-from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth.models import User
 from .models import (
     Transaction, Invoice, InvoiceItem, Budget, CashFlow, 
-    FinancialForecast, CreditScore, Supplier, MpesaPayment
+    FinancialForecast, CreditScore, Supplier, MpesaPayment, Conversation
 )
 from .serializers import (
     TransactionSerializer, InvoiceSerializer, InvoiceItemSerializer,
     BudgetSerializer, CashFlowSerializer, FinancialForecastSerializer,
     CreditScoreSerializer, FinancialSummarySerializer, TransactionAnalyticsSerializer,
-    BudgetAnalyticsSerializer, SupplierSerializer, MpesaPaymentSerializer
+    BudgetAnalyticsSerializer, SupplierSerializer, MpesaPaymentSerializer,
+    ConversationSummarySerializer, ConversationMessageSerializer, ConversationTurnSerializer
 )
+from .services.conversation_memory import ConversationMemory
+from core.cache_utils import etag_matches, not_modified, set_etag
+from core.pagination import keyset_paginate
+from core.throttling import MpesaSTKPushThrottle
 from users.models import Business, Membership
 
+DASHBOARD_CACHE_TIMEOUT = 300
+
 def get_user_businesses(user):
     """Get all businesses a user is a member of"""
     if user.is_superuser:
@@ -82,6 +91,14 @@ class TransactionViewSet(viewsets.ModelViewSet):
         
         return qs.order_by('-transaction_date')
     
+    def list(self, request, *args, **kwargs):
+        # Revalidation answers 304 after one version query, before the list is built
+        etag = business_data_etag(request, 'transactions')
+        if etag and etag_matches(request, etag):
+            return not_modified(etag)
+        response = super().list(request, *args, **kwargs)
+        return set_etag(response, etag) if etag else response
+    
     def get_permissions(self):
         # Allow list access for unauthenticated users (demo mode)
         if self.action == 'list':
@@ -329,6 +346,14 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         
         return qs.order_by('-issue_date')
     
+    def list(self, request, *args, **kwargs):
+        # Revalidation answers 304 after one version query; days_overdue changes daily
+        etag = business_data_etag(request, 'invoices', timezone.localdate())
+        if etag and etag_matches(request, etag):
+            return not_modified(etag)
+        response = super().list(request, *args, **kwargs)
+        return set_etag(response, etag) if etag else response
+    
     def get_permissions(self):
         # Allow list access for unauthenticated users (demo mode)
         if self.action == 'list':
@@ -707,14 +732,25 @@ class CreditScoreViewSet(viewsets.ModelViewSet):
 
 
 # Additional API endpoints
-@cached_response(timeout=300, key_prefix="dashboard")  # Cache for 5 minutes
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def dashboard_data(request):
-    """Get comprehensive dashboard data"""
+    """
+    Get comprehensive dashboard data. The ETag follows the data versions of the
+    user's businesses; the body is cached per ETag, so it is never stale.
+    """
     business_id = request.query_params.get('business_id')
     period = request.query_params.get('period', '30')
     
+    # The period window moves with the date, so the ETag does too
+    etag = business_data_etag(request, 'dashboard', timezone.localdate(), business_param='business_id')
+    if etag:
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        cached = cache.get(f"dashboard:{etag}")
+        if cached is not None:
+            return set_etag(Response(cached), etag)
+    
     # Get user's businesses
     businesses = Business.objects.filter(owner=request.user)
     if business_id:
@@ -771,7 +807,10 @@ def dashboard_data(request):
         'businesses': [{'id': b.id, 'name': b.legal_name} for b in businesses]
     }
     
-    return Response(dashboard_data)
+    if not etag:
+        return Response(dashboard_data)
+    cache.set(f"dashboard:{etag}", dashboard_data, DASHBOARD_CACHE_TIMEOUT)
+    return set_etag(Response(dashboard_data), etag)
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
@@ -842,45 +881,60 @@ class SupplierViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user, business=business)
 
 
-class VoiceConversationViewSet(viewsets.ModelViewSet):
-    """ViewSet for storing voice conversation history"""
+class VoiceConversationViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                               viewsets.GenericViewSet):
+    """
+    Assistant conversation history (voice and typed). Append-only: a POST adds a
+    turn, to conversation_id when given and to a new conversation otherwise.
+    Listings read only the conversation rows and page by cursor, newest first.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ConversationSummarySerializer
+    lookup_value_regex = '[0-9a-f-]{36}'
     
     def get_queryset(self):
-        # Return empty queryset for now - conversations are stored client-side
-        return []
+        return Conversation.objects.filter(user=self.request.user, last_message_at__isnull=False)
     
-    def get_serializer_class(self):
-        # Simple serializer for accepting conversation data
-        from rest_framework import serializers
-        
-        class VoiceConversationSerializer(serializers.Serializer):
-            conversation_id = serializers.CharField(required=False)
-            messages = serializers.ListField(required=False)
-            timestamp = serializers.DateTimeField(required=False)
-            
-            class Meta:
-                fields = ['conversation_id', 'messages', 'timestamp']
-        
-        return VoiceConversationSerializer
+    def list(self, request, *args, **kwargs):
+        # The rolling memory summary is for prompts, not listings
+        conversations = self.get_queryset().defer('summary')
+        page, next_cursor = keyset_paginate(conversations, request, ordering='-last_message_at')
+        serializer = self.get_serializer(page, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
     
     def create(self, request, *args, **kwargs):
-        # Accept the data but don't store it (client-side storage)
-        # Return success response
-        return Response({
-            'status': 'success',
-            'message': 'Conversation logged (client-side storage)'
-        }, status=status.HTTP_201_CREATED)
+        turn = ConversationTurnSerializer(data=request.data)
+        turn.is_valid(raise_exception=True)
+        data = turn.validated_data
+        
+        if data.get('conversation_id'):
+            conversation = Conversation.objects.filter(id=data['conversation_id'], user=request.user).first()
+            if conversation is None:
+                return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            business_id = data.get('business_id')
+            if business_id and not get_business_queryset(request.user, business_id).exists():
+                return Response({'error': 'Business not found or access denied'}, status=status.HTTP_403_FORBIDDEN)
+            conversation = Conversation.objects.create(user=request.user, business_id=business_id)
+        
+        metadata = {key: data[key] for key in ('intent', 'action_taken') if data.get(key)}
+        conversation = ConversationMemory(conversation).append_turn(data['user_input'], data['ai_response'], metadata)
+        return Response(self.get_serializer(conversation).data, status=status.HTTP_201_CREATED)
     
-    def list(self, request, *args, **kwargs):
-        # Return empty list - conversations are client-side
-        return Response([])
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """A conversation's messages, newest first"""
+        conversation = self.get_object()
+        page, next_cursor = keyset_paginate(conversation.messages.all(), request, ordering='-seq')
+        serializer = ConversationMessageSerializer(page, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
 
 
 # ==================== M-PESA ENDPOINTS ====================
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([MpesaSTKPushThrottle])
 def initiate_mpesa_payment(request):
     """Initiate M-Pesa STK Push payment"""
     try:
@@ -1042,11 +1096,11 @@ def mpesa_callback(request):
                 mpesa_payment.invoice.paid_at = timezone.now()
                 mpesa_payment.invoice.save()
             
-            # Create notification
-            from core.models import Notification
-            Notification.objects.create(
-                user=mpesa_payment.user,
-                business=mpesa_payment.business,
+            # Notify everyone in the business, and the payer even without a membership
+            from core.services.notification_dispatch import notify_business
+            notify_business(
+                mpesa_payment.business_id,
+                also_notify=[mpesa_payment.user_id],
                 title='Payment Received',
                 message=f'M-Pesa payment of {mpesa_payment.amount} KES received. Receipt: {receipt_number}',
                 notification_type='mpesa_payment',
@@ -1116,3 +1170,263 @@ def mpesa_payments(request):
     
     serializer = MpesaPaymentSerializer(payments, many=True)
     return Response(serializer.data)
+
+
+# ==================== KAVI CONTEXT ENDPOINT ====================
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def kavi_context(request):
+    """
+    Compact financial summary for the voice assistant's prompt, built from
+    aggregates and cached per business data version. Defaults to the first
+    business the user administers. Business admins get the whole business;
+    other members only their own transactions and invoices, as in the lists.
+    Sends an ETag; If-None-Match gets a 304.
+    """
+    from core.cache_utils import compute_etag, etag_matches, not_modified, set_etag
+    from .services.kavi_context import get_kavi_context
+
+    user = request.user
+    business_id = request.query_params.get('business')
+    memberships = Membership.objects.filter(user=user, is_active=True).select_related('business')
+    if business_id:
+        try:
+            memberships = memberships.filter(business_id=int(business_id))
+        except ValueError:
+            return Response({'error': 'business must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    membership = memberships.order_by(
+        # Prefer a business the user administers
+        Case(When(role_in_business='business_admin', then=0), default=1), 'created_at'
+    ).first()
+
+    if membership:
+        business, role = membership.business, membership.role_in_business
+    elif user.is_superuser and business_id:
+        business, role = Business.objects.filter(id=business_id).first(), 'super_admin'
+    else:
+        business = None
+    if business is None:
+        return Response({'error': 'Business not found or access denied'}, status=status.HTTP_404_NOT_FOUND)
+
+    payload = {
+        'business': {'id': business.id, 'name': business.legal_name},
+        'role': role,
+        **get_kavi_context(business.id, None if role in ('business_admin', 'super_admin') else user.id),
+    }
+    etag = compute_etag(payload)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return set_etag(Response(payload), etag)
+
+
+# ==================== KAVI CHAT ENDPOINT ====================
+
+@csrf_exempt
+async def kavi_chat_stream(request):
+    """
+    Stream a KAVI chat answer as server-sent events (token, sentence, done or
+    error; see finance/services/chat_stream.py). POST JSON with question and
+    optionally context, business_id and conversation_id. With a business_id, the
+    business's best-matching transactions and invoices go into the prompt
+    (finance/services/ledger_index.py); common questions with an exact answer
+    skip the LLM altogether (finance/services/intent_router.py), and when the
+    LLM gateway turns the call away a rule-based answer is streamed instead.
+    Members who are not business admins are answered from the records they
+    entered themselves, as the transaction and invoice lists show them.
+    Questions are rate limited per user and business (kavi_chat, see
+    core/throttling.py). Sentence events let the voice UI start speaking
+    before the answer is finished. The first event, conversation, carries the
+    id to send with follow-up questions; each turn is stored in that
+    conversation's bounded memory. Needs an ASGI server.
+    """
+    import asyncio
+    import json
+    import logging
+    from asgiref.sync import sync_to_async
+    from django.core.exceptions import ValidationError as DjangoValidationError
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import JsonResponse, StreamingHttpResponse
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+    from core.authentication import authenticate_stream_request
+    from core.events import format_event
+    from core.throttling import check_rate, retry_after
+    from .models import Conversation
+    from .services.chat_stream import FakeStreamingLLM, get_streaming_llm, stream_chat
+    from .services.langchain_service import (
+        CHAT_TEMPLATE, chat_inputs, conversation_memory, fallback_answer, relevant_records, route_question
+    )
+    from .services.llm_cache import llm_cache
+    from .services.llm_gateway import LLMUnavailable, llm_gateway
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Chat streaming requires an ASGI server'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    try:
+        user = await sync_to_async(authenticate_stream_request)(request)
+    except (InvalidToken, TokenError, AuthenticationFailed) as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    question = str(payload.get('question') or '').strip()
+    context = payload.get('context') or {}
+    if not question:
+        return JsonResponse({'error': 'question is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(question) > 2000 or not isinstance(context, dict):
+        return JsonResponse({'error': 'question must be at most 2000 characters and context an object'},
+                            status=status.HTTP_400_BAD_REQUEST)
+    try:
+        business_id = int(payload['business_id']) if payload.get('business_id') else None
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'business_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    own_records = None  # Staff only get their own transactions and invoices, as in the lists
+    if business_id:
+        def access():
+            from users.views import user_is_business_admin
+            full_user = user.user
+            if full_user is None or not get_business_queryset(full_user, business_id).exists():
+                return None
+            return 'admin' if user_is_business_admin(full_user, business_id) else 'own'
+
+        scope = await sync_to_async(access)()
+        if scope is None:
+            return JsonResponse({'error': 'Business not found or access denied'}, status=status.HTTP_403_FORBIDDEN)
+        own_records = user.id if scope == 'own' else None
+
+    # Only once access is checked, so made-up business ids cannot each get a fresh bucket
+    wait = check_rate('kavi_chat', user.id, business_id)
+    if wait:
+        response = JsonResponse({'error': f'Too many questions; try again in {retry_after(wait)} seconds'},
+                                status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = retry_after(wait)
+        return response
+
+    conversation_id = payload.get('conversation_id')
+    if conversation_id:
+        try:
+            conversation = await Conversation.objects.filter(id=conversation_id, user_id=user.id).afirst()
+        except (TypeError, ValueError, DjangoValidationError):
+            conversation = None
+        if conversation is None:
+            return JsonResponse({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+    else:
+        conversation = await Conversation.objects.acreate(user_id=user.id, business_id=business_id)
+
+    routed = await sync_to_async(route_question)(question, business_id, own_records)
+    if routed is not None:
+        # Answered from the business's figures; the LLM is not needed (or built) for it
+        llm = cache_key = None
+        memory = conversation_memory(conversation)
+        cached = routed.text
+    else:
+        try:
+            # The first call in a worker builds the chatbot; keep that off the event loop
+            llm, model_params = await sync_to_async(get_streaming_llm, thread_sensitive=False)()
+        except ImportError:
+            return JsonResponse({'error': 'AI chat is not available'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        # Summarize older turns with the model when it can; otherwise extractively
+        memory = conversation_memory(conversation, llm if hasattr(llm, 'invoke') else None)
+        inputs = chat_inputs(question, context, await sync_to_async(memory.history)(),
+                             await sync_to_async(relevant_records)(business_id, question, own_records))
+        cache_key = await sync_to_async(llm_cache.key)('chatbot.chat', model_params, inputs, business_id)
+        cached = llm_cache.get(cache_key)
+
+    logger = logging.getLogger(__name__)
+    answered = []
+
+    def release_abandoned(acquiring):
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            acquiring.result().release(None)
+
+    async def acquire_lease():
+        # May wait briefly in the gateway's queue; keep that off the event loop. If the
+        # client leaves meanwhile, the thread can still be granted a slot: hand it back.
+        acquiring = asyncio.ensure_future(
+            sync_to_async(llm_gateway.acquire, thread_sensitive=False)('chatbot.stream')
+        )
+        try:
+            return await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            acquiring.add_done_callback(release_abandoned)
+            raise
+
+    async def remember(answer):
+        answered.append(answer)
+        if cache_key:
+            llm_cache.set(cache_key, answer)
+        try:
+            # Summarizing older turns may take another LLM call; the done event and the lease must not wait for it
+            await sync_to_async(memory.append_turn)(question, answer, {'intent': routed.intent} if routed else None,
+                                                    background=True)
+        except Exception:
+            # The answer has been streamed already; losing the turn must not turn it into an error
+            logger.exception("Could not store turn of conversation %s", conversation.id)
+
+    async def events():
+        # The lease is taken in here, not before the response is returned, so a client
+        # that leaves before the body is read never holds a slot
+        nonlocal cache_key
+        yield format_event({'event': 'conversation', 'data': {'id': str(conversation.id)}})
+        text = cached
+        if text is None:
+            try:
+                lease = await acquire_lease()
+            except LLMUnavailable as e:
+                cache_key = None
+                text = await sync_to_async(fallback_answer)(business_id, e, own_records)
+        if text is not None:
+            answer = stream_chat(FakeStreamingLLM(text, delay=0), None, on_complete=remember)
+            async for chunk in answer:
+                yield chunk
+            return
+
+        prompt = CHAT_TEMPLATE.format(**inputs)
+        outcome = False  # Failed or timed out
+        try:
+            async for chunk in stream_chat(llm, prompt, on_complete=remember, timeout=llm_gateway.timeout):
+                yield chunk
+            outcome = bool(answered)
+        except asyncio.CancelledError:
+            outcome = None  # The client left; says nothing about the model
+            raise
+        finally:
+            lease.release(outcome, prompt, answered[0] if answered else '')
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def kavi_intent_stats(request):
+    """How many KAVI questions the intent router answered without the LLM (counters are per worker process)"""
+    if not request.user.is_superuser:
+        return Response({'error': 'Super admin access required'}, status=status.HTTP_403_FORBIDDEN)
+
+    from .services.intent_router import intent_router
+    return Response(intent_router.stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def llm_gateway_stats(request):
+    """Circuit state, concurrency, latency and token counts of LLM calls, plus LLM cache hits (per worker process)"""
+    if not request.user.is_superuser:
+        return Response({'error': 'Super admin access required'}, status=status.HTTP_403_FORBIDDEN)
+
+    from .services.llm_cache import llm_cache
+    from .services.llm_gateway import llm_gateway
+    return Response({'gateway': llm_gateway.stats(), 'cache': llm_cache.stats()})
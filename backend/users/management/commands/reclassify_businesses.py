@@ -0,0 +1,146 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.services.firecrawl import classify_business_from_website
+from finance.cache_utils import bump_business_data_version
+from users.models import Business
+
+UPDATE_FIELDS = ['classified_category', 'classified_confidence', 'classified_tags',
+                 'last_classified_at', 'classified_website']
+
+
+def website_domain(website):
+    """Host of a website URL without scheme, port or leading www."""
+    url = website.strip().lower()
+    if '://' not in url:
+        url = f'http://{url}'
+    host = urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def classification_failed(category, tags):
+    return category == 'unknown' and ('error' in (tags or {}) or 'reason' in (tags or {}))
+
+
+class Command(BaseCommand):
+    help = ('Classify businesses whose classification is missing, older than --max-age-days or made from a '
+            'different website, through a bounded thread pool. Interrupted runs resume from a checkpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=30, help='Reclassify after this many days (default: 30)')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent classification calls (default: 8)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Businesses written per bulk_update (default: 200)')
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, 'logs', 'reclassify_checkpoint.json'),
+            help='Progress file used to resume an interrupted run'
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many businesses would be classified')
+
+    def handle(self, *args, **options):
+        checkpoint_path = options['checkpoint']
+        checkpoint = None if options['restart'] else self.read_checkpoint(checkpoint_path)
+        if checkpoint:
+            cutoff = parse_datetime(checkpoint['cutoff'])
+            last_pk = checkpoint['last_pk']
+            self.stdout.write(f'Resuming after business {last_pk}')
+        else:
+            cutoff = timezone.now() - timedelta(days=options['max_age_days'])
+            last_pk = 0
+
+        stale = Business.objects.exclude(website='').filter(
+            Q(last_classified_at__isnull=True)
+            | Q(last_classified_at__lt=cutoff)
+            | ~Q(classified_website=F('website'))
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{stale.filter(pk__gt=last_pk).count()} business(es) would be classified')
+            return
+
+        results = {}  # domain -> (category, confidence, tags), shared across batches
+        classified = failed = 0
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            while True:
+                batch = list(stale.filter(pk__gt=last_pk).order_by('pk').only('id', 'website')[:max(options['batch_size'], 1)])
+                if not batch:
+                    break
+
+                # One call per domain, however many businesses share it
+                websites = {}
+                for business in batch:
+                    websites.setdefault(website_domain(business.website), business.website)
+                pending = [domain for domain in websites if domain not in results]
+                for domain, result in zip(pending, pool.map(lambda d: self.classify(websites[d]), pending)):
+                    results[domain] = result
+
+                classified_at = timezone.now()
+                updated = []
+                for business in batch:
+                    category, confidence, tags = results[website_domain(business.website)]
+                    if classification_failed(category, tags):
+                        failed += 1
+                        continue
+                    business.classified_category = category
+                    business.classified_confidence = confidence
+                    business.classified_tags = tags
+                    business.last_classified_at = classified_at
+                    business.classified_website = business.website
+                    updated.append(business)
+                with transaction.atomic():
+                    Business.objects.bulk_update(updated, UPDATE_FIELDS)
+                    # bulk_update skips the signals that move each business to a new data version
+                    for business in updated:
+                        bump_business_data_version(business.pk)
+                classified += len(updated)
+
+                last_pk = batch[-1].pk
+                self.write_checkpoint(checkpoint_path, cutoff, last_pk)
+                self.stdout.write(f'  classified {classified}, failed {failed} (through business {last_pk})')
+
+        self.clear_checkpoint(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Classified {classified} business(es) from {len(results)} domain(s), {failed} failed'
+        ))
+
+    def classify(self, website):
+        try:
+            # Past the cache: these businesses are due precisely because their
+            # classification is old, and a refresh stores the new one for everyone
+            return tuple(classify_business_from_website.refresh(website))
+        finally:
+            # The result cache gives each pool thread its own DB connection
+            close_old_connections()
+
+    def read_checkpoint(self, path):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            self.stderr.write(f'Ignoring unreadable checkpoint {path}')
+            return None
+
+    def write_checkpoint(self, path, cutoff, last_pk):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'cutoff': cutoff.isoformat(), 'last_pk': last_pk}, f)
+        os.replace(tmp_path, path)
+
+    def clear_checkpoint(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
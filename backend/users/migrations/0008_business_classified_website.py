@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:48
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_classified_website(apps, schema_editor):
+    # Assume already-classified businesses were classified from their current website
+    Business = apps.get_model('users', 'Business')
+    Business.objects.filter(last_classified_at__isnull=False).update(classified_website=F('website'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_businessregistration_id_document_url_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='classified_website',
+            field=models.URLField(blank=True),
+        ),
+        migrations.RunPython(backfill_classified_website, migrations.RunPython.noop),
+    ]
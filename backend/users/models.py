@@ -31,6 +31,7 @@ class Business(models.Model):
     classified_confidence = models.FloatField(null=True, blank=True)
     classified_tags = models.JSONField(null=True, blank=True)
     last_classified_at = models.DateTimeField(null=True, blank=True)
+    classified_website = models.URLField(blank=True)  # website the classification was made from
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -3,7 +3,7 @@ from rest_framework.views import APIView
 # backend/users/views.py
 from django.utils.timezone import now
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.exceptions import PermissionDenied
@@ -22,6 +22,7 @@ from .serializers import (
     IndividualRegistrationSerializer, IndividualRegistrationCreateSerializer
 )
 from core.services.firecrawl import classify_business_from_website
+from core.throttling import AdminAnalyticsThrottle, BusinessClassifyThrottle
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import AllowAny
 from finance.serializers import TransactionSerializer
@@ -97,7 +98,7 @@ class BusinessViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[BusinessClassifyThrottle])
     def classify(self, request, pk=None):
         business = self.get_object()
         website = business.website or request.data.get('website')
@@ -106,9 +107,19 @@ class BusinessViewSet(viewsets.ModelViewSet):
         business.classified_confidence = confidence
         business.classified_tags = tags
         business.last_classified_at = now()
-        business.save(update_fields=['classified_category', 'classified_confidence', 'classified_tags', 'last_classified_at'])
+        business.classified_website = website or ''
+        business.save(update_fields=['classified_category', 'classified_confidence', 'classified_tags', 'last_classified_at', 'classified_website'])
         return Response(self.get_serializer(business).data)
 
+def membership_summary(membership):
+    return {
+        'business_id': membership.business_id,
+        'business_name': membership.business.legal_name,
+        'role_in_business': membership.role_in_business,
+        'is_active': membership.is_active,
+    }
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Allow anonymous access
 def me(request):
@@ -116,15 +127,7 @@ def me(request):
     if request.user.is_authenticated:
         user_data = UserSerializer(request.user).data
         memberships = Membership.objects.filter(user=request.user, is_active=True).select_related('business')
-        memberships_data = [
-            {
-                'business_id': m.business_id,
-                'business_name': m.business.legal_name,
-                'role_in_business': m.role_in_business,
-                'is_active': m.is_active,
-            }
-            for m in memberships
-        ]
+        memberships_data = [membership_summary(m) for m in memberships]
         user_data.update({'memberships': memberships_data})
         return Response(user_data, status=status.HTTP_200_OK)
     else:
@@ -226,68 +229,110 @@ class IsAdmin(permissions.BasePermission):
             return request.user.is_superuser
 
 
+ADMIN_USER_ORDERING = {
+    'date_joined': 'date_joined',
+    'created_at': 'date_joined',
+    'username': 'username',
+    'email': 'email',
+    'id': 'id',
+}
+
+
+def filter_admin_users(queryset, params):
+    """Apply the admin user list search, role and status filters"""
+    from django.db.models import Q
+
+    search = (params.get('search') or '').strip()
+    if search:
+        queryset = queryset.filter(
+            Q(username__icontains=search) | Q(email__icontains=search) |
+            Q(first_name__icontains=search) | Q(last_name__icontains=search)
+        )
+
+    role = params.get('role')
+    if role == 'owner':
+        # Users without a profile are reported as owners
+        queryset = queryset.filter(Q(profile__role='owner') | Q(profile__isnull=True))
+    elif role:
+        queryset = queryset.filter(profile__role=role)
+
+    is_active = params.get('is_active')
+    if is_active in ('true', 'false'):
+        queryset = queryset.filter(is_active=is_active == 'true')
+    return queryset
+
+
+def admin_user_data(user, default_role=None, **extra):
+    # select_related('profile') caches a missing profile as None, so this never queries
+    profile = getattr(user, 'profile', None)
+    data = {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
+        'role': profile.role if profile else default_role,
+        'is_active': user.is_active,
+        'date_joined': user.date_joined,
+    }
+    data.update(extra)
+    return data
+
+
 @api_view(['GET'])
 @permission_classes([IsAdmin])
 def admin_users_list(request):
-    """Get all users (admin only)"""
-    users = User.objects.all()
-    user_data = []
-    for user in users:
-        try:
-            profile = user.profile
-            user_data.append({
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
-                'role': profile.role,
-                'is_active': user.is_active,
-                'date_joined': user.date_joined,
-                'businesses_count': user.businesses.count(),
-                'last_login': user.last_login
-            })
-        except UserProfile.DoesNotExist:
-            user_data.append({
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
-                'role': 'owner',
-                'is_active': user.is_active,
-                'date_joined': user.date_joined,
-                'businesses_count': user.businesses.count(),
-                'last_login': user.last_login
-            })
-    return Response(user_data, status=status.HTTP_200_OK)
+    """
+    Get users (admin only), cursor paginated.
+    Query params: search, role, is_active, sort_by, order, page_size, cursor
+    """
+    from django.db.models import Count
+    from core.pagination import keyset_paginate
+
+    users = User.objects.select_related('profile').annotate(
+        businesses_total=Count('businesses', distinct=True)
+    )
+    users = filter_admin_users(users, request.query_params)
+
+    field = ADMIN_USER_ORDERING.get(request.query_params.get('sort_by'), 'date_joined')
+    ordering = field if request.query_params.get('order') == 'asc' else f'-{field}'
+    page, next_cursor = keyset_paginate(users, request, ordering=ordering)
+
+    results = [
+        admin_user_data(
+            user,
+            default_role='owner',
+            businesses_count=user.businesses_total,
+            last_login=user.last_login,
+            is_superuser=user.is_superuser,
+        )
+        for user in page
+    ]
+    return Response({'results': results, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
+@throttle_classes([AdminAnalyticsThrottle])
 def admin_dashboard_stats(request):
-    """Get admin dashboard statistics"""
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    total_businesses = Business.objects.count()
-    admin_users = UserProfile.objects.filter(role='admin').count()
-    data_entry_users = UserProfile.objects.filter(role='data_entry').count()
-    owner_users = UserProfile.objects.filter(role='owner').count()
-    
-    # Convert QuerySet to list for JSON serialization
-    recent_users = list(User.objects.order_by('-date_joined')[:10].values('id', 'username', 'email', 'date_joined'))
+    """Get admin dashboard statistics from the latest platform stats snapshot"""
+    from core.services.platform_stats import get_platform_stats
+
+    snapshot = get_platform_stats()
+    stats = snapshot.metrics
+    users = stats['users']
     
     return Response({
-        'total_users': total_users,
-        'active_users': active_users,
-        'inactive_users': total_users - active_users,
-        'total_businesses': total_businesses,
-        'admin_users': admin_users,
-        'data_entry_users': data_entry_users,
-        'owner_users': owner_users,
-        'recent_users': recent_users
+        'total_users': users['total'],
+        'active_users': users['active'],
+        'inactive_users': users['inactive'],
+        'total_businesses': stats['businesses']['total'],
+        'admin_users': users['by_role']['admin'],
+        'data_entry_users': users['by_role']['data_entry'],
+        'owner_users': users['by_role']['owner'],
+        'recent_users': stats['recent_users'],
+        'as_of': snapshot.computed_at
     }, status=status.HTTP_200_OK)
 
 
@@ -556,64 +601,22 @@ def accept_invitation(request, token):
 
 @api_view(['GET'])
 @permission_classes([IsSuperAdmin])
+@throttle_classes([AdminAnalyticsThrottle])
 def super_admin_dashboard(request):
-    """Super Admin dashboard stats"""
-    from django.db.models import Count, Q
-    from finance.models import Transaction, Invoice
-    
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    total_businesses = Business.objects.count()
-    active_businesses = Business.objects.filter(memberships__is_active=True).distinct().count()
-    
-    # User roles breakdown
-    admin_users = UserProfile.objects.filter(role='admin').count()
-    owner_users = UserProfile.objects.filter(role='owner').count()
-    data_entry_users = UserProfile.objects.filter(role='data_entry').count()
-    
-    # Membership stats
-    total_memberships = Membership.objects.filter(is_active=True).count()
-    business_admins = Membership.objects.filter(role_in_business='business_admin', is_active=True).count()
-    staff_members = Membership.objects.filter(role_in_business='staff', is_active=True).count()
-    
-    # Recent activity
-    recent_users = User.objects.order_by('-date_joined')[:10].values('id', 'username', 'email', 'date_joined', 'is_active')
-    recent_businesses = Business.objects.order_by('-created_at')[:10].values('id', 'legal_name', 'created_at')
-    
-    # Financial overview (across all businesses)
-    total_transactions = Transaction.objects.count()
-    total_invoices = Invoice.objects.count()
-    paid_invoices = Invoice.objects.filter(status='paid').count()
-    overdue_invoices = Invoice.objects.filter(status='overdue').count()
+    """Super Admin dashboard stats from the latest platform stats snapshot"""
+    from core.services.platform_stats import get_platform_stats
+
+    snapshot = get_platform_stats()
+    stats = snapshot.metrics
     
     return Response({
-        'users': {
-            'total': total_users,
-            'active': active_users,
-            'inactive': total_users - active_users,
-            'by_role': {
-                'admin': admin_users,
-                'owner': owner_users,
-                'data_entry': data_entry_users
-            }
-        },
-        'businesses': {
-            'total': total_businesses,
-            'active': active_businesses
-        },
-        'memberships': {
-            'total': total_memberships,
-            'business_admins': business_admins,
-            'staff': staff_members
-        },
-        'financial': {
-            'total_transactions': total_transactions,
-            'total_invoices': total_invoices,
-            'paid_invoices': paid_invoices,
-            'overdue_invoices': overdue_invoices
-        },
-        'recent_users': list(recent_users),
-        'recent_businesses': list(recent_businesses)
+        'users': stats['users'],
+        'businesses': stats['businesses'],
+        'memberships': stats['memberships'],
+        'financial': stats['financial'],
+        'recent_users': stats['recent_users'],
+        'recent_businesses': stats['recent_businesses'],
+        'as_of': snapshot.computed_at
     }, status=status.HTTP_200_OK)
 
 
@@ -621,61 +624,28 @@ def super_admin_dashboard(request):
 @permission_classes([permissions.IsAuthenticated])
 def business_admin_dashboard(request, business_id):
     """Business Admin dashboard stats"""
-    from django.db.models import Sum, Count, Q, Avg
-    from django.utils import timezone
-    from datetime import timedelta
-    from decimal import Decimal
-    from finance.models import Transaction, Invoice, Budget, CashFlow
+    from finance.models import Transaction
+    from finance.services.business_stats import get_business_stats
     
     # Verify user is business admin
     if not user_is_business_admin(request.user, business_id):
         return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
     
     try:
-        business = Business.objects.get(id=business_id)
+        business = Business.objects.only('id', 'legal_name', 'dba_name').get(id=business_id)
     except Business.DoesNotExist:
         return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Date ranges
-    today = timezone.now().date()
-    this_month_start = today.replace(day=1)
-    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-    last_30_days = today - timedelta(days=30)
-    
-    # Transactions
-    transactions = Transaction.objects.filter(business_id=business_id)
-    monthly_transactions = transactions.filter(transaction_date__gte=this_month_start)
-    last_30_transactions = transactions.filter(transaction_date__gte=last_30_days)
-    
-    total_income = monthly_transactions.filter(transaction_type='income').aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-    total_expenses = monthly_transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-    net_profit = total_income - total_expenses
-    
-    # Invoices
-    invoices = Invoice.objects.filter(business_id=business_id)
-    total_invoices = invoices.count()
-    paid_invoices = invoices.filter(status='paid').count()
-    overdue_invoices = invoices.filter(status='overdue')
-    overdue_count = overdue_invoices.count()
-    overdue_amount = overdue_invoices.aggregate(Sum('total_amount'))['total_amount__sum'] or Decimal('0')
-    pending_invoices = invoices.filter(status__in=['draft', 'sent']).count()
-    
-    # Customers
-    from users.models import Customer
-    total_customers = Customer.objects.filter(business_id=business_id, status='active').count()
-    top_customers = Customer.objects.filter(business_id=business_id).order_by('-total_invoiced')[:5].values('id', 'customer_name', 'total_invoiced', 'total_paid')
-    
-    # Budgets
-    budgets = Budget.objects.filter(business_id=business_id, is_active=True)
-    total_budgeted = budgets.aggregate(Sum('budgeted_amount'))['budgeted_amount__sum'] or Decimal('0')
-    total_spent = budgets.aggregate(Sum('spent_amount'))['spent_amount__sum'] or Decimal('0')
-    budget_utilization = (total_spent / total_budgeted * 100) if total_budgeted > 0 else 0
-    
-    # Team members
-    team_size = Membership.objects.filter(business_id=business_id, is_active=True).count()
-    
-    # Recent transactions
-    recent_transactions = transactions.order_by('-transaction_date')[:10]
+    stats = get_business_stats(business.id)
+    transactions = stats['transactions']
+    invoices = stats['invoices']
+    
+    top_customers = Customer.objects.filter(business_id=business.id).order_by('-total_invoiced')[:5].values(
+        'id', 'customer_name', 'total_invoiced', 'total_paid'
+    )
+    recent_transactions = Transaction.objects.filter(business_id=business.id).select_related(
+        'business', 'user'
+    ).order_by('-transaction_date')[:10]
     
     return Response({
         'business': {
@@ -684,31 +654,27 @@ def business_admin_dashboard(request, business_id):
             'dba_name': business.dba_name
         },
         'financial': {
-            'total_income': float(total_income),
-            'total_expenses': float(total_expenses),
-            'net_profit': float(net_profit),
+            'total_income': transactions['month_income'],
+            'total_expenses': transactions['month_expenses'],
+            'net_profit': transactions['month_net_profit'],
             'currency': 'KES'
         },
         'invoices': {
-            'total': total_invoices,
-            'paid': paid_invoices,
-            'pending': pending_invoices,
+            'total': invoices['total'],
+            'paid': invoices['paid'],
+            'pending': invoices['pending'],
             'overdue': {
-                'count': overdue_count,
-                'amount': float(overdue_amount)
+                'count': invoices['overdue'],
+                'amount': invoices['overdue_amount']
             }
         },
         'customers': {
-            'total': total_customers,
+            'total': stats['customers']['active'],
             'top_customers': list(top_customers)
         },
-        'budgets': {
-            'total_budgeted': float(total_budgeted),
-            'total_spent': float(total_spent),
-            'utilization_percent': round(budget_utilization, 2)
-        },
+        'budgets': stats['budgets'],
         'team': {
-            'size': team_size
+            'size': stats['team']['total']
         },
         'recent_transactions': TransactionSerializer(recent_transactions, many=True).data
     }, status=status.HTTP_200_OK)
@@ -724,57 +690,22 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def user_dashboard(request, business_id=None):
-    """Normal user dashboard stats"""
-    from django.db.models import Sum, Count
-    from django.utils import timezone
-    from datetime import timedelta
-    from decimal import Decimal
+EMPTY_USER_DASHBOARD = {
+    'business': None,
+    'my_work': {
+        'invoices': 0,
+        'pending_tasks': 0,
+        'customers': 0
+    },
+    'recent_transactions': [],
+    'message': 'No business assigned yet. Please contact your administrator.'
+}
+
+
+def build_user_dashboard(user, business, role):
+    """Dashboard payload for a user's role in a business"""
     from finance.models import Transaction, Invoice
     
-    user = request.user
-    
-    # Get user's businesses
-    if business_id:
-        # Verify user is member of this business
-        try:
-            business = Business.objects.get(id=business_id)
-            if not user.is_superuser:
-                if not Membership.objects.filter(user=user, business_id=business_id, is_active=True).exists():
-                    return Response({'error': 'Not a member of this business'}, status=status.HTTP_403_FORBIDDEN)
-        except Business.DoesNotExist:
-            return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
-    else:
-        # Get all businesses user is member of
-        memberships = Membership.objects.filter(user=user, is_active=True)
-        business_ids = [m.business_id for m in memberships]
-        businesses = Business.objects.filter(id__in=business_ids)
-        
-        if not businesses.exists():
-            # Return empty dashboard for users with no businesses
-            return Response({
-                'business': None,
-                'my_work': {
-                    'invoices': 0,
-                    'pending_tasks': 0,
-                    'customers': 0
-                },
-                'recent_transactions': [],
-                'message': 'No business assigned yet. Please contact your administrator.'
-            }, status=status.HTTP_200_OK)
-        # Use first business for now (can be enhanced to support multiple)
-        business = businesses.first()
-    
-    # Get user's role in business
-    membership = Membership.objects.filter(user=user, business_id=business.id, is_active=True).first()
-    role = membership.role_in_business if membership else 'viewer'
-    
-    # Date ranges
-    today = timezone.now().date()
-    last_30_days = today - timedelta(days=30)
-    
     # Transactions (user can see their own or all depending on role)
     if role == 'viewer':
         transactions = Transaction.objects.none()  # Viewers see limited data
@@ -784,7 +715,7 @@ def user_dashboard(request, business_id=None):
     else:
         transactions = Transaction.objects.filter(business_id=business.id)
     
-    recent_transactions = transactions.order_by('-transaction_date')[:5]
+    recent_transactions = transactions.select_related('business', 'user').order_by('-transaction_date')[:5]
     
     # Invoices (similar logic)
     if role == 'viewer':
@@ -798,7 +729,6 @@ def user_dashboard(request, business_id=None):
     pending_tasks = invoices.filter(status__in=['draft', 'sent'], user=user).count()
     
     # Customers (staff can see customers they onboarded)
-    from users.models import Customer
     if role == 'viewer':
         customers = Customer.objects.none()
     elif role == 'staff':
@@ -808,7 +738,7 @@ def user_dashboard(request, business_id=None):
     
     my_customers = customers.count()
     
-    return Response({
+    return {
         'business': {
             'id': business.id,
             'name': business.legal_name,
@@ -820,7 +750,42 @@ def user_dashboard(request, business_id=None):
             'customers': my_customers
         },
         'recent_transactions': TransactionSerializer(recent_transactions, many=True).data
-    }, status=status.HTTP_200_OK)
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def user_dashboard(request, business_id=None):
+    """Normal user dashboard stats"""
+    user = request.user
+    
+    # Get user's businesses
+    if business_id:
+        # Verify user is member of this business
+        try:
+            business = Business.objects.get(id=business_id)
+            if not user.is_superuser:
+                if not Membership.objects.filter(user=user, business_id=business_id, is_active=True).exists():
+                    return Response({'error': 'Not a member of this business'}, status=status.HTTP_403_FORBIDDEN)
+        except Business.DoesNotExist:
+            return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
+    else:
+        # Get all businesses user is member of
+        memberships = Membership.objects.filter(user=user, is_active=True)
+        business_ids = [m.business_id for m in memberships]
+        businesses = Business.objects.filter(id__in=business_ids)
+        
+        if not businesses.exists():
+            # Return empty dashboard for users with no businesses
+            return Response(EMPTY_USER_DASHBOARD, status=status.HTTP_200_OK)
+        # Use first business for now (can be enhanced to support multiple)
+        business = businesses.first()
+    
+    # Get user's role in business
+    membership = Membership.objects.filter(user=user, business_id=business.id, is_active=True).first()
+    role = membership.role_in_business if membership else 'viewer'
+    
+    return Response(build_user_dashboard(user, business, role), status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -1136,6 +1101,7 @@ def reject_individual_registration(request, registration_id):
 
 @api_view(['GET'])
 @permission_classes([IsSuperAdmin])
+@throttle_classes([AdminAnalyticsThrottle])
 def businesses_monitoring(request):
     """Get all businesses with monitoring data"""
     from finance.models import Transaction, Invoice
@@ -1201,30 +1167,21 @@ def businesses_monitoring(request):
 
 @api_view(['GET'])
 @permission_classes([IsSuperAdmin])
+@throttle_classes([AdminAnalyticsThrottle])
 def business_summary(request):
-    """Get business summary statistics"""
-    from django.db.models import Count, Q
-    from django.utils import timezone
-    from datetime import datetime
-    
-    total = Business.objects.count()
-    
-    # Count active businesses (those with active memberships)
-    active = Business.objects.filter(memberships__is_active=True).distinct().count()
-    
-    # Count businesses created this month
-    this_month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    this_month = Business.objects.filter(created_at__gte=this_month_start).count()
-    
-    # Total users across all businesses
-    total_users = Membership.objects.filter(is_active=True).count()
+    """Get business summary statistics from the latest platform stats snapshot"""
+    from core.services.platform_stats import get_platform_stats
+
+    snapshot = get_platform_stats()
+    businesses = snapshot.metrics['businesses']
     
     return Response({
-        'total': total,
-        'active': active,
-        'inactive': total - active,
-        'this_month': this_month,
-        'total_users': total_users
+        'total': businesses['total'],
+        'active': businesses['active'],
+        'inactive': businesses['total'] - businesses['active'],
+        'this_month': businesses['this_month'],
+        'total_users': snapshot.metrics['memberships']['total'],
+        'as_of': snapshot.computed_at
     })
 
 
@@ -1313,38 +1270,19 @@ def list_all_businesses(request):
 @api_view(['GET'])
 @permission_classes([IsSuperAdmin])
 def list_all_admins(request):
-    """List all admin users (users with admin role or business_admin memberships)"""
-    # Get users with admin role in profile
-    admin_profiles = UserProfile.objects.filter(role='admin').select_related('user')
-    
-    # Get users who are business admins
-    business_admin_memberships = Membership.objects.filter(
-        role_in_business='business_admin',
-        is_active=True
-    ).select_related('user').distinct()
-    
-    admin_users = set()
-    
-    # Add users with admin role
-    for profile in admin_profiles:
-        admin_users.add(profile.user)
-    
-    # Add users who are business admins
-    for membership in business_admin_memberships:
-        admin_users.add(membership.user)
-    
-    data = [{
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'first_name': user.first_name,
-        'last_name': user.last_name,
-        'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
-        'is_superuser': user.is_superuser,
-        'role': user.userprofile.role if hasattr(user, 'userprofile') else None
-    } for user in admin_users]
-    
-    return Response(data, status=status.HTTP_200_OK)
+    """List admin users (admin role or active business_admin membership), cursor paginated"""
+    from django.db.models import Q
+    from core.pagination import keyset_paginate
+
+    admins = User.objects.filter(
+        Q(profile__role='admin') |
+        Q(memberships__role_in_business='business_admin', memberships__is_active=True)
+    ).select_related('profile').distinct()
+    admins = filter_admin_users(admins, request.query_params)
+
+    page, next_cursor = keyset_paginate(admins, request, ordering='username')
+    results = [admin_user_data(user, is_superuser=user.is_superuser) for user in page]
+    return Response({'results': results, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -1470,96 +1408,45 @@ def assign_business_to_admin(request):
 @permission_classes([IsSuperAdmin])
 def business_detail(request, business_id):
     """Get detailed information about a business including members"""
-    from finance.models import Transaction, Invoice
-    from django.db.models import Sum, Count, Q
-    from django.utils import timezone
-    from datetime import timedelta
+    from finance.services.business_stats import get_business_stats
     
     try:
-        business = Business.objects.select_related('owner', 'owner__profile').prefetch_related('memberships__user').get(id=business_id)
+        business = Business.objects.select_related('owner').get(id=business_id)
     except Business.DoesNotExist:
         return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Get business admin (members with business_admin role)
-    business_admin_memberships = business.memberships.filter(
-        role_in_business='business_admin',
+    # Business admins and staff (data entry) in one query
+    memberships = Membership.objects.filter(
+        business_id=business.id,
+        role_in_business__in=['business_admin', 'staff'],
         is_active=True
-    ).select_related('user', 'user__profile')
+    ).select_related('user', 'user__profile').order_by('created_at')
     
     business_admins = []
-    for membership in business_admin_memberships:
-        try:
-            phone_number = membership.user.profile.phone_number if hasattr(membership.user, 'profile') and membership.user.profile else None
-        except:
-            phone_number = None
-        
-        business_admins.append({
-            'id': membership.user.id,
-            'username': membership.user.username,
-            'email': membership.user.email,
-            'first_name': membership.user.first_name,
-            'last_name': membership.user.last_name,
-            'full_name': f"{membership.user.first_name} {membership.user.last_name}".strip() or membership.user.username,
-            'phone_number': phone_number,
-            'role': membership.role_in_business,
-            'joined_at': membership.created_at,
-            'is_active': membership.is_active
-        })
-    
-    # Get staff members (members with staff role - data entry)
-    staff_memberships = business.memberships.filter(
-        role_in_business='staff',
-        is_active=True
-    ).select_related('user', 'user__profile')
-    
     staff_members = []
-    for membership in staff_memberships:
-        try:
-            phone_number = membership.user.profile.phone_number if hasattr(membership.user, 'profile') and membership.user.profile else None
-        except:
-            phone_number = None
-        
-        staff_members.append({
-            'id': membership.user.id,
-            'username': membership.user.username,
-            'email': membership.user.email,
-            'first_name': membership.user.first_name,
-            'last_name': membership.user.last_name,
-            'full_name': f"{membership.user.first_name} {membership.user.last_name}".strip() or membership.user.username,
-            'phone_number': phone_number,
+    for membership in memberships:
+        user = membership.user
+        profile = getattr(user, 'profile', None)
+        member = {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
+            'phone_number': profile.phone_number if profile else None,
             'role': membership.role_in_business,
             'joined_at': membership.created_at,
             'is_active': membership.is_active
-        })
-    
-    # Get financial stats
-    transactions = Transaction.objects.filter(business_id=business.id)
-    total_transactions = transactions.count()
-    
-    # Monthly revenue (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    monthly_revenue = transactions.filter(
-        transaction_type='income',
-        transaction_date__gte=thirty_days_ago
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Total income and expenses
-    total_income = transactions.filter(transaction_type='income').aggregate(total=Sum('amount'))['total'] or 0
-    total_expenses = transactions.filter(transaction_type='expense').aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Invoice stats
-    invoices = Invoice.objects.filter(business_id=business.id)
-    total_invoices = invoices.count()
-    paid_invoices = invoices.filter(status='paid').count()
-    pending_invoices = invoices.filter(status__in=['draft', 'sent']).count()
-    overdue_invoices = invoices.filter(status='overdue').count()
-    
-    # Customer count
-    from users.models import Customer
-    customer_count = Customer.objects.filter(business_id=business.id).count()
+        }
+        if membership.role_in_business == 'business_admin':
+            business_admins.append(member)
+        else:
+            staff_members.append(member)
     
-    # Total members
-    total_members = business.memberships.filter(is_active=True).count()
+    stats = get_business_stats(business.id)
+    transactions = stats['transactions']
+    invoices = stats['invoices']
     
     return Response({
         'business': {
@@ -1587,17 +1474,17 @@ def business_detail(request, business_id):
         'business_admins': business_admins,
         'staff_members': staff_members,
         'stats': {
-            'total_members': total_members,
-            'total_transactions': total_transactions,
-            'monthly_revenue': float(monthly_revenue),
-            'total_income': float(total_income),
-            'total_expenses': float(total_expenses),
-            'net_profit': float(total_income - total_expenses),
-            'total_invoices': total_invoices,
-            'paid_invoices': paid_invoices,
-            'pending_invoices': pending_invoices,
-            'overdue_invoices': overdue_invoices,
-            'customer_count': customer_count
+            'total_members': stats['team']['total'],
+            'total_transactions': transactions['count'],
+            'monthly_revenue': transactions['last_30_days_income'],
+            'total_income': transactions['total_income'],
+            'total_expenses': transactions['total_expenses'],
+            'net_profit': transactions['net_profit'],
+            'total_invoices': invoices['total'],
+            'paid_invoices': invoices['paid'],
+            'pending_invoices': invoices['pending'],
+            'overdue_invoices': invoices['overdue'],
+            'customer_count': stats['customers']['total']
         }
     }, status=status.HTTP_200_OK)
 
@@ -1605,31 +1492,15 @@ def business_detail(request, business_id):
 @api_view(['GET'])
 @permission_classes([IsSuperAdmin])
 def list_available_staff(request):
-    """List all users available to be assigned as staff (data entry) to a business"""
-    # Get all active users except superusers
-    users = User.objects.filter(is_active=True).exclude(is_superuser=True).select_related('profile').order_by('username')
-    
-    data = []
-    for user in users:
-        try:
-            profile = user.profile
-            role = profile.role if profile else None
-        except:
-            role = None
-        
-        data.append({
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
-            'role': role,
-            'is_active': user.is_active,
-            'date_joined': user.date_joined
-        })
-    
-    return Response(data, status=status.HTTP_200_OK)
+    """List active non-superusers available to be assigned as staff, cursor paginated"""
+    from core.pagination import keyset_paginate
+
+    users = User.objects.filter(is_active=True, is_superuser=False).select_related('profile')
+    users = filter_admin_users(users, request.query_params)
+
+    page, next_cursor = keyset_paginate(users, request, ordering='username')
+    results = [admin_user_data(user) for user in page]
+    return Response({'results': results, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -1717,103 +1588,18 @@ def assign_staff_to_business(request):
 
 @api_view(['GET'])
 @permission_classes([IsSuperAdmin])
+@throttle_classes([AdminAnalyticsThrottle])
 def admin_analytics(request):
-    """Get system-wide analytics for admin dashboard"""
-    from django.db.models import Count, Sum, Avg, Q
-    from django.utils import timezone
-    from datetime import timedelta
-    from finance.models import Transaction, Invoice
-    
-    # Date ranges
-    now = timezone.now()
-    today = now.date()
-    last_30_days = today - timedelta(days=30)
-    last_60_days = today - timedelta(days=60)
-    this_month_start = today.replace(day=1)
-    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-    
-    # User growth
-    total_users = User.objects.count()
-    users_30_days_ago = User.objects.filter(date_joined__lt=last_30_days).count()
-    user_growth = ((total_users - users_30_days_ago) / users_30_days_ago * 100) if users_30_days_ago > 0 else 0
-    
-    # Business growth
-    total_businesses = Business.objects.count()
-    businesses_30_days_ago = Business.objects.filter(created_at__lt=last_30_days).count()
-    business_growth = ((total_businesses - businesses_30_days_ago) / businesses_30_days_ago * 100) if businesses_30_days_ago > 0 else 0
-    
-    # Revenue growth
-    revenue_last_30 = Transaction.objects.filter(
-        transaction_type='income',
-        transaction_date__gte=last_30_days
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    revenue_prev_30 = Transaction.objects.filter(
-        transaction_type='income',
-        transaction_date__gte=last_60_days,
-        transaction_date__lt=last_30_days
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    revenue_growth = ((float(revenue_last_30) - float(revenue_prev_30)) / float(revenue_prev_30) * 100) if revenue_prev_30 > 0 else 0
-    
-    # Active users
-    active_users_30_days = User.objects.filter(last_login__gte=last_30_days).count()
-    active_rate = (active_users_30_days / total_users * 100) if total_users > 0 else 0
-    
-    # Daily/Weekly/Monthly active users
-    daily_active = User.objects.filter(last_login__date=today).count()
-    weekly_active = User.objects.filter(last_login__gte=now - timedelta(days=7)).count()
-    monthly_active = active_users_30_days
-    
+    """Get system-wide analytics for admin dashboard from the latest platform stats snapshot"""
+    from core.services.platform_stats import get_platform_stats
+
+    snapshot = get_platform_stats()
+    analytics = dict(snapshot.metrics['analytics'])
     # Average session duration (mock - would need session tracking)
-    avg_session_duration = '15m'
-    
-    # Financial metrics
-    total_revenue = Transaction.objects.filter(transaction_type='income').aggregate(total=Sum('amount'))['total'] or 0
-    total_invoices = Invoice.objects.count()
-    avg_invoice_value = Invoice.objects.aggregate(avg=Avg('total_amount'))['avg'] or 0
-    paid_invoices = Invoice.objects.filter(status='paid').count()
-    payment_success_rate = (paid_invoices / total_invoices * 100) if total_invoices > 0 else 0
-    businesses_with_invoices = Invoice.objects.values('business').distinct().count()
-    
-    # Top businesses by revenue
-    top_businesses = Transaction.objects.filter(
-        transaction_type='income',
-        transaction_date__gte=last_30_days
-    ).values('business').annotate(
-        revenue=Sum('amount'),
-        transactions=Count('id')
-    ).order_by('-revenue')[:10]
-    
-    top_businesses_list = []
-    for item in top_businesses:
-        try:
-            business = Business.objects.get(id=item['business'])
-            top_businesses_list.append({
-                'id': business.id,
-                'name': business.legal_name,
-                'industry': business.business_model or 'N/A',
-                'revenue': float(item['revenue']),
-                'transactions': item['transactions']
-            })
-        except Business.DoesNotExist:
-            continue
+    analytics['avg_session_duration'] = '15m'
+    analytics['as_of'] = snapshot.computed_at
     
-    return Response({
-        'user_growth': round(user_growth, 2),
-        'business_growth': round(business_growth, 2),
-        'revenue_growth': round(revenue_growth, 2),
-        'active_rate': round(active_rate, 2),
-        'daily_active_users': daily_active,
-        'weekly_active_users': weekly_active,
-        'monthly_active_users': monthly_active,
-        'avg_session_duration': avg_session_duration,
-        'total_revenue': float(total_revenue),
-        'avg_invoice_value': float(avg_invoice_value),
-        'payment_success_rate': round(payment_success_rate, 2),
-        'businesses_with_invoices': businesses_with_invoices,
-        'top_businesses': top_businesses_list
-    }, status=status.HTTP_200_OK)
+    return Response(analytics, status=status.HTTP_200_OK)
 
 
 # ==================== ADMIN SETTINGS ENDPOINTS ====================
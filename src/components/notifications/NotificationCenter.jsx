@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { Bell, X, Check, CheckCheck, Trash2, ExternalLink } from 'lucide-react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { notificationApi } from '@/services/api';
+import { useEventStream } from '@/hooks/useEventStream';
 import { Badge } from '@/components/ui/badge';
 import { Button } from '@/components/ui/button';
 import { formatDistanceToNow } from 'date-fns';
@@ -21,7 +22,8 @@ const NotificationCenter = () => {
     refetchInterval: 30000, // Refetch every 30 seconds
   });
 
-  // Fetch unread count
+  // Unread count: refetched when the event stream reports a change, with a
+  // slow poll as a fallback for when the stream is down
   const { data: unreadData } = useQuery({
     queryKey: ['notifications', 'unread-count'],
     queryFn: () => notificationApi.getUnreadCount(),
@@ -30,6 +32,12 @@ const NotificationCenter = () => {
 
   const unreadCount = unreadData?.count || 0;
 
+  // New notifications and unread count changes are pushed over the event stream
+  const refreshNotifications = () => queryClient.invalidateQueries(['notifications']);
+  useEventStream('notification', refreshNotifications);
+  useEventStream('unread_count', refreshNotifications);
+  useEventStream('resync', refreshNotifications);
+
   // Mark as read mutation
   const markAsReadMutation = useMutation({
     mutationFn: (id) => notificationApi.markAsRead(id),
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { X, Smartphone, Loader2, CheckCircle2, XCircle, RefreshCw } from 'lucide-react';
 import { mpesaApi } from '@/services/api';
+import { useEventStream } from '@/hooks/useEventStream';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import toast from 'react-hot-toast';
 import { Button } from '@/components/ui/button';
@@ -30,7 +31,7 @@ const MpesaPaymentModal = ({ isOpen, onClose, invoice, amount, businessId, onSuc
     },
   });
 
-  // Poll payment status
+  // Payment status: pushed over the event stream, with a slow poll as fallback
   const { data: paymentStatus } = useQuery({
     queryKey: ['mpesa-payment-status', paymentId],
     queryFn: () => mpesaApi.getPaymentStatus(paymentId),
@@ -41,10 +42,19 @@ const MpesaPaymentModal = ({ isOpen, onClose, invoice, amount, businessId, onSuc
         setIsPolling(false);
         return false;
       }
-      return 3000; // Poll every 3 seconds
+      return 15000;
     },
   });
 
+  useEventStream('payment', (update) => {
+    if (update.id !== paymentId) return;
+    queryClient.setQueryData(['mpesa-payment-status', paymentId], (old) => ({ ...old, ...update }));
+    if (update.status === 'completed' || update.status === 'failed') setIsPolling(false);
+  }, isPolling && !!paymentId);
+  useEventStream('resync', () => {
+    queryClient.invalidateQueries(['mpesa-payment-status', paymentId]);
+  }, isPolling && !!paymentId);
+
   // Handle payment status updates
   useEffect(() => {
     if (paymentStatus) {
@@ -1,9 +1,28 @@
 // src/contexts/AuthContext.jsx
 import React, { createContext, useContext, useState, useEffect } from 'react';
 import { apiClient } from '../lib/apiClient';
+import { queryClient } from '../lib/queryClient';
 
 const AuthContext = createContext(null);
 
+// One round trip for first paint: the user plus the modules, unread count and
+// dashboard of their default business, seeded into the query cache so the
+// components that own those queries start from data instead of refetching
+const loadBootstrap = async () => {
+  const { me, modules, unread_notifications, dashboard } = await apiClient.getBootstrap();
+  const businessId = me?.memberships?.[0]?.business_id ?? null;
+  queryClient.setQueryData(['user-modules', businessId, me.id], modules);
+  queryClient.setQueryData(['notifications', 'unread-count'], { count: unread_notifications });
+  if (businessId) {
+    queryClient.setQueryData(['user-dashboard', businessId], dashboard);
+  }
+  localStorage.setItem('user_cache', JSON.stringify({
+    data: me,
+    timestamp: Date.now()
+  }));
+  return me;
+};
+
 export function AuthProvider({ children }) {
   const [user, setUser] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -44,12 +63,8 @@ export function AuthProvider({ children }) {
             setIsAuthenticated(true);
             setLoading(false);
             // Fetch fresh data in background
-            apiClient.me().then(userData => {
+            loadBootstrap().then(userData => {
               if (userData) {
-                localStorage.setItem('user_cache', JSON.stringify({
-                  data: userData,
-                  timestamp: Date.now()
-                }));
                 setUser(userData);
               }
             }).catch(() => {
@@ -63,12 +78,8 @@ export function AuthProvider({ children }) {
       }
       
       // Fetch fresh user data
-      const userData = await apiClient.me();
+      const userData = await loadBootstrap();
       if (userData) {
-        localStorage.setItem('user_cache', JSON.stringify({
-          data: userData,
-          timestamp: Date.now()
-        }));
         setUser(userData);
         setIsAuthenticated(true);
       }
@@ -95,15 +106,10 @@ export function AuthProvider({ children }) {
         // Update the apiClient with the new token
         apiClient.setToken(response.access);
         
-        // Fetch user data after successful login - use cached version if available
+        // Fetch user data after successful login (also cached in localStorage for faster subsequent loads)
         try {
-          const userResponse = await apiClient.me();
+          const userResponse = await loadBootstrap();
           if (userResponse) {
-            // Cache user data in localStorage for faster subsequent loads
-            localStorage.setItem('user_cache', JSON.stringify({
-              data: userResponse,
-              timestamp: Date.now()
-            }));
             setUser(userResponse);
             setIsAuthenticated(true);
             // Return user data so Login component can make redirect decision
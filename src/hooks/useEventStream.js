@@ -0,0 +1,18 @@
+import { useEffect, useRef } from 'react';
+import { subscribe } from '../lib/eventStream';
+
+/**
+ * Hook to receive server-sent events of one type
+ * The latest handler is always called, so callers don't need to memoize it
+ */
+export function useEventStream(type, handler, enabled = true) {
+  const handlerRef = useRef(handler);
+  handlerRef.current = handler;
+
+  useEffect(() => {
+    if (!enabled) return undefined;
+    return subscribe(type, (data) => handlerRef.current(data));
+  }, [type, enabled]);
+}
+
+export default useEventStream;
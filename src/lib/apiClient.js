@@ -327,6 +327,17 @@ class ApiClient {
     });
   }
 
+  // Everything needed for first paint (me, modules, unread count, dashboard)
+  async getBootstrap(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/bootstrap/${queryString ? '?' + queryString : ''}`);
+  }
+
+  // Single-use ticket for opening the event stream (EventSource cannot send the token header)
+  async getEventStreamTicket() {
+    return this.request('/core/events/ticket/', { method: 'POST' });
+  }
+
   // Dashboard methods
   async getDashboardData(params = {}) {
     const queryString = new URLSearchParams(params).toString();
@@ -419,8 +430,10 @@ class ApiClient {
     return this.request('/users/admin/stats/');
   }
 
-  async getAllUsers() {
-    return this.request('/users/admin/users/');
+  // Cursor paginated: returns { results, next_cursor }
+  async getAllUsers(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/users/admin/users/${queryString ? '?' + queryString : ''}`);
   }
 
   // Super Admin Business Management methods
@@ -428,8 +441,9 @@ class ApiClient {
     return this.request('/users/admin/businesses/all/');
   }
 
-  async getAllAdmins() {
-    return this.request('/users/admin/admins/all/');
+  async getAllAdmins(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/users/admin/admins/all/${queryString ? '?' + queryString : ''}`);
   }
 
   async createBusiness(businessData) {
@@ -450,8 +464,9 @@ class ApiClient {
     return this.request(`/users/admin/businesses/${businessId}/`);
   }
 
-  async getAvailableStaff() {
-    return this.request('/users/admin/staff/available/');
+  async getAvailableStaff(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/users/admin/staff/available/${queryString ? '?' + queryString : ''}`);
   }
 
   async assignStaffToBusiness(businessId, userIds) {
@@ -490,11 +505,22 @@ class ApiClient {
     });
   }
 
-  // Voice conversation (for compatibility with existing code)
+  // Assistant conversation history. A turn is appended to data.conversation_id,
+  // or starts a new conversation; returns the conversation summary
   async createVoiceConversation(data) {
-    // This would typically go to a voice conversations endpoint
-    // For now, we'll store it locally or use a mock
-    return Promise.resolve({ id: Date.now(), ...data });
+    return this.post('/finance/voice-conversations/', data);
+  }
+
+  // Cursor paginated, newest first: returns { results, next_cursor }
+  async getVoiceConversations(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/finance/voice-conversations/${queryString ? '?' + queryString : ''}`);
+  }
+
+  // Cursor paginated, newest first: returns { results, next_cursor }
+  async getConversationMessages(conversationId, params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/finance/voice-conversations/${conversationId}/messages/${queryString ? '?' + queryString : ''}`);
   }
 
   // File upload
@@ -0,0 +1,77 @@
+// Streaming KAVI chat (backend: /api/finance/kavi/chat/stream/)
+// The answer arrives as server-sent events over a POST, so this reads the body
+// with fetch instead of EventSource. Abort the signal to cancel generation.
+import apiClient from './apiClient';
+
+function parseEvent(block) {
+  let type = 'message';
+  let data = '';
+  block.split('\n').forEach((line) => {
+    if (line.startsWith('event: ')) type = line.slice(7);
+    else if (line.startsWith('data: ')) data += line.slice(6);
+  });
+  try {
+    return { type, data: JSON.parse(data || '{}') };
+  } catch {
+    return { type, data: {} };
+  }
+}
+
+/**
+ * Stream an answer to `question`. onSentence fires for each complete sentence
+ * (start speaking on the first one), onToken for every chunk. Resolves with the
+ * full answer; rejects on HTTP, stream or abort errors. Pass the id from
+ * onConversation back as conversationId to continue the same conversation.
+ */
+export async function streamKaviChat({
+  question, context, businessId, conversationId, onConversation, onToken, onSentence, signal,
+}) {
+  const response = await fetch(`${apiClient.baseURL}/finance/kavi/chat/stream/`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(apiClient.token ? { Authorization: `Bearer ${apiClient.token}` } : {}),
+    },
+    body: JSON.stringify({
+      question,
+      context: context || {},
+      business_id: businessId || null,
+      conversation_id: conversationId || null,
+    }),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    let message = `Chat failed (${response.status})`;
+    try {
+      message = (await response.json()).error || message;
+    } catch {
+      // Keep the status message
+    }
+    throw new Error(message);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const { type, data } = parseEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      if (type === 'conversation') onConversation?.(data.id);
+      else if (type === 'token') onToken?.(data.text);
+      else if (type === 'sentence') onSentence?.(data.text, data.index);
+      else if (type === 'done') return data.text;
+      else if (type === 'error') throw new Error(data.error);
+    }
+  }
+  throw new Error('Chat stream ended unexpectedly');
+}
+
+export default streamKaviChat;
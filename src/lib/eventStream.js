@@ -0,0 +1,96 @@
+// Shared server-sent event connection (backend: /api/core/events/)
+// One EventSource per tab, opened on the first subscription and closed with the last.
+// Each connection is opened with a fresh single-use ticket, so the access token never goes in a URL.
+import apiClient from './apiClient';
+
+const RECONNECT_DELAY = 5000;
+
+const handlers = new Map(); // event type -> Set of callbacks
+let source = null;
+let attached = new Set(); // event types with a listener on the current source
+let lastEventId = null;
+let reconnectTimer = null;
+let connecting = false;
+
+const dispatch = (type) => (message) => {
+  if (message.lastEventId) lastEventId = message.lastEventId;
+  let data = {};
+  try {
+    data = JSON.parse(message.data);
+  } catch {
+    // Keep the empty payload
+  }
+  (handlers.get(type) || []).forEach((handler) => handler(data));
+};
+
+function listen(type) {
+  if (source && !attached.has(type)) {
+    source.addEventListener(type, dispatch(type));
+    attached.add(type);
+  }
+}
+
+function scheduleReconnect() {
+  clearTimeout(reconnectTimer);
+  reconnectTimer = setTimeout(() => handlers.size && connect(), RECONNECT_DELAY);
+}
+
+async function connect() {
+  if (source || connecting || !apiClient.token || typeof EventSource === 'undefined') return;
+
+  connecting = true;
+  let ticket;
+  try {
+    ({ ticket } = await apiClient.getEventStreamTicket());
+  } catch {
+    scheduleReconnect();
+    return;
+  } finally {
+    connecting = false;
+  }
+  // Everyone unsubscribed (or another call connected) while the ticket was on its way
+  if (source || !handlers.size) return;
+
+  const params = new URLSearchParams({ ticket });
+  if (lastEventId) params.set('last_event_id', lastEventId);
+  source = new EventSource(`${apiClient.baseURL}/core/events/?${params}`);
+  attached = new Set();
+  handlers.forEach((_, type) => listen(type));
+
+  source.onerror = () => {
+    // The browser would retry with the same URL, but the ticket is spent:
+    // close and reconnect with a fresh one, resuming from the last event seen
+    source?.close();
+    source = null;
+    scheduleReconnect();
+  };
+}
+
+function disconnect() {
+  clearTimeout(reconnectTimer);
+  if (source) {
+    source.close();
+    source = null;
+  }
+}
+
+/**
+ * Call handler(data) for every `type` event. Returns an unsubscribe function.
+ * A `resync` event is sent when missed events could not be replayed.
+ */
+export function subscribe(type, handler) {
+  if (!handlers.has(type)) {
+    handlers.set(type, new Set());
+    listen(type);
+  }
+  handlers.get(type).add(handler);
+  connect();
+
+  return () => {
+    const set = handlers.get(type);
+    set?.delete(handler);
+    // The source listener stays attached; dispatch simply finds no handlers
+    if (set && set.size === 0) handlers.delete(type);
+    if (handlers.size === 0) disconnect();
+  };
+}
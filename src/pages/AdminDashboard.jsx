@@ -1,5 +1,5 @@
 import React, { useState } from "react";
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import {
   Users,
   Building2,
@@ -77,19 +77,29 @@ export default function AdminDashboard() {
     }
   });
 
-  const { data: users = [], isLoading: loadingUsers, refetch: refetchUsers } = useQuery({
+  // The endpoint is cursor-paged: {results, next_cursor}
+  const {
+    data: usersData,
+    isLoading: loadingUsers,
+    refetch: refetchUsers,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
+  } = useInfiniteQuery({
     queryKey: ['allUsers'],
-    queryFn: async () => {
+    queryFn: async ({ pageParam }) => {
       try {
-        return await apiClient.getAllUsers();
+        return await apiClient.getAllUsers(pageParam ? { cursor: pageParam } : {});
       } catch (error) {
         console.error('Failed to load users:', error);
-        return [];
+        return { results: [], next_cursor: null };
       }
     },
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
     enabled: !!user,
     retry: false
   });
+  const users = usersData?.pages.flatMap(page => page.results) ?? [];
 
   const updateRoleMutation = useMutation({
     mutationFn: async ({ userId, role }) => {
@@ -540,6 +550,17 @@ export default function AdminDashboard() {
                   </tbody>
                 </table>
               </div>
+              {hasNextPage && (
+                <div className="flex justify-center py-4">
+                  <Button
+                    variant="outline"
+                    onClick={() => fetchNextPage()}
+                    disabled={isFetchingNextPage}
+                  >
+                    {isFetchingNextPage ? 'Loading...' : 'Load more users'}
+                  </Button>
+                </div>
+              )}
             </div>
           ) : (
             <div className="text-center py-8 text-gray-500">
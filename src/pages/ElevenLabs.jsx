@@ -1,5 +1,6 @@
 import React, { useState, useRef, useEffect } from "react";
 import base44 from "@/api/base44Client";
+import apiClient from "@/lib/apiClient";
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
@@ -25,9 +26,31 @@ export default function ElevenLabs() {
   const recognitionRef = useRef(null);
   const queryClient = useQueryClient();
 
+  const conversationIdRef = useRef(null); // Turns are appended to the latest stored conversation
+
+  // The latest conversation's last 20 turns, newest first
   const { data: conversations = [] } = useQuery({
     queryKey: ['voice-conversations'],
-    queryFn: () => base44.entities.VoiceConversation.list('-conversation_date', 20),
+    queryFn: async () => {
+      const { results: [latest] = [] } = await apiClient.getVoiceConversations({ page_size: 1 });
+      if (!latest) return [];
+      conversationIdRef.current = conversationIdRef.current ?? latest.id;
+      const { results: messages } = await apiClient.getConversationMessages(latest.id, { page_size: 40 });
+      const turns = [];
+      messages.forEach((message) => {
+        if (message.role !== 'assistant') return;
+        const question = messages.find((m) => m.seq === message.seq - 1);
+        turns.push({
+          id: `${latest.id}-${message.seq}`,
+          user_input: question?.content || '',
+          ai_response: message.content,
+          intent: message.metadata?.intent || 'unknown',
+          action_taken: message.metadata?.action_taken || '',
+          conversation_date: message.created_at
+        });
+      });
+      return turns;
+    },
     initialData: []
   });
 
@@ -100,13 +123,15 @@ export default function ElevenLabs() {
     try {
       const response = await processVoiceCommand(command);
       
-      await base44.entities.VoiceConversation.create({
+      const saved = await apiClient.createVoiceConversation({
+        conversation_id: conversationIdRef.current,
+        business_id: business?.id,
         user_input: command,
         ai_response: response.text,
         intent: response.intent,
-        action_taken: response.action || "",
-        conversation_date: new Date().toISOString()
+        action_taken: response.action || ""
       });
+      conversationIdRef.current = saved?.id ?? conversationIdRef.current;
 
       queryClient.invalidateQueries({ queryKey: ['voice-conversations'] });
 
@@ -60,7 +60,7 @@ export default function SuperAdminDashboard() {
   // Fetch all admins
   const { data: admins = [], isLoading: loadingAdmins } = useQuery({
     queryKey: ['all-admins'],
-    queryFn: () => apiClient.getAllAdmins(),
+    queryFn: async () => (await apiClient.getAllAdmins({ page_size: 200 })).results,
     enabled: showAssignBusiness,
     staleTime: 60000,
     refetchOnWindowFocus: false
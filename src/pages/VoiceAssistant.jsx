@@ -8,6 +8,8 @@ import { connectToGemini } from '../services/geminiService';
 import { createBlob, decode, decodeAudioData } from '../services/audioUtils';
 import { streamTextToSpeech, playElevenLabsAudio, getElevenLabsVoices } from '../services/elevenLabsService';
 import base44 from '../api/base44Client';
+import { streamKaviChat } from '../lib/chatStream';
+import apiClient from '../lib/apiClient';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
@@ -71,6 +73,8 @@ export default function VoiceAssistant() {
   const audioSourceNodes = useRef(new Set()).current;
   const analyserRef = useRef(null);
   const animationFrameIdRef = useRef(null);
+  const chatAbortRef = useRef(null);
+  const conversationIdRef = useRef(null); // Server-side KAVI conversation, so follow-ups keep their context
 
   const [audioData, setAudioData] = useState(new Uint8Array(0));
   const [isSettingsOpen, setIsSettingsOpen] = useState(false);
@@ -193,8 +197,7 @@ export default function VoiceAssistant() {
 
   const loadFinancialContext = async () => {
     try {
-      // Use enhanced buildFinancialContext which prioritizes React Query cache
-      // This avoids DB calls by using data already loaded in the frontend
+      // Compact summary precomputed by the backend (no transaction/invoice downloads)
       const context = await buildFinancialContext();
       
       // Inject role and active business context from auth
@@ -212,11 +215,8 @@ export default function VoiceAssistant() {
       
       setFinancialContext(scoped);
       
-      // Log data source for debugging
-      if (context?.dataSource === 'cache') {
-        console.log(' KAVI context loaded from cache (no DB calls!)');
-      } else {
-        console.log(' KAVI context loaded from API (cache miss)');
+      if (context?.dataSource !== 'server') {
+        console.warn(' KAVI context unavailable; answering without business figures');
       }
     } catch (error) {
       console.error(' Error loading financial context:', error);
@@ -238,6 +238,9 @@ export default function VoiceAssistant() {
   };
 
   const stopOngoingSpeech = useCallback(() => {
+    // Cancelling the request also stops generation on the server
+    chatAbortRef.current?.abort();
+    chatAbortRef.current = null;
     window.speechSynthesis.cancel();
     audioSourceNodes.forEach(source => {
       try { source.stop(); } catch (e) { /* ignore */ }
@@ -490,13 +493,19 @@ export default function VoiceAssistant() {
             // Save conversation
             const { _turnUserInput, _liveModelOutput } = useVoiceStore.getState();
             if (_turnUserInput || _liveModelOutput) {
-              await base44.entities.VoiceConversation.create({
-                user_input: _turnUserInput || '',
-                ai_response: _liveModelOutput || '',
-                intent: 'general_help',
-                action_taken: '',
-                conversation_date: new Date().toISOString()
-              });
+              try {
+                const saved = await apiClient.createVoiceConversation({
+                  conversation_id: conversationIdRef.current,
+                  user_input: _turnUserInput || '',
+                  ai_response: _liveModelOutput || '',
+                  intent: 'general_help',
+                  action_taken: ''
+                });
+                conversationIdRef.current = saved?.id ?? conversationIdRef.current;
+              } catch (error) {
+                // An unsaved turn must not leave the live transcript stuck on screen
+                console.error('Failed to save conversation turn:', error);
+              }
             }
             
             finalizeTurn(sources);
@@ -657,27 +666,51 @@ export default function VoiceAssistant() {
     }
   };
 
+  const speakSentence = (sentence) => {
+    if (!('speechSynthesis' in window)) return;
+    const utterance = new SpeechSynthesisUtterance(sentence);
+    utterance.onend = () => {
+      if (!window.speechSynthesis.pending && !window.speechSynthesis.speaking) setIsSpeaking(false);
+    };
+    setIsSpeaking(true);
+    window.speechSynthesis.speak(utterance); // Queued behind the previous sentence
+  };
+
   const handleTextSubmit = async (e) => {
     e.preventDefault();
-    if (!textInput.trim()) return;
-    
-    // Simulate voice input for text
-    updateLiveTranscription(textInput, null);
-    setIsRecording(true);
+    const question = textInput.trim();
+    if (!question) return;
+
+    stopOngoingSpeech();
+    const controller = new AbortController();
+    chatAbortRef.current = controller;
+    updateLiveTranscription(question);
+    setTextInput('');
     setIsLoading(true);
-    
+
     try {
-      // Process text as if it was voice input
-      // For now, we'll need to send it directly to Gemini
-      // This is a simplified version - you'd want to properly integrate text input
-      await startConversation();
-      // Note: Full text integration would require modifying Gemini service
+      // Speak each sentence as soon as it is complete instead of waiting for the whole answer
+      await streamKaviChat({
+        question,
+        context: financialContext,
+        businessId: financialContext?.business?.id,
+        conversationId: conversationIdRef.current,
+        onConversation: (id) => { conversationIdRef.current = id; },
+        onToken: (token) => updateLiveTranscription(undefined, token),
+        onSentence: speakSentence,
+        signal: controller.signal,
+      });
+      finalizeTurn();
     } catch (error) {
-      console.error('Error processing text:', error);
-      setApiError('Error processing text input.');
+      if (error.name !== 'AbortError') {
+        console.error('Error processing text:', error);
+        setApiError(error.message || 'Error processing text input.');
+        resetLiveTranscriptions();
+      }
+    } finally {
+      if (chatAbortRef.current === controller) chatAbortRef.current = null;
+      setIsLoading(false);
     }
-    
-    setTextInput('');
   };
 
   const handleQuickCommand = (command) => {
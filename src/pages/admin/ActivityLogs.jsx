@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { useQuery, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery, useQueryClient } from '@tanstack/react-query';
 import apiClient from '../../lib/apiClient';
 import { Card, CardContent, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
@@ -19,28 +19,33 @@ export default function ActivityLogs() {
   const queryClient = useQueryClient();
 
   // Fetch activity logs with real-time updates
-  const { data: logs = [], isLoading } = useQuery({
+  const {
+    data,
+    isLoading,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
+  } = useInfiniteQuery({
     queryKey: ['activity-logs', filterType, filterUser, dateRange],
-    queryFn: async () => {
-      const response = await apiClient.request('/core/admin/activity-logs/', {
-        params: {
-          type: filterType !== 'all' ? filterType : undefined,
-          user: filterUser !== 'all' ? filterUser : undefined,
-          range: dateRange
-        }
-      });
-      return response;
+    queryFn: ({ pageParam }) => {
+      const params = new URLSearchParams({ range: dateRange });
+      if (filterType !== 'all') params.set('type', filterType);
+      if (filterUser !== 'all') params.set('user', filterUser);
+      if (pageParam) params.set('cursor', pageParam);
+      return apiClient.request(`/core/admin/activity-logs/?${params.toString()}`);
     },
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
     refetchInterval: 5000, // Refresh every 5 seconds
     staleTime: 3000
   });
+  const logs = data?.pages.flatMap(page => page.results) ?? [];
 
   // Fetch users for filter
   const { data: users = [] } = useQuery({
     queryKey: ['users-for-filter'],
     queryFn: async () => {
-      const response = await apiClient.request('/users/admin/users/');
-      return response;
+      const response = await apiClient.getAllUsers({ page_size: 200 });
+      return response.results;
     },
     staleTime: 60000
   });
@@ -153,7 +158,7 @@ export default function ActivityLogs() {
               <div>
                 <p className="text-sm text-gray-600">User Actions</p>
                 <p className="text-2xl font-bold text-gray-900">
-                  {logs.filter(l => l.action?.includes('user')).length}
+                  {logs.filter(l => l.action_type === 'user').length}
                 </p>
               </div>
               <User className="w-8 h-8 text-green-600" />
@@ -167,7 +172,7 @@ export default function ActivityLogs() {
               <div>
                 <p className="text-sm text-gray-600">Business Actions</p>
                 <p className="text-2xl font-bold text-gray-900">
-                  {logs.filter(l => l.action?.includes('business')).length}
+                  {logs.filter(l => l.action_type === 'business').length}
                 </p>
               </div>
               <Building2 className="w-8 h-8 text-purple-600" />
@@ -181,7 +186,7 @@ export default function ActivityLogs() {
               <div>
                 <p className="text-sm text-gray-600">Login Events</p>
                 <p className="text-2xl font-bold text-gray-900">
-                  {logs.filter(l => l.action?.includes('login')).length}
+                  {logs.filter(l => l.action_type === 'login').length}
                 </p>
               </div>
               <Settings className="w-8 h-8 text-orange-600" />
@@ -294,6 +299,17 @@ export default function ActivityLogs() {
               })
             )}
           </div>
+          {hasNextPage && (
+            <div className="flex justify-center pt-4">
+              <Button
+                variant="outline"
+                onClick={() => fetchNextPage()}
+                disabled={isFetchingNextPage}
+              >
+                {isFetchingNextPage ? 'Loading...' : 'Load older activity'}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>
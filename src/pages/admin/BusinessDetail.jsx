@@ -37,7 +37,7 @@ export default function BusinessDetail() {
   // Fetch available staff
   const { data: availableStaff = [], isLoading: loadingStaff } = useQuery({
     queryKey: ['available-staff'],
-    queryFn: () => apiClient.getAvailableStaff(),
+    queryFn: async () => (await apiClient.getAvailableStaff({ page_size: 200 })).results,
     enabled: showAssignStaff,
     staleTime: 60000
   });
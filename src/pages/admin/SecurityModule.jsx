@@ -24,7 +24,7 @@ export default function SecurityModule() {
     queryKey: ['security-logs'],
     queryFn: async () => {
       const response = await apiClient.request('/core/admin/security-logs/');
-      return response;
+      return response.results;
     },
     refetchInterval: 10000, // Refresh every 10 seconds
     staleTime: 5000
@@ -46,7 +46,7 @@ export default function SecurityModule() {
     queryKey: ['failed-logins'],
     queryFn: async () => {
       const response = await apiClient.request('/core/admin/failed-logins/');
-      return response;
+      return response.results;
     },
     refetchInterval: 20000,
     staleTime: 15000
@@ -1,5 +1,5 @@
-import React, { useState } from 'react';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import React, { useState, useEffect } from 'react';
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import toast from 'react-hot-toast';
 import apiClient from '../../lib/apiClient';
 import { Card, CardContent, CardHeader, CardTitle } from '../../components/ui/card';
@@ -16,6 +16,7 @@ import { InlineError } from '../../components/ErrorFallback';
 
 export default function UserManagement() {
   const [searchQuery, setSearchQuery] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
   const [filterRole, setFilterRole] = useState('all');
   const [filterStatus, setFilterStatus] = useState('all');
   const [sortBy, setSortBy] = useState('created_at');
@@ -24,23 +25,44 @@ export default function UserManagement() {
   const [viewingUser, setViewingUser] = useState(null);
   const queryClient = useQueryClient();
 
+  // Search on the server, once typing pauses
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(searchQuery.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  // Platform-wide totals for the stats cards (the list below is only the pages loaded so far)
+  const { data: stats } = useQuery({
+    queryKey: ['admin-stats'],
+    queryFn: () => apiClient.getAdminStats(),
+    staleTime: 60000
+  });
+
   // Fetch users
-  const { data: users = [], isLoading, error, refetch } = useQuery({
-    queryKey: ['admin-users-list', filterRole, filterStatus, sortBy, sortOrder],
-    queryFn: async () => {
-      const response = await apiClient.request('/users/admin/users/', {
-        params: {
-          role: filterRole !== 'all' ? filterRole : undefined,
-          is_active: filterStatus !== 'all' ? filterStatus === 'active' : undefined,
-          sort_by: sortBy,
-          order: sortOrder
-        }
-      });
-      return response;
+  const {
+    data,
+    isLoading,
+    error,
+    refetch,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
+  } = useInfiniteQuery({
+    queryKey: ['admin-users-list', debouncedSearch, filterRole, filterStatus, sortBy, sortOrder],
+    queryFn: ({ pageParam }) => {
+      const params = { sort_by: sortBy, order: sortOrder };
+      if (debouncedSearch) params.search = debouncedSearch;
+      if (filterRole !== 'all') params.role = filterRole;
+      if (filterStatus !== 'all') params.is_active = filterStatus === 'active';
+      if (pageParam) params.cursor = pageParam;
+      return apiClient.getAllUsers(params);
     },
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
+    keepPreviousData: true, // Keep the table (and the search box) up while a new search loads
     staleTime: 60000, // 1 minute
     cacheTime: 300000 // 5 minutes
   });
+  const users = data?.pages.flatMap(page => page.results) ?? [];
 
   // Password reset mutation
   const resetPasswordMutation = useMutation({
@@ -65,22 +87,13 @@ export default function UserManagement() {
     onSuccess: () => {
       toast.success('User status updated');
       queryClient.invalidateQueries({ queryKey: ['admin-users-list'] });
+      queryClient.invalidateQueries({ queryKey: ['admin-stats'] });
     },
     onError: (error) => {
       toast.error(error.message || 'Failed to update user status');
     }
   });
 
-  // Filter users based on search
-  const filteredUsers = users.filter(user => {
-    const matchesSearch = !searchQuery || 
-      user.username?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      user.email?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      user.full_name?.toLowerCase().includes(searchQuery.toLowerCase());
-    
-    return matchesSearch;
-  });
-
   // Handle sort
   const handleSort = (field) => {
     if (sortBy === field) {
@@ -116,8 +129,8 @@ export default function UserManagement() {
   // Export to CSV
   const handleExport = () => {
     const usersToExport = selectedUsers.length > 0 
-      ? filteredUsers.filter(u => selectedUsers.includes(u.id))
-      : filteredUsers;
+      ? users.filter(u => selectedUsers.includes(u.id))
+      : users;
     
     const csv = [
       ['Username', 'Email', 'Full Name', 'Role', 'Status', 'Businesses', 'Created'],
@@ -200,7 +213,7 @@ export default function UserManagement() {
             <div className="flex items-center justify-between">
               <div>
                 <p className="text-sm text-gray-600">Total Users</p>
-                <p className="text-2xl font-bold text-gray-900">{users.length}</p>
+                <p className="text-2xl font-bold text-gray-900">{stats?.total_users ?? '—'}</p>
               </div>
               <Users className="w-8 h-8 text-blue-600" />
             </div>
@@ -213,7 +226,7 @@ export default function UserManagement() {
               <div>
                 <p className="text-sm text-gray-600">Active Users</p>
                 <p className="text-2xl font-bold text-green-600">
-                  {users.filter(u => u.is_active).length}
+                  {stats?.active_users ?? '—'}
                 </p>
               </div>
               <CheckCircle className="w-8 h-8 text-green-600" />
@@ -227,7 +240,7 @@ export default function UserManagement() {
               <div>
                 <p className="text-sm text-gray-600">Inactive Users</p>
                 <p className="text-2xl font-bold text-gray-600">
-                  {users.filter(u => !u.is_active).length}
+                  {stats?.inactive_users ?? '—'}
                 </p>
               </div>
               <XCircle className="w-8 h-8 text-gray-600" />
@@ -241,7 +254,7 @@ export default function UserManagement() {
               <div>
                 <p className="text-sm text-gray-600">Admins</p>
                 <p className="text-2xl font-bold text-purple-600">
-                  {users.filter(u => u.is_superuser || u.role === 'admin').length}
+                  {stats?.admin_users ?? '—'}
                 </p>
               </div>
               <Shield className="w-8 h-8 text-purple-600" />
@@ -349,10 +362,10 @@ export default function UserManagement() {
                   <th className="px-6 py-4 text-left">
                     <input
                       type="checkbox"
-                      checked={selectedUsers.length === filteredUsers.length && filteredUsers.length > 0}
+                      checked={selectedUsers.length === users.length && users.length > 0}
                       onChange={(e) => {
                         if (e.target.checked) {
-                          setSelectedUsers(filteredUsers.map(u => u.id));
+                          setSelectedUsers(users.map(u => u.id));
                         } else {
                           setSelectedUsers([]);
                         }
@@ -402,14 +415,14 @@ export default function UserManagement() {
                 </tr>
               </thead>
               <tbody className="divide-y divide-gray-200 bg-white">
-                {filteredUsers.length === 0 ? (
+                {users.length === 0 ? (
                   <tr>
                     <td colSpan="8" className="px-6 py-12 text-center text-gray-500">
                       No users found
                     </td>
                   </tr>
                 ) : (
-                  filteredUsers.map((user) => (
+                  users.map((user) => (
                     <tr
                       key={user.id}
                       className="hover:bg-gray-50 transition-colors"
@@ -519,6 +532,17 @@ export default function UserManagement() {
               </tbody>
             </table>
           </div>
+          {hasNextPage && (
+            <div className="flex justify-center py-4">
+              <Button
+                variant="outline"
+                onClick={() => fetchNextPage()}
+                disabled={isFetchingNextPage}
+              >
+                {isFetchingNextPage ? 'Loading...' : 'Load more users'}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
 
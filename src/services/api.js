@@ -78,7 +78,12 @@ export const dashboardApi = {
 // Notifications API
 export const notificationApi = {
   getAll: (params = {}) => apiClient.get('/core/notifications/', { params }),
-  getUnreadCount: () => apiClient.get('/core/notifications/unread-count/'),
+  // Pass `since` (the last count seen) to long-poll until the count changes
+  getUnreadCount: ({ since, wait = 25 } = {}) => apiClient.get(
+    since === undefined
+      ? '/core/notifications/unread-count/'
+      : `/core/notifications/unread-count/?since=${since}&wait=${wait}`
+  ),
   markAsRead: (id) => apiClient.post(`/core/notifications/${id}/read/`),
   markAllAsRead: () => apiClient.post('/core/notifications/mark-all-read/'),
   delete: (id) => apiClient.delete(`/core/notifications/${id}/delete/`),